@@ -1,30 +1,165 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, Response
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 from typing import List, Optional
-import pandas as pd
-import joblib
+import numpy as np
+import orjson
 import os
-
-app = FastAPI(title="Fraud Classifier API")
+import time
+from batching import MicroBatcher
+from columnar import decode_columnar, encode_columnar, records_to_columns
+from metrics import BATCH_SIZE_BUCKETS, REGISTRY, RequestMetricsMiddleware
+from model_manager import LoadedModel, ModelManager, ModelScores
+from prediction_cache import PredictionCache
+from prediction_log import PredictionLogger
+from streaming import DuplexStreamingResponse, score_ndjson
 
 # Caminho absoluto para o modelo (evita erro se rodar de fora da pasta)
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "model_pipeline.pkl")
+# Artefato versionado: o mesmo que o treino exporta e o thresholds.py atualiza
+ARTIFACT_PATH = os.getenv(
+    "MODEL_ARTIFACT_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "models", "model_artifact"),
+)
+
+# Usa o scorer compilado por padrão (USE_COMPILED_SCORER=0 volta ao pipeline pandas)
+USE_COMPILED_SCORER = os.getenv("USE_COMPILED_SCORER", "1") != "0"
+
+# Micro-batching: tamanho máximo do lote e espera máxima na fila (BATCH_MAX_SIZE=1 desliga)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "2"))
+
+# Cache de predições: número máximo de registros e validade em segundos (PREDICTION_CACHE_SIZE=0 desliga)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "30"))
+
+# Streaming NDJSON: registros por bloco e blocos aguardando scoring antes de pausar a leitura
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+STREAM_MAX_PENDING = int(os.getenv("STREAM_MAX_PENDING", "2"))
+
+# Recarga automática: intervalo em segundos para checar a origem do modelo (0 desliga)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+
+# Threads do LightGBM por processo (0 usa o padrão do OpenMP); definido pelo app/serve.py
+MODEL_THREADS = int(os.getenv("MODEL_THREADS", "0"))
+
+# Com o app/serve.py, o modelo é carregado antes do fork e aquecido em cada worker,
+# que cria o seu próprio pool de threads do OpenMP
+MODEL_WARMUP_IN_WORKERS = os.getenv("MODEL_WARMUP_IN_WORKERS", "0") == "1"
+
+# Log das transações pontuadas em segmentos Parquet (PREDICTION_LOG_DIR vazio desliga);
+# com a fila cheia, "block" segura as requisições por até PREDICTION_LOG_BLOCK_TIMEOUT
+# segundos antes de descartar o lote, e "drop" descarta o lote na hora
+PREDICTION_LOG_DIR = os.getenv(
+    "PREDICTION_LOG_DIR", os.path.join(os.path.dirname(__file__), "prediction_log")
+)
+PREDICTION_LOG_POLICY = os.getenv("PREDICTION_LOG_POLICY", "block")
+PREDICTION_LOG_QUEUE_SIZE = int(os.getenv("PREDICTION_LOG_QUEUE_SIZE", "10000"))
+PREDICTION_LOG_BLOCK_TIMEOUT = float(os.getenv("PREDICTION_LOG_BLOCK_TIMEOUT", "5"))
+PREDICTION_LOG_SEGMENT_ROWS = int(os.getenv("PREDICTION_LOG_SEGMENT_ROWS", "100000"))
+PREDICTION_LOG_SEGMENT_SECONDS = float(os.getenv("PREDICTION_LOG_SEGMENT_SECONDS", "300"))
+
+# Token exigido nos endpoints /admin (vazio desliga a checagem)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Com o scorer compilado e o artefato disponível, o pickle do pipeline não é
+# lido; o modelo é carregado na importação, antes de qualquer fork dos workers
+MODEL_SOURCE = (
+    ARTIFACT_PATH
+    if USE_COMPILED_SCORER and os.path.isdir(ARTIFACT_PATH)
+    else MODEL_PATH
+)
+
+# Métricas expostas em /metrics, além das do micro-batcher e do cache
+REQUEST_SECONDS = REGISTRY.histogram(
+    "fraud_api_request_duration_seconds",
+    "Duração das requisições até o fim da resposta, por endpoint.",
+    labelnames=("endpoint",),
+)
+REQUESTS = REGISTRY.counter(
+    "fraud_api_requests_total", "Requisições atendidas, por endpoint e status.",
+    labelnames=("endpoint", "status"),
+)
+PHASE_SECONDS = REGISTRY.histogram(
+    "fraud_api_request_phase_seconds",
+    "Duração de cada fase do tratamento de uma requisição.",
+    labelnames=("endpoint", "phase"),
+)
+MODEL_STAGE_SECONDS = REGISTRY.histogram(
+    "fraud_api_model_stage_seconds",
+    "Duração de cada etapa da predição: features e booster no scorer compilado, ou cada etapa do pipeline.",
+    labelnames=("stage",),
+)
+REQUEST_ROWS = REGISTRY.histogram(
+    "fraud_api_request_rows", "Registros por requisição ou bloco do fluxo.",
+    BATCH_SIZE_BUCKETS, labelnames=("endpoint",),
+)
+ROWS_SCORED = REGISTRY.counter(
+    "fraud_api_rows_scored_total", "Registros pontuados, por endpoint.",
+    labelnames=("endpoint",),
+)
+
+def observe_rows(endpoint: str, n_rows: int):
+    REQUEST_ROWS.labels(endpoint).observe(n_rows)
+    ROWS_SCORED.labels(endpoint).inc(n_rows)
+
+def observe_parse(endpoint: str, request: Request):
+    """
+    Tempo entre a chegada da requisição e o início do endpoint: leitura do
+    corpo e validação do pydantic.
+    """
+    now = time.perf_counter()
+    PHASE_SECONDS.labels(endpoint, "parse").observe(now - request.scope.get("request_start", now))
 
 # Carrega o modelo
+manager = ModelManager(
+    loader=lambda path: LoadedModel.from_path(
+        path,
+        compiled=USE_COMPILED_SCORER,
+        num_threads=MODEL_THREADS,
+        stage_histogram=MODEL_STAGE_SECONDS,
+    )
+)
 try:
-    model = joblib.load(MODEL_PATH)
+    manager.load(MODEL_SOURCE, warm_up=not MODEL_WARMUP_IN_WORKERS)
 except Exception as e:
     raise RuntimeError(f"Erro ao carregar o modelo: {e}")
 
-# Pré-processamento simples
-def preprocess_categoria_produto(df: pd.DataFrame, min_threshold: int = 1000) -> pd.DataFrame:
-    """
-    Categoriza como 'Outros' as categorias de produtos com frequência menor que o limiar.
-    """
-    categoria_counts = df["categoria_produto"].value_counts()
-    categorias_menos_frequentes = categoria_counts[categoria_counts < min_threshold].index
-    df["categoria_produto"] = df["categoria_produto"].replace(categorias_menos_frequentes, "Outros")
-    return df
+# Guarda cada transação pontuada sem escrever no caminho da requisição
+prediction_log = (
+    PredictionLogger(
+        PREDICTION_LOG_DIR,
+        max_queue=PREDICTION_LOG_QUEUE_SIZE,
+        segment_rows=PREDICTION_LOG_SEGMENT_ROWS,
+        segment_seconds=PREDICTION_LOG_SEGMENT_SECONDS,
+        policy=PREDICTION_LOG_POLICY,
+        block_timeout=PREDICTION_LOG_BLOCK_TIMEOUT,
+        registry=REGISTRY,
+        prefix="fraud_api_",
+    )
+    if PREDICTION_LOG_DIR
+    else None
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Threads não sobrevivem ao fork, então cada processo aquece o seu pool do
+    # OpenMP e inicia o seu watcher e o seu escritor do log de predições
+    if MODEL_WARMUP_IN_WORKERS:
+        manager.warm_up()
+    if MODEL_WATCH_INTERVAL > 0:
+        manager.watch(MODEL_SOURCE, MODEL_WATCH_INTERVAL)
+    if prediction_log is not None:
+        prediction_log.start()
+    yield
+    manager.stop()
+    if prediction_log is not None:
+        prediction_log.close()
+
+app = FastAPI(title="Fraud Classifier API", lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware, duration=REQUEST_SECONDS, requests=REQUESTS)
 
 # Schema de entrada de um item
 class DataItem(BaseModel):
@@ -49,31 +184,228 @@ class DataItem(BaseModel):
 class PredictionRequest(BaseModel):
     data: List[DataItem]
 
-@app.post("/predict")
-def predict(request: PredictionRequest):
-    try:
-        # Converte entrada em DataFrame
-        df_input = pd.DataFrame([item.dict() for item in request.data])
+def score_records(records: List[dict]):
+    """
+    Calcula as probabilidades de fraude com o modelo ativo no momento.
+    """
+    return manager.current.predict_proba(records)
+
+# Agrupa requisições concorrentes em um único predict_proba
+batcher = (
+    MicroBatcher(
+        score_records,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        registry=REGISTRY,
+        prefix="fraud_api_",
+    )
+    if BATCH_MAX_SIZE > 1
+    else None
+)
 
-        # Aplica pré-processamento
-        df_processed = preprocess_categoria_produto(df_input.copy())
+# Evita repontuar retentativas da mesma transação
+cache = (
+    PredictionCache(
+        max_size=PREDICTION_CACHE_SIZE,
+        ttl_seconds=PREDICTION_CACHE_TTL,
+        registry=REGISTRY,
+        prefix="fraud_api_",
+    )
+    if PREDICTION_CACHE_SIZE > 0
+    else None
+)
 
-        # Remove coluna alvo se existir
-        X = df_processed.drop(columns=["fraude"], errors="ignore")
+async def score_async(records: List[dict]):
+    if batcher is not None:
+        return await batcher.submit(records)
+    return await run_in_threadpool(score_records, records)
+
+async def cached_score(records: List[dict]):
+    """
+    Pontua só os registros ausentes do cache e completa com os já calculados.
+    """
+    if cache is None:
+        return await score_async(records)
+
+    model = manager.current
+    version = model.version
+    with PHASE_SECONDS.labels("/predict", "cache").time():
+        keys = cache.keys(records, version)
+        y_proba = cache.get_many(keys)
+    missing = np.flatnonzero(np.isnan(y_proba))
+    if len(missing) == 0:
+        return ModelScores(y_proba, version, model.threshold)
+
+    scores = await score_async([records[i] for i in missing])
+    if scores.version != version:
+        # O modelo mudou durante a requisição: tudo sai da versão nova
+        return await score_async(records)
+    y_proba[missing] = scores.proba
+    cache.put_many([keys[i] for i in missing], scores.proba)
+    return ModelScores(y_proba, version, scores.threshold)
+
+@app.post("/predict")
+async def predict(request: PredictionRequest, http_request: Request):
+    observe_parse("/predict", http_request)
+    try:
+        with PHASE_SECONDS.labels("/predict", "to_records").time():
+            records = [item.dict() for item in request.data]
 
         # Predição
-        if hasattr(model, "predict_proba"):
-            y_proba = model.predict_proba(X)[:, 1]
-            y_pred = (y_proba > 0.61).astype(int)
+        if not records:
+            return {"results": [], "model_version": manager.current.version}
+        with PHASE_SECONDS.labels("/predict", "score").time():
+            scores = await cached_score(records)
+        observe_rows("/predict", len(records))
+        if prediction_log is not None:
+            with PHASE_SECONDS.labels("/predict", "log").time():
+                await prediction_log.log_records_async(records, scores, "/predict")
+
+        with PHASE_SECONDS.labels("/predict", "serialize").time():
             results = [
                 {"prediction": int(pred), "probability": float(proba)}
-                for pred, proba in zip(y_pred, y_proba)
+                for pred, proba in zip(scores.predictions(), scores.proba)
             ]
-        else:
-            y_pred = model.predict(X)
-            results = [{"prediction": int(pred)} for pred in y_pred]
+        return {"results": results, "model_version": scores.version}
 
-        return {"results": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao fazer predição: {e}")
+
+@app.post("/predict/columnar")
+async def predict_columnar(request: Request):
+    """
+    Predição em formato colunar: `{"data": {"campo": [valores, ...]}}`.
 
+    A resposta traz `prediction` e `probability` como listas, na ordem das linhas.
+    """
+    try:
+        columns, n_rows = decode_columnar(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    observe_parse("/predict/columnar", request)
+
+    try:
+        model = manager.current
+        with PHASE_SECONDS.labels("/predict/columnar", "score").time():
+            scores = await run_in_threadpool(model.predict_proba_columns, columns, n_rows)
+        observe_rows("/predict/columnar", n_rows)
+        if prediction_log is not None:
+            with PHASE_SECONDS.labels("/predict/columnar", "log").time():
+                await prediction_log.log_columns_async(
+                    columns, scores, "/predict/columnar"
+                )
+        with PHASE_SECONDS.labels("/predict/columnar", "serialize").time():
+            content = encode_columnar(scores.predictions(), scores.proba, scores.version)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao fazer predição: {e}")
+    return Response(content=content, media_type="application/json")
+
+def score_stream_chunk(records: List[dict]) -> bytes:
+    """
+    Pontua um bloco do fluxo NDJSON e devolve as linhas de resposta.
+    """
+    columns, n_rows = records_to_columns(records)
+    scores = manager.current.predict_proba_columns(columns, n_rows)
+    observe_rows("/predict/stream", n_rows)
+    if prediction_log is not None:
+        prediction_log.log_columns(columns, scores, "/predict/stream")
+    y_pred = scores.predictions()
+    return b"".join(
+        orjson.dumps(
+            {"prediction": int(pred), "probability": float(proba), "model_version": scores.version}
+        )
+        + b"\n"
+        for pred, proba in zip(y_pred, scores.proba)
+    )
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """
+    Predição de um fluxo NDJSON (um registro por linha), respondida também em
+    NDJSON, na ordem de entrada, à medida que cada bloco é pontuado.
+    """
+    return DuplexStreamingResponse(
+        score_ndjson(
+            request.stream(),
+            score_stream_chunk,
+            chunk_size=STREAM_CHUNK_SIZE,
+            max_pending=STREAM_MAX_PENDING,
+        ),
+        media_type="application/x-ndjson",
+    )
+
+@app.post("/explain")
+async def explain(
+    request: PredictionRequest,
+    http_request: Request,
+    declined_only: bool = False,
+    top: int = Query(0, ge=0),
+):
+    """
+    Predição com a contribuição de cada campo de entrada para o score, em
+    log-odds, pelo `pred_contrib` do LightGBM. Somadas ao `base_value`, as
+    contribuições dão o logit da probabilidade.
+
+    Com `declined_only=true`, só as transações bloqueadas são explicadas (as
+    demais vêm com `explanation` nulo); `top` limita cada explicação aos
+    campos de maior contribuição em módulo.
+    """
+    observe_parse("/explain", http_request)
+    try:
+        records = [item.dict() for item in request.data]
+        model = manager.current
+        with PHASE_SECONDS.labels("/explain", "score").time():
+            explanation = await run_in_threadpool(model.explain, records, declined_only)
+        observe_rows("/explain", len(records))
+
+        with PHASE_SECONDS.labels("/explain", "serialize").time():
+            scores = explanation.scores
+            results = [
+                {"prediction": int(pred), "probability": float(proba), "explanation": None}
+                for pred, proba in zip(scores.predictions(), scores.proba)
+            ]
+            for i, contributions, base_value in zip(
+                explanation.rows.tolist(),
+                explanation.top(top),
+                explanation.base_value.tolist(),
+            ):
+                results[i]["explanation"] = {
+                    "base_value": base_value,
+                    "contributions": contributions,
+                }
+        return {"results": results, "model_version": scores.version}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao explicar a predição: {e}")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return REGISTRY.render()
+
+def check_admin_token(token: Optional[str]):
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Token de administração inválido")
+
+@app.get("/admin/model")
+def model_info(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    return manager.info()
+
+@app.post("/admin/reload")
+async def reload_model(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    # Carga e aquecimento rodam numa thread; /predict segue com o modelo atual
+    try:
+        model = await run_in_threadpool(manager.reload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao recarregar o modelo: {e}")
+    return model.info()
+
+@app.post("/admin/rollback")
+def rollback_model(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    try:
+        model = manager.rollback()
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model.info()
@@ -0,0 +1,122 @@
+"""
+Sobe a API em vários processos que compartilham o modelo.
+
+O modelo é carregado uma única vez no processo pai, antes do fork; os workers
+herdam a memória copy-on-write e atendem no mesmo socket. As CPUs disponíveis
+são divididas entre o número de workers e as threads do LightGBM em cada um.
+
+O pool de threads do OpenMP não sobrevive ao fork: um filho que herda um pool
+já iniciado trava no primeiro predict. Por isso o OpenMP do pai fica com uma
+única thread (o LightGBM já o usa ao carregar o booster), o aquecimento do
+modelo roda em cada worker e as threads dos workers vêm do `num_threads`
+passado a cada predição.
+
+Uso, a partir da raiz do projeto:
+
+    python -m app.serve --workers 4 --threads 2 --port 8000
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+from serving import available_cpus, pin_threads, thread_budget
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sobe a API com vários processos.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processos da API (padrão: CPUs / threads)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Threads do LightGBM por processo (padrão: CPUs / workers)",
+    )
+    return parser.parse_args()
+
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    server.run(sockets=[sock])
+
+
+def spawn(app, sock):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            run_worker(app, sock)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main():
+    args = parse_args()
+    workers, threads = thread_budget(available_cpus(), args.workers, args.threads)
+
+    # As variáveis precisam estar definidas antes de NumPy e LightGBM carregarem;
+    # o OpenMP do pai fica sem pool para o fork, e os workers usam MODEL_THREADS
+    pin_threads(threads)
+    os.environ["OMP_NUM_THREADS"] = "1"
+    os.environ["MODEL_THREADS"] = str(threads)
+    os.environ["MODEL_WARMUP_IN_WORKERS"] = "1"
+    from app.main import app
+
+    sock = bind_socket(args.host, args.port)
+    print(
+        f"API em http://{args.host}:{args.port} com {workers} workers x {threads} threads"
+    )
+
+    # Tira os objetos já carregados do coletor, para ele não tocar nas páginas
+    # compartilhadas e forçar cópias nos workers
+    gc.collect()
+    gc.freeze()
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    children = {spawn(app, sock) for _ in range(workers)}
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # Repõe workers que morrerem, até receber um sinal de parada
+    while children:
+        pid, status = os.wait()
+        children.discard(pid)
+        if not stopping:
+            print(
+                f"Worker {pid} saiu com status {status}; iniciando outro",
+                file=sys.stderr,
+            )
+            children.add(spawn(app, sock))
+
+
+if __name__ == "__main__":
+    main()
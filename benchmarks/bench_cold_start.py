@@ -0,0 +1,83 @@
+"""
+Benchmark de cold start: pickle do pipeline contra o artefato versionado.
+
+Cada carregador roda em um processo novo, que mede separadamente o tempo das
+importações e o da carga do modelo até a primeira predição, além do pico de
+memória residente. Uso, a partir da raiz do projeto:
+
+    PYTHONPATH=src python benchmarks/bench_cold_start.py --repeat 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importações e carga de cada formato
+LOADERS = {
+    "pickle": (
+        "import joblib\n"
+        "from features import ensure_category_grouper\n"
+        "from scoring import CompiledScorer",
+        "scorer = CompiledScorer.from_pipeline("
+        "ensure_category_grouper(joblib.load('app/model_pipeline.pkl')))",
+    ),
+    "artefato": (
+        "from artifact import load_artifact",
+        "scorer = load_artifact('models/model_artifact')",
+    ),
+}
+
+TEMPLATE = """
+import json, resource, time
+record = json.load(open("test_payload.json"))["data"][0]
+start = time.perf_counter()
+{imports}
+imported = time.perf_counter()
+{load}
+scorer.predict_proba([record])
+loaded = time.perf_counter()
+print(json.dumps({{
+    "import_s": imported - start,
+    "load_s": loaded - imported,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def run(imports, load):
+    code = TEMPLATE.format(imports=imports, load=load)
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, "src"))
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'carregador':>10} {'importações (s)':>16} {'carga (s)':>10}"
+        f" {'pico RSS (MB)':>14}"
+    )
+    for name, (imports, load) in LOADERS.items():
+        results = [run(imports, load) for _ in range(args.repeat)]
+        import_s = min(r["import_s"] for r in results)
+        load_s = min(r["load_s"] for r in results)
+        rss = max(r["rss_mb"] for r in results)
+        print(f"{name:>10} {import_s:>16.3f} {load_s:>10.3f} {rss:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
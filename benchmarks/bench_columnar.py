@@ -0,0 +1,86 @@
+"""
+Benchmark do formato de requisição: linhas (`/predict`) contra colunas
+(`/predict/columnar`).
+
+Mede, para cada tamanho de lote, o tempo só de decodificação e validação e o
+tempo total da requisição pela API, com o cache de predições desligado. Uso, a
+partir da raiz do projeto:
+
+    PYTHONPATH=src:. python benchmarks/bench_columnar.py --sizes 100 10000
+"""
+
+import argparse
+import json
+import os
+import time
+import warnings
+
+os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+
+# pylint: disable=wrong-import-position
+from fastapi.testclient import TestClient
+from app.main import PredictionRequest, app
+from columnar import decode_columnar
+from synthetic import make_transactions
+
+
+def payloads(n_rows):
+    df = make_transactions(n_rows, with_target=False)
+    df = df.astype(object).where(df.notna(), None)
+    # Scores ausentes não são aceitos pelo schema da API
+    for col in df.columns:
+        if col.startswith("score_"):
+            df[col] = df[col].fillna(0)
+    rows = json.dumps({"data": df.to_dict("records")})
+    columns = json.dumps({"data": df.to_dict("list")})
+    return rows, columns
+
+
+def decode_rows(body):
+    request = PredictionRequest.model_validate_json(body)
+    return [item.dict() for item in request.data]
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    client = TestClient(app)
+    print(
+        f"{'linhas':>8} {'formato':>8} {'decodificação (s)':>18} {'requisição (s)':>15}"
+        f" {'corpo (KB)':>11}"
+    )
+    for n_rows in args.sizes:
+        rows, columns = payloads(n_rows)
+        cases = [
+            ("linhas", rows, decode_rows, "/predict"),
+            ("colunas", columns, decode_columnar, "/predict/columnar"),
+        ]
+        for name, body, decode, endpoint in cases:
+            decode_s = best_of(lambda b=body, d=decode: d(b), args.repeat)
+            request_s = best_of(
+                lambda b=body, e=endpoint: client.post(
+                    e, content=b, headers={"Content-Type": "application/json"}
+                ).raise_for_status(),
+                args.repeat,
+            )
+            print(
+                f"{n_rows:>8,} {name:>8} {decode_s:>18.4f} {request_s:>15.4f}"
+                f" {len(body) / 1024:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark de leitura dos dados: CSV contra o cache Arrow IPC por memory map.
+
+Grava o mesmo conjunto sintético em CSV e em Arrow e mede o tempo de carga
+completa e com projeção de colunas. Uso, a partir da raiz do projeto:
+
+    PYTHONPATH=src python benchmarks/bench_data_cache.py --rows 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from dataset import read_data, write_data
+from synthetic import make_transactions
+
+COLUMNS = ["score_1", "pais", "valor_compra", "fraude"]
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_transactions(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {fmt: os.path.join(tmp, f"dados.{fmt}") for fmt in ["csv", "arrow"]}
+        for path in paths.values():
+            write_data(df, path)
+
+        print(f"{'formato':>8} {'colunas':>8} {'tempo (s)':>10} {'arquivo (MB)':>13}")
+        for fmt, path in paths.items():
+            size = os.path.getsize(path) / 2**20
+            for label, columns in [("todas", None), ("4", COLUMNS)]:
+                elapsed = best_of(
+                    lambda p=path, c=columns: read_data(p, columns=c), args.repeat
+                )
+                print(f"{fmt:>8} {label:>8} {elapsed:>10.3f} {size:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark de throughput do DataProcessor.transform (linhas/s).
+
+Compara a implementação vetorizada com a versão anterior, linha a linha com
+`.apply`. Uso, a partir da raiz do projeto:
+
+    PYTHONPATH=src python benchmarks/bench_data_processor.py --sizes 10000 1000000 10000000
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from features import DataProcessor
+
+
+def legacy_transform(X):
+    """
+    DataProcessor.transform antes da vetorização, mantido como referência.
+    """
+    X_copy = X.copy()
+    X_copy["is_missing"] = X_copy["entrega_doc_2"].isnull().astype(int)
+    X_copy["entrega_doc_2"] = (
+        X_copy["entrega_doc_2"].fillna("N").apply(lambda x: 1 if x == "Y" else 0)
+    )
+    X_copy["pais"] = X_copy["pais"].apply(
+        lambda x: x if x in ["BR", "AR"] else "Outros"
+    )
+    X_copy["entrega_doc_3"] = X_copy["entrega_doc_3"].apply(
+        lambda x: 1 if x == "Y" else 0
+    )
+    return X_copy
+
+
+def make_frame(n_rows, seed=42):
+    """
+    Gera só as colunas tocadas pelo DataProcessor, para caber 10M de linhas.
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "pais": rng.choice(
+                np.array(["BR", "AR", "US", "MX"], dtype=object),
+                n_rows,
+                p=[0.8, 0.12, 0.05, 0.03],
+            ),
+            "entrega_doc_2": rng.choice(
+                np.array(["Y", "N", None], dtype=object), n_rows
+            ),
+            "entrega_doc_3": rng.choice(np.array(["Y", "N"], dtype=object), n_rows),
+            "valor_compra": rng.lognormal(3.5, 1.2, n_rows),
+        }
+    )
+
+
+def best_time(fn, X, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    processor = DataProcessor()
+    print(
+        f"{'linhas':>12} {'antes (linhas/s)':>18} {'depois (linhas/s)':>18} {'ganho':>8}"
+    )
+    for n_rows in args.sizes:
+        X = make_frame(n_rows)
+        pd.testing.assert_frame_equal(legacy_transform(X), processor.transform(X))
+
+        before = best_time(legacy_transform, X, args.repeat)
+        after = best_time(processor.transform, X, args.repeat)
+        print(
+            f"{n_rows:>12,} {n_rows / before:>18,.0f} {n_rows / after:>18,.0f}"
+            f" {before / after:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark de memória do scoring em lote: pipeline pandas x buffer colunar.
+
+Cada modo roda em um subprocesso próprio, para que o pico de RSS de um não
+contamine o outro. Uso, a partir da raiz do projeto:
+
+    PYTHONPATH=src python benchmarks/bench_memory.py --rows 1000000
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+import joblib
+import pandas as pd
+from models.predict import predict_proba
+from models.train import get_pipeline
+from synthetic import make_transactions
+
+MODES = ["pandas", "buffered"]
+
+
+def prepare(workdir, n_rows):
+    """
+    Gera o arquivo de teste e treina um modelo pequeno sobre dados sintéticos.
+    """
+    data_path = os.path.join(workdir, "test.csv")
+    model_path = os.path.join(workdir, "model.pkl")
+
+    train = make_transactions(20_000, seed=1)
+    pipeline = get_pipeline()
+    pipeline.set_params(category_grouper__min_threshold=300, model__verbose=-1)
+    pipeline.fit(train.drop(columns=["fraude"]), train["fraude"])
+    joblib.dump(pipeline, model_path)
+
+    make_transactions(n_rows, seed=2).to_csv(data_path, index=False)
+    return data_path, model_path
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(mode, data_path, model_path):
+    warnings.simplefilter("ignore")
+    pipeline = joblib.load(model_path)
+    X = pd.read_csv(data_path).drop(columns=["fraude"])
+    rss_before = max_rss_mb()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    predict_proba(pipeline, X, buffered=mode == "buffered")
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{mode:>10} {elapsed:>9.2f} {peak / 2**20:>14.1f} {peak / len(X):>16.0f}"
+        f" {max_rss_mb() - rss_before:>16.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--child", choices=MODES)
+    parser.add_argument("--data")
+    parser.add_argument("--model")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.data, args.model)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        data_path, model_path = prepare(workdir, args.rows)
+        print(f"Arquivo de teste: {args.rows:,} linhas")
+        print(
+            f"{'modo':>10} {'tempo (s)':>9} {'pico alocado':>14}"
+            f" {'bytes/linha':>16} {'pico RSS extra':>16}"
+        )
+        print(f"{'':>10} {'':>9} {'(MB)':>14} {'(pico alocado)':>16} {'(MB)':>16}")
+        for mode in MODES:
+            subprocess.run(
+                [sys.executable, __file__, "--child", mode]
+                + ["--data", data_path, "--model", model_path],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
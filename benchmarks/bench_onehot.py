@@ -0,0 +1,89 @@
+"""
+Benchmark do OneHotFeatureEncoder: tempo e memória por modo de saída.
+
+Compara o DataFrame float64 ("frame") com a matriz float32 densa ("dense") e a
+CSR float32 ("sparse"). Uso, a partir da raiz do projeto:
+
+    PYTHONPATH=src python benchmarks/bench_onehot.py --sizes 100000 1000000
+"""
+
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import scipy.sparse as sp
+from features import (
+    CategoryGrouper,
+    ColumnDropper,
+    DataProcessor,
+    KFoldTargetEncoder,
+    OneHotFeatureEncoder,
+    ScoreImputer,
+)
+from synthetic import make_transactions
+
+MODES = ["frame", "dense", "sparse"]
+
+
+def preprocess(df):
+    """
+    Aplica as etapas anteriores ao one-hot, como no pipeline.
+    """
+    X, y = df.drop(columns=["fraude"]), df["fraude"]
+    for step in [
+        CategoryGrouper(min_threshold=100),
+        KFoldTargetEncoder(),
+        ColumnDropper(),
+        DataProcessor(),
+        ScoreImputer(),
+    ]:
+        X = step.fit(X, y).transform(X)
+    return X
+
+
+def output_mb(result):
+    if sp.issparse(result):
+        nbytes = result.data.nbytes + result.indices.nbytes + result.indptr.nbytes
+    elif isinstance(result, np.ndarray):
+        nbytes = result.nbytes
+    else:
+        nbytes = result.memory_usage(index=True).sum()
+    return nbytes / 2**20
+
+
+def measure(encoder, X, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encoder.transform(X)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = encoder.transform(X)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / 2**20, output_mb(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'linhas':>10} {'modo':>7} {'tempo (s)':>10} {'pico alocado (MB)':>18}"
+        f" {'saída (MB)':>11}"
+    )
+    for n_rows in args.sizes:
+        X = preprocess(make_transactions(n_rows))
+        for mode in MODES:
+            encoder = OneHotFeatureEncoder(output=mode).fit(X)
+            elapsed, peak, size = measure(encoder, X, args.repeat)
+            print(
+                f"{n_rows:>10,} {mode:>7} {elapsed:>10.3f} {peak:>18.1f} {size:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
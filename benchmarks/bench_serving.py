@@ -0,0 +1,117 @@
+"""
+Benchmark de carga do app/serve.py para várias combinações de workers e
+threads do LightGBM.
+
+Para cada layout "WxT", sobe a API com W processos e T threads por processo,
+dispara requisições concorrentes em `/predict` por alguns segundos (com o
+cache de predições desligado) e reporta a vazão total e por núcleo e as
+latências. Uso, a partir da raiz do projeto:
+
+    PYTHONPATH=src:. python benchmarks/bench_serving.py --layouts 4x1 2x2 1x4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+import httpx
+import numpy as np
+from serving import available_cpus
+
+PORT = 8766
+
+
+def default_layouts(n_cpus):
+    """
+    Todas as divisões exatas das CPUs, mais um layout com excesso de threads.
+    """
+    layouts = [(w, n_cpus // w) for w in range(1, n_cpus + 1) if n_cpus % w == 0]
+    layouts.append((n_cpus, n_cpus) if n_cpus > 1 else (2, 1))
+    return layouts
+
+
+def wait_until_ready(timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{PORT}/metrics", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("API não subiu a tempo")
+
+
+async def load(payload, concurrency, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=30
+    ) as client:
+
+        async def user():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.post("/predict", json=payload)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*[user() for _ in range(concurrency)])
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--layouts", nargs="+", help="Layouts WxT (padrão: pelas CPUs)")
+    parser.add_argument("--rows", type=int, default=10, help="Registros por requisição")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    n_cpus = available_cpus()
+    layouts = (
+        [tuple(map(int, layout.split("x"))) for layout in args.layouts]
+        if args.layouts
+        else default_layouts(n_cpus)
+    )
+    with open("test_payload.json", encoding="utf-8") as f:
+        records = json.load(f)["data"]
+    payload = {"data": [records[i % len(records)] for i in range(args.rows)]}
+
+    print(f"{n_cpus} CPUs; cliente de carga na mesma máquina")
+    print(
+        f"{'layout':>7} {'req/s':>8} {'linhas/s':>9} {'linhas/s/núcleo':>16}"
+        f" {'p50 (ms)':>9} {'p99 (ms)':>9}"
+    )
+    for workers, threads in layouts:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "app.serve", "--port", str(PORT)]
+            + ["--workers", str(workers), "--threads", str(threads)],
+            env=dict(os.environ, PYTHONPATH="src:.", PREDICTION_CACHE_SIZE="0"),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_ready()
+            asyncio.run(load(payload, args.concurrency, 1))  # Aquecimento
+            latencies = asyncio.run(load(payload, args.concurrency, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+
+        rps = len(latencies) / args.duration
+        cores = min(workers * threads, n_cpus)
+        print(
+            f"{f'{workers}x{threads}':>7} {rps:>8.0f} {rps * args.rows:>9.0f}"
+            f" {rps * args.rows / cores:>16.0f}"
+            f" {np.percentile(latencies, 50) * 1000:>9.1f}"
+            f" {np.percentile(latencies, 99) * 1000:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
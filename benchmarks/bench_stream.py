@@ -0,0 +1,111 @@
+"""
+Benchmark do endpoint `/predict/stream`: memória do servidor por tamanho do
+fluxo.
+
+Sobe a API com uvicorn, envia N registros em NDJSON com transferência chunked
+enquanto lê as respostas na mesma conexão e mede a vazão e o pico de memória
+residente do servidor. Uso, a partir da raiz do projeto:
+
+    PYTHONPATH=src:. python benchmarks/bench_stream.py --rows 100000 1000000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+PORT = 8765
+
+
+def peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmHWM"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+async def stream(n_rows, record, lines_per_write=500):
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    writer.write(
+        b"POST /predict/stream HTTP/1.1\r\nHost: localhost\r\n"
+        b"Content-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n"
+    )
+    line = (json.dumps(record) + "\n").encode()
+
+    async def send():
+        sent = 0
+        while sent < n_rows:
+            data = line * min(lines_per_write, n_rows - sent)
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+            sent += lines_per_write
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def receive():
+        # Conta as linhas de resposta até o fim da transferência chunked
+        await reader.readuntil(b"\r\n\r\n")
+        received = 0
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            if size == 0:
+                break
+            received += (await reader.readexactly(size)).count(b"\n")
+            await reader.readline()
+        return received
+
+    _, received = await asyncio.gather(send(), receive())
+    writer.close()
+    return received
+
+
+def wait_until_ready(timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{PORT}/metrics", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("API não subiu a tempo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    with open("test_payload.json", encoding="utf-8") as f:
+        record = json.load(f)["data"][0]
+
+    print(f"{'linhas':>10} {'tempo (s)':>10} {'linhas/s':>10} {'pico RSS (MB)':>14}")
+    for n_rows in args.rows:
+        # Um servidor novo por tamanho, para o pico de memória ser só deste fluxo
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT)],
+            env=dict(os.environ, PYTHONPATH="src:."),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_ready()
+            start = time.perf_counter()
+            received = asyncio.run(stream(n_rows, record))
+            elapsed = time.perf_counter() - start
+            assert received == n_rows, (received, n_rows)
+            print(
+                f"{n_rows:>10,} {elapsed:>10.2f} {n_rows / elapsed:>10,.0f}"
+                f" {peak_rss_mb(server.pid):>14.1f}"
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Suíte de benchmarks de desempenho com dados sintéticos.
+
+Mede cada transformador de src/features.py, o train_model, o make_predictions,
+as explicações por pred_contrib e os endpoints de predição (em processo, sem
+servidor) em vários tamanhos de lote. Os resultados vão para benchmarks/results/ em JSON e podem ser
+comparados com um baseline salvo. Uso, a partir da raiz do projeto:
+
+    PYTHONPATH=src:. python benchmarks/suite.py
+    PYTHONPATH=src:. python benchmarks/suite.py --full
+    PYTHONPATH=src:. python benchmarks/suite.py --only features --save-baseline
+    PYTHONPATH=src:. python benchmarks/suite.py --compare benchmarks/baseline.json
+
+Com `--compare`, o código de saída é 1 se algum caso ficar mais lento que o
+baseline além de `--threshold`.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from functools import lru_cache
+
+os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+
+# pylint: disable=wrong-import-position
+import joblib
+import lightgbm
+import numpy as np
+import pandas as pd
+from dataset import write_data
+from features import KFoldTargetEncoder
+from model_manager import LoadedModel
+from models.predict import make_explanations, make_predictions
+from models.train import get_pipeline, train_model
+from scoring import CompiledScorer
+from synthetic import SCORE_COLS, make_transactions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+DEFAULT_SIZES = [1, 1_000, 100_000]
+FULL_SIZES = DEFAULT_SIZES + [1_000_000, 10_000_000]
+
+# Dados no formato realista: muitas categorias com distribuição de Zipf
+DATA_PARAMS = {"n_categorias": 10_000, "categoria_skew": 1.1}
+TRAIN_ROWS = 100_000
+
+# Casos registrados: nome -> (função, maior tamanho medido)
+CASES = {}
+
+
+def case(name, max_rows=None):
+    def register(fn):
+        CASES[name] = (fn, max_rows)
+        return fn
+
+    return register
+
+
+@lru_cache(maxsize=2)
+def transactions(n_rows, seed=1):
+    return make_transactions(n_rows, seed=seed, **DATA_PARAMS)
+
+
+@lru_cache(maxsize=1)
+def trained_pipeline():
+    df = transactions(TRAIN_ROWS, seed=0)
+    pipeline = get_pipeline()
+    pipeline.set_params(category_grouper__min_threshold=100, model__verbose=-1)
+    return pipeline.fit(df.drop(columns=["fraude"]), df["fraude"])
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def repeats_for(n_rows, repeat):
+    # Lotes pequenos são ruidosos e baratos: mais repetições
+    return repeat if n_rows >= 10_000 else repeat * 10
+
+
+@case("features")
+def bench_features(n_rows, repeat):
+    """
+    Cada etapa do pipeline aplicada à saída da anterior, como na predição.
+    """
+    steps = trained_pipeline().steps[:-1]
+    X = transactions(n_rows).drop(columns=["fraude"])
+    results = {}
+    for name, step in steps:
+        label = f"features.{type(step).__name__}.transform"
+        results[label] = best_of(lambda s=step, x=X: s.transform(x), repeat)
+        X = step.transform(X)
+    return results
+
+
+@case("features.KFoldTargetEncoder.fit")
+def bench_kfold_fit(n_rows, repeat):
+    df = transactions(n_rows)
+    if n_rows < 5:
+        return None  # O KFold precisa de pelo menos n_fold linhas
+    encoder = KFoldTargetEncoder()
+    return best_of(lambda: encoder.fit(df, df["fraude"]), repeat)
+
+
+@case("train_model", max_rows=1_000_000)
+def bench_train_model(n_rows, repeat):
+    if n_rows < 100:
+        return None  # Poucas linhas para o KFold e o LightGBM
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, "train.arrow")
+        write_data(transactions(n_rows), data_path)
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return best_of(
+                lambda: train_model(
+                    data_path,
+                    os.path.join(tmp, "model.pkl"),
+                    os.path.join(tmp, "artifact"),
+                ),
+                max(1, repeat // 3),
+            )
+
+
+@case("make_predictions")
+def bench_make_predictions(n_rows, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, "test.arrow")
+        model_path = os.path.join(tmp, "model.pkl")
+        write_data(transactions(n_rows), data_path)
+        joblib.dump(trained_pipeline(), model_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return best_of(
+                lambda: make_predictions(
+                    data_path=data_path,
+                    output_path=os.path.join(tmp, "predictions.csv"),
+                    metrics_path=os.path.join(tmp, "metrics.txt"),
+                    model_path=model_path,
+                ),
+                repeat,
+            )
+
+
+@case("make_explanations")
+def bench_make_explanations(n_rows, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, "test.arrow")
+        model_path = os.path.join(tmp, "model.pkl")
+        write_data(transactions(n_rows), data_path)
+        joblib.dump(trained_pipeline(), model_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return best_of(
+                lambda: make_explanations(
+                    data_path=data_path,
+                    output_path=os.path.join(tmp, "explanations.csv"),
+                    model_path=model_path,
+                ),
+                repeat,
+            )
+
+
+def api_frame(n_rows):
+    df = transactions(n_rows).drop(
+        columns=["fraude", "data_compra", "produto", "score_fraude_modelo"]
+    )
+    df[SCORE_COLS] = df[SCORE_COLS].fillna(0)  # O schema da API não aceita nulos
+    return df.astype(object).where(df.notna(), None)
+
+
+def api_payloads(n_rows):
+    df = api_frame(n_rows)
+    rows = json.dumps({"data": df.to_dict("records")})
+    columns = json.dumps({"data": df.to_dict("list")})
+    return rows, columns
+
+
+@case("explain", max_rows=100_000)
+def bench_explain(n_rows, repeat):
+    """
+    Scorer compilado sem a API: só a predição e a predição com pred_contrib
+    em todas as linhas ou só nas bloqueadas.
+    """
+    model = LoadedModel(
+        "benchmark",
+        "benchmark",
+        scorer=CompiledScorer.from_pipeline(trained_pipeline()),
+    )
+    records = api_frame(n_rows).to_dict("records")
+    return {
+        "explain.predict_proba": best_of(lambda: model.predict_proba(records), repeat),
+        "explain.all_rows": best_of(lambda: model.explain(records), repeat),
+        "explain.declined_only": best_of(
+            lambda: model.explain(records, declined_only=True), repeat
+        ),
+    }
+
+
+@case("api", max_rows=100_000)
+def bench_api(n_rows, repeat):
+    from fastapi.testclient import TestClient  # pylint: disable=import-outside-toplevel
+    from app.main import app  # pylint: disable=import-outside-toplevel
+
+    client = TestClient(app)
+    rows, columns = api_payloads(n_rows)
+    headers = {"Content-Type": "application/json"}
+    results = {}
+    for endpoint, body in [
+        ("/predict", rows),
+        ("/predict/columnar", columns),
+        ("/explain", rows),
+        ("/explain?declined_only=true", rows),
+    ]:
+        results[f"api.{endpoint}"] = best_of(
+            lambda e=endpoint, b=body: client.post(
+                e, content=b, headers=headers
+            ).raise_for_status(),
+            repeat,
+        )
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "lightgbm": lightgbm.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run(sizes, only, repeat):
+    results = {}
+    for name, (fn, max_rows) in CASES.items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        for n_rows in sizes:
+            if max_rows is not None and n_rows > max_rows:
+                continue
+            measured = fn(n_rows, repeats_for(n_rows, repeat))
+            if measured is None:
+                continue
+            if not isinstance(measured, dict):
+                measured = {name: measured}
+            for label, seconds in measured.items():
+                results.setdefault(label, {})[str(n_rows)] = seconds
+                print(
+                    f"{label:<45} {n_rows:>11,} {seconds:>10.4f} s"
+                    f" {n_rows / seconds:>14,.0f} linhas/s",
+                    flush=True,
+                )
+    return results
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """
+    Lista os casos mais lentos que o baseline além do limite.
+    """
+    regressions = []
+    print(f"\n{'caso':<45} {'linhas':>11} {'baseline':>10} {'atual':>10} {'razão':>7}")
+    for label, by_size in results.items():
+        for size, seconds in by_size.items():
+            base = baseline.get("results", {}).get(label, {}).get(size)
+            if base is None:
+                continue
+            ratio = seconds / base
+            # Tempos muito curtos são dominados por ruído
+            regressed = ratio > 1 + threshold and base >= min_seconds
+            flag = "  REGRESSÃO" if regressed else ""
+            print(
+                f"{label:<45} {int(size):>11,} {base:>10.4f} {seconds:>10.4f}"
+                f" {ratio:>7.2f}{flag}"
+            )
+            if regressed:
+                regressions.append((label, size, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--full",
+        action="store_const",
+        dest="sizes",
+        const=FULL_SIZES,
+        help="Inclui lotes de 1M e 10M linhas",
+    )
+    parser.add_argument("--only", nargs="+", help="Prefixos dos casos a rodar")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Arquivo de resultados (padrão: results/)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--min-seconds", type=float, default=0.001)
+    args = parser.parse_args()
+
+    report = {
+        "meta": metadata(),
+        "results": run(sorted(args.sizes), args.only, args.repeat),
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados salvos em {output}")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline salvo em {BASELINE_PATH}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(
+            report["results"], baseline, args.threshold, args.min_seconds
+        )
+        if regressions:
+            print(f"\n{len(regressions)} regressões acima de {args.threshold:.0%}")
+            sys.exit(1)
+        print("\nSem regressões.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from thresholds import REVENUE_RATE, profit_curve, profit_from_prediction
+
+# Colunas fora do perfil dos dados mostrado no dashboard
+PROFILE_EXCLUDE = [
+    "fraude",
+    "score_fraude_modelo",
+    "produto",
+    "categoria_produto",
+    "data_compra",
+]
+
+
+def aggregates_path(predictions_path):
+    """
+    Arquivo de agregados gravado ao lado de um arquivo de predições.
+    """
+    return f"{os.path.splitext(str(predictions_path))[0]}_aggregates.json"
+
+
+class ScoringSummary:
+    """
+    Agregados compactos de um conjunto pontuado, para o dashboard.
+
+    Guarda histogramas de score por classe (contagem e valor das compras),
+    matriz de confusão, totais financeiros no threshold usado e o perfil das
+    colunas de entrada (nulos, somas para médias e contagem de categorias).
+    É atualizado bloco a bloco e mesclável, como o MetricsAccumulator.
+    """
+
+    def __init__(self, threshold, n_bins=1000, revenue_rate=REVENUE_RATE):
+        self.threshold = threshold
+        self.revenue_rate = revenue_rate
+        self.n_rows = 0
+        self.labeled = False
+        self.score_counts = np.zeros((2, n_bins), dtype=np.int64)
+        self.score_amounts = np.zeros((2, n_bins))
+        self.confusion = np.zeros((2, 2), dtype=np.int64)
+        self.fraud_losses = 0.0
+        self.revenues = 0.0
+        self.nulls = {}
+        self.sums = {}
+        self.categories = {}
+
+    @property
+    def n_bins(self):
+        return self.score_counts.shape[1]
+
+    def update(self, X, y_true, y_pred, y_proba):
+        """
+        Acumula um bloco: features de entrada, rótulos (ou None) e predições.
+        """
+        y_pred = np.asarray(y_pred, dtype=np.int64)
+        self.n_rows += len(y_pred)
+
+        # Sem rótulos, os scores entram todos na linha da classe 0
+        labels = np.zeros(len(y_pred), dtype=np.int64)
+        if y_true is not None:
+            labels = np.asarray(y_true, dtype=np.int64)
+            self.labeled = True
+            np.add.at(self.confusion, (labels, y_pred), 1)
+            fraud_losses, revenues, _ = profit_from_prediction(
+                labels, y_pred, X["valor_compra"], self.revenue_rate
+            )
+            self.fraud_losses += fraud_losses
+            self.revenues += revenues
+
+        bins = np.minimum(
+            (np.asarray(y_proba) * self.n_bins).astype(np.int64), self.n_bins - 1
+        )
+        amount = X["valor_compra"].to_numpy(dtype=np.float64)
+        for label in (0, 1):
+            mask = labels == label
+            self.score_counts[label] += np.bincount(bins[mask], minlength=self.n_bins)
+            self.score_amounts[label] += np.bincount(
+                bins[mask], weights=amount[mask], minlength=self.n_bins
+            )
+
+        for col in X.columns.drop(PROFILE_EXCLUDE, errors="ignore"):
+            values = X[col]
+            self.nulls[col] = self.nulls.get(col, 0) + int(values.isna().sum())
+            if pd.api.types.is_numeric_dtype(values):
+                self.sums[col] = self.sums.get(col, 0.0) + float(values.sum())
+            else:
+                counts = self.categories.setdefault(col, {})
+                for value, count in values.value_counts().items():
+                    counts[str(value)] = counts.get(str(value), 0) + int(count)
+        return self
+
+    def merge(self, other):
+        self.n_rows += other.n_rows
+        self.labeled = self.labeled or other.labeled
+        self.score_counts += other.score_counts
+        self.score_amounts += other.score_amounts
+        self.confusion += other.confusion
+        self.fraud_losses += other.fraud_losses
+        self.revenues += other.revenues
+        for target, source in [(self.nulls, other.nulls), (self.sums, other.sums)]:
+            for col, value in source.items():
+                target[col] = target.get(col, 0) + value
+        for col, counts in other.categories.items():
+            merged = self.categories.setdefault(col, {})
+            for value, count in counts.items():
+                merged[value] = merged.get(value, 0) + count
+        return self
+
+    def score_histogram(self, n_bins=100):
+        """
+        Contagem de scores em `n_bins` faixas iguais entre 0 e 1.
+        """
+        counts = self.score_counts.sum(axis=0).reshape(n_bins, -1).sum(axis=1)
+        edges = np.linspace(0, 1, n_bins + 1)
+        return pd.DataFrame({"score": (edges[:-1] + edges[1:]) / 2, "count": counts})
+
+    def means(self):
+        """
+        Média de cada coluna numérica, ignorando nulos como no pandas.
+        """
+        return pd.Series(
+            {
+                col: total / max(self.n_rows - self.nulls[col], 1)
+                for col, total in self.sums.items()
+            },
+            dtype=np.float64,
+        )
+
+    def proportions(self, col):
+        counts = pd.Series(self.categories.get(col, {}), dtype=np.float64)
+        return counts / counts.sum()
+
+    def profit_curve(self):
+        """
+        Curva de lucro nas bordas dos bins do histograma de scores.
+        """
+        upper_edges = np.arange(1, self.n_bins + 1) / self.n_bins
+        return profit_curve(
+            np.repeat([0, 1], self.n_bins),
+            np.tile(upper_edges, 2),
+            self.score_amounts.ravel(),
+            revenue_rate=self.revenue_rate,
+            weights=self.score_counts.ravel(),
+        )
+
+    def to_dict(self):
+        return {
+            "threshold": self.threshold,
+            "revenue_rate": self.revenue_rate,
+            "n_rows": self.n_rows,
+            "labeled": self.labeled,
+            "score_counts": self.score_counts.tolist(),
+            "score_amounts": self.score_amounts.tolist(),
+            "confusion": self.confusion.tolist(),
+            "fraud_losses": self.fraud_losses,
+            "revenues": self.revenues,
+            "nulls": self.nulls,
+            "sums": self.sums,
+            "categories": self.categories,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls(
+            data["threshold"],
+            n_bins=len(data["score_counts"][0]),
+            revenue_rate=data["revenue_rate"],
+        )
+        summary.n_rows = data["n_rows"]
+        summary.labeled = data["labeled"]
+        summary.score_counts = np.asarray(data["score_counts"], dtype=np.int64)
+        summary.score_amounts = np.asarray(data["score_amounts"], dtype=np.float64)
+        summary.confusion = np.asarray(data["confusion"], dtype=np.int64)
+        summary.fraud_losses = data["fraud_losses"]
+        summary.revenues = data["revenues"]
+        summary.nulls = data["nulls"]
+        summary.sums = data["sums"]
+        summary.categories = data["categories"]
+        return summary
+
+    def save(self, path):
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(f"{path}.tmp", path)
+        print(f"Agregados salvos em: {path}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
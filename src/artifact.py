@@ -0,0 +1,157 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import joblib
+import lightgbm as lgb
+from config import DECISION_THRESHOLD
+from features import ensure_category_grouper
+from scoring import CompiledScorer
+
+# Versão do formato; muda quando o layout dos arquivos deixa de ser compatível
+ARTIFACT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+BOOSTER_FILE = "booster.txt"
+SPEC_FILE = "preprocessing.json"
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_artifact(pipeline, output_dir, threshold=None):
+    """
+    Exporta um pipeline treinado como artefato versionado.
+
+    O diretório recebe o booster no formato texto nativo do LightGBM, o
+    pré-processamento compilado em JSON e um manifesto com schema, checksums
+    e, se informado, o threshold de decisão.
+    """
+    scorer = CompiledScorer.from_pipeline(pipeline)
+    output_dir = str(output_dir)
+    tmp_dir = f"{output_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    scorer.booster.save_model(os.path.join(tmp_dir, BOOSTER_FILE))
+    with open(os.path.join(tmp_dir, SPEC_FILE), "w", encoding="utf-8") as f:
+        json.dump(scorer.to_spec(), f)
+
+    manifest = {
+        "format_version": ARTIFACT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "lightgbm_version": lgb.__version__,
+        "schema": {
+            "input": scorer.input_schema(),
+            "features": scorer.feature_names,
+        },
+        "files": {
+            name: sha256_file(os.path.join(tmp_dir, name))
+            for name in [BOOSTER_FILE, SPEC_FILE]
+        },
+    }
+    if threshold is not None:
+        manifest["decision"] = {"threshold": threshold}
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Troca o diretório inteiro de uma vez para nunca expor um artefato parcial
+    if os.path.exists(output_dir):
+        old_dir = f"{output_dir}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(output_dir, old_dir)
+        os.replace(tmp_dir, output_dir)
+        shutil.rmtree(old_dir)
+    else:
+        os.replace(tmp_dir, output_dir)
+    return manifest
+
+
+def read_manifest(artifact_dir):
+    """
+    Lê e valida o manifesto de um artefato.
+    """
+    with open(os.path.join(artifact_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    version = manifest.get("format_version")
+    if version != ARTIFACT_VERSION:
+        raise ValueError(
+            f"Versão de artefato não suportada: {version} "
+            f"(esperada {ARTIFACT_VERSION})"
+        )
+    return manifest
+
+
+def write_threshold(artifact_dir, threshold, summary=None):
+    """
+    Grava o threshold de decisão (e um resumo da curva) no manifesto.
+
+    O manifesto é substituído de uma vez; como a versão do modelo é o hash
+    dele, a API trata a mudança de threshold como uma versão nova.
+    """
+    manifest = read_manifest(artifact_dir)
+    manifest["decision"] = {"threshold": threshold}
+    if summary:
+        manifest["decision"]["summary"] = {k: float(v) for k, v in summary.items()}
+
+    path = os.path.join(artifact_dir, MANIFEST_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return manifest
+
+
+def read_threshold(path):
+    """
+    Threshold de decisão de um modelo: o do manifesto do artefato ou o padrão.
+    """
+    path = str(path)
+    if not os.path.isdir(path):
+        return DECISION_THRESHOLD
+    return read_manifest(path).get("decision", {}).get("threshold", DECISION_THRESHOLD)
+
+
+def load_artifact(artifact_dir, verify=True, num_threads=0):
+    """
+    Carrega um artefato como CompiledScorer, sem desserializar o pipeline.
+
+    Com `verify=True`, confere os checksums e o schema de features do booster.
+    """
+    artifact_dir = str(artifact_dir)
+    manifest = read_manifest(artifact_dir)
+    if verify:
+        for name, expected in manifest["files"].items():
+            if sha256_file(os.path.join(artifact_dir, name)) != expected:
+                raise ValueError(f"Checksum inválido no artefato: {name}")
+
+    with open(os.path.join(artifact_dir, SPEC_FILE), encoding="utf-8") as f:
+        spec = json.load(f)
+    booster = lgb.Booster(model_file=os.path.join(artifact_dir, BOOSTER_FILE))
+
+    if verify and booster.feature_name() != manifest["schema"]["features"]:
+        raise ValueError("Features do booster divergem do schema do artefato")
+    return CompiledScorer.from_spec(spec, booster, num_threads=num_threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exporta um pipeline treinado (.pkl) como artefato versionado."
+    )
+    parser.add_argument("model", help="Pipeline salvo com joblib")
+    parser.add_argument("output", help="Diretório do artefato")
+    args = parser.parse_args()
+
+    pipeline = ensure_category_grouper(joblib.load(args.model))
+    save_artifact(pipeline, args.output)
+    print(f"Artefato salvo em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
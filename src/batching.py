@@ -0,0 +1,119 @@
+import asyncio
+import time
+import numpy as np
+from metrics import BATCH_SIZE_BUCKETS, Histogram
+
+
+class MicroBatcher:
+    """
+    Agrupa requisições concorrentes em uma única chamada de scoring.
+
+    Os registros de cada requisição entram em uma fila. O lote é enviado quando
+    atinge `max_batch_size` linhas ou quando `max_wait_ms` se esgota desde a
+    primeira requisição da fila, e cada chamador recebe só as suas
+    probabilidades de volta.
+    """
+
+    def __init__(
+        self, score_fn, max_batch_size=64, max_wait_ms=2.0, registry=None, prefix=""
+    ):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_size = Histogram(
+            f"{prefix}batch_size_rows",
+            "Linhas por lote enviado ao modelo.",
+            BATCH_SIZE_BUCKETS,
+        )
+        self.queue_wait = Histogram(
+            f"{prefix}batch_queue_wait_seconds",
+            "Tempo de espera na fila antes do envio do lote.",
+        )
+        if registry is not None:
+            registry.register(self.batch_size)
+            registry.register(self.queue_wait)
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        """
+        Inicia a tarefa de envio no event loop atual, se ainda não existir.
+        """
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, records):
+        """
+        Enfileira os registros de uma requisição e aguarda as probabilidades.
+        """
+        if len(records) == 0:
+            return np.empty(0, dtype=np.float64)
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((records, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        """
+        Monta o próximo lote respeitando o tamanho e o tempo máximos.
+        """
+        batch = [await self._queue.get()]
+        n_rows = len(batch[0][0])
+        deadline = batch[0][2] + self.max_wait
+
+        while n_rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                if timeout <= 0:
+                    item = self._queue.get_nowait()
+                else:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch, n_rows
+
+    async def _run(self):
+        while True:
+            batch, n_rows = await self._collect()
+
+            flushed_at = time.perf_counter()
+            self.batch_size.observe(n_rows)
+            for _, _, enqueued_at in batch:
+                self.queue_wait.observe(flushed_at - enqueued_at)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        records = [record for item in batch for record in item[0]]
+        try:
+            proba = await self._loop.run_in_executor(None, self.score_fn, records)
+        except Exception:  # pylint: disable=broad-except
+            # Um registro inválido não deve derrubar os demais chamadores
+            await self._flush_each(batch)
+            return
+
+        start = 0
+        for item_records, future, _ in batch:
+            end = start + len(item_records)
+            if not future.done():
+                future.set_result(proba[start:end])
+            start = end
+
+    async def _flush_each(self, batch):
+        for item_records, future, _ in batch:
+            try:
+                proba = await self._loop.run_in_executor(
+                    None, self.score_fn, item_records
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(proba)
@@ -0,0 +1,109 @@
+import numpy as np
+import orjson
+import pandas as pd
+
+# Campos de entrada e tipos, os mesmos do DataItem da API
+FIELDS = {
+    "score_1": "int",
+    "score_2": "float",
+    "score_3": "float",
+    "score_4": "float",
+    "score_5": "float",
+    "score_6": "float",
+    "pais": "str",
+    "score_7": "int",
+    "categoria_produto": "str",
+    "score_8": "float",
+    "score_9": "float",
+    "score_10": "float",
+    "entrega_doc_1": "int",
+    "entrega_doc_2": "optional_str",
+    "entrega_doc_3": "optional_str",
+    "valor_compra": "float",
+}
+
+
+def _validate_column(name, values, kind):
+    """
+    Valida uma coluna inteira de uma vez e a converte em array NumPy.
+    """
+    if kind in ("str", "optional_str"):
+        inferred = pd.api.types.infer_dtype(values, skipna=kind == "optional_str")
+        if inferred not in ("string", "empty"):
+            raise ValueError(f"Campo {name!r}: esperado texto, recebido {inferred}")
+        return np.asarray(values, dtype=object)
+
+    try:
+        array = np.asarray(values)
+    except ValueError as e:  # Listas aninhadas de tamanhos diferentes
+        raise ValueError(f"Campo {name!r}: esperada uma lista de valores") from e
+    if array.ndim != 1:
+        raise ValueError(f"Campo {name!r}: esperada uma lista de valores")
+    if array.dtype.kind not in "iuf":
+        raise ValueError(f"Campo {name!r}: esperados números sem valores nulos")
+    if kind == "int" and array.dtype.kind == "f":
+        if not (np.isfinite(array).all() and (array == np.floor(array)).all()):
+            raise ValueError(f"Campo {name!r}: esperados números inteiros")
+        array = array.astype(np.int64)
+    if kind == "float":
+        array = array.astype(np.float64, copy=False)
+    return array
+
+
+def decode_columnar(body):
+    """
+    Decodifica uma requisição `{"data": {campo: [valores, ...]}}`.
+
+    Retorna as colunas como arrays NumPy e o número de linhas. Erros de
+    formato ou de tipo levantam ValueError.
+    """
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"JSON inválido: {e}") from e
+
+    data = payload.get("data") if isinstance(payload, dict) else None
+    if not isinstance(data, dict):
+        raise ValueError('Formato esperado: {"data": {"campo": [valores, ...]}}')
+
+    missing = [name for name in FIELDS if name not in data]
+    if missing:
+        raise ValueError(f"Campos ausentes: {missing}")
+    if not all(isinstance(data[name], list) for name in FIELDS):
+        raise ValueError("Cada campo deve ser uma lista de valores")
+    lengths = {len(data[name]) for name in FIELDS}
+    if len(lengths) > 1:
+        raise ValueError("Todas as colunas devem ter o mesmo tamanho")
+
+    columns = {
+        name: _validate_column(name, data[name], kind) for name, kind in FIELDS.items()
+    }
+    return columns, lengths.pop()
+
+
+def records_to_columns(records):
+    """
+    Converte uma lista de registros em colunas validadas como em
+    `decode_columnar`. Campos ausentes contam como nulos.
+    """
+    if not all(isinstance(record, dict) for record in records):
+        raise ValueError("Cada registro deve ser um objeto JSON")
+    columns = {
+        name: _validate_column(name, [record.get(name) for record in records], kind)
+        for name, kind in FIELDS.items()
+    }
+    return columns, len(records)
+
+
+def encode_columnar(y_pred, y_proba, model_version):
+    """
+    Serializa a resposta colunar direto dos arrays NumPy.
+    """
+    return orjson.dumps(
+        {
+            "prediction": y_pred,
+            "probability": y_proba,
+            "model_version": model_version,
+        },
+        option=orjson.OPT_SERIALIZE_NUMPY,
+    )
@@ -7,14 +7,26 @@ PROJECT_DIR = (
 DATA_DIR = PROJECT_DIR / "data"
 RAW_DIR = DATA_DIR / "raw"
 PROCESSED_DIR = DATA_DIR / "processed"
+CACHE_DIR = DATA_DIR / "cache"
+MONITORING_DIR = DATA_DIR / "monitoring"
 MODELS_DIR = PROJECT_DIR / "models"
 
 # Caminhos para arquivos específicos
 RAW_DATA_PATH = RAW_DIR / "dados.xlsx"
-TRAIN_DATA_PATH = PROCESSED_DIR / "train.csv"
-TEST_DATA_PATH = PROCESSED_DIR / "test.csv"
+RAW_CACHE_PATH = CACHE_DIR / "dados.arrow"
+CACHE_MANIFEST_PATH = CACHE_DIR / "manifest.json"
+DATASET_CACHE_DIR = CACHE_DIR / "lgb_datasets"
+TRAIN_DATA_PATH = PROCESSED_DIR / "train.arrow"
+TEST_DATA_PATH = PROCESSED_DIR / "test.arrow"
 MODEL_PATH = MODELS_DIR / "model_pipeline.pkl"
+ARTIFACT_PATH = MODELS_DIR / "model_artifact"
+MODEL_PARAMS_PATH = MODELS_DIR / "model_params.json"
 PREDICTIONS_PATH = PROCESSED_DIR / "result_with_predictions.csv"
 PREDICTIONS_PATH_TRAIN = PROCESSED_DIR / "result_with_predictions_train.csv"
 PREDICTIONS_FILE = PROCESSED_DIR / "metrics.txt"
 PREDICTIONS_FILE_TRAIN = PROCESSED_DIR / "metrics_train.txt"
+EXPLANATIONS_PATH = PROCESSED_DIR / "explanations.csv"
+EXPLANATIONS_PATH_TRAIN = PROCESSED_DIR / "explanations_train.csv"
+
+# Threshold de bloqueio usado quando o artefato não traz um calibrado
+DECISION_THRESHOLD = 0.61
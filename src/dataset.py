@@ -1,14 +1,222 @@
+import hashlib
+import json
+import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from sklearn.model_selection import train_test_split
-from config import RAW_DATA_PATH, TRAIN_DATA_PATH, TEST_DATA_PATH
+from config import (
+    CACHE_MANIFEST_PATH,
+    RAW_CACHE_PATH,
+    RAW_DATA_PATH,
+    TEST_DATA_PATH,
+    TRAIN_DATA_PATH,
+)
 from features import KFoldTargetEncoder
 
+# Schema explícito das colunas conhecidas; as demais têm o tipo inferido
+SCHEMA = {
+    "score_1": pa.int64(),
+    **{f"score_{i}": pa.float64() for i in range(2, 11) if i != 7},
+    "score_7": pa.int64(),
+    "pais": pa.string(),
+    "categoria_produto": pa.string(),
+    "entrega_doc_1": pa.int64(),
+    "entrega_doc_2": pa.string(),
+    "entrega_doc_3": pa.string(),
+    "valor_compra": pa.float64(),
+    "data_compra": pa.timestamp("ns"),
+    "produto": pa.string(),
+    "score_fraude_modelo": pa.float64(),
+    "fraude": pa.int64(),
+    "categoria_produto_Kfold_Target_Enc": pa.float64(),
+}
 
-def load_data(input_path=RAW_DATA_PATH):
+# Tamanho dos record batches gravados, usado também na leitura em blocos
+BATCH_SIZE = 100_000
+
+# Versão do target encoding gravado nos splits; mude ao alterar o
+# KFoldTargetEncoder para o main refazer os splits em cache
+SPLITS_VERSION = 1
+
+
+def file_fingerprint(path, previous=None):
+    """
+    Identifica o conteúdo de um arquivo pelo tamanho, mtime e SHA-256.
+
+    Se tamanho e mtime batem com `previous`, o hash não é recalculado.
+    """
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if previous and all(previous.get(k) == v for k, v in fingerprint.items()):
+        return previous
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+def _same_content(a, b):
+    return a is not None and b is not None and a.get("sha256") == b.get("sha256")
+
+
+def read_manifest(manifest_path=CACHE_MANIFEST_PATH):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(manifest, manifest_path=CACHE_MANIFEST_PATH):
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def to_table(df):
+    """
+    Converte um DataFrame em tabela Arrow com o schema explícito.
+    """
+    # Datas lidas de CSV chegam como texto
+    for col, dtype in SCHEMA.items():
+        if pa.types.is_timestamp(dtype) and df.get(col, pd.Series()).dtype == object:
+            df = df.assign(**{col: pd.to_datetime(df[col])})
+
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    schema = pa.schema([pa.field(f.name, SCHEMA.get(f.name, f.type)) for f in inferred])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def write_data(df, output_path):
+    """
+    Salva um DataFrame em Arrow IPC (sem compressão, para leitura por mmap),
+    Parquet ou CSV, conforme a extensão.
+    """
+    output_path = str(output_path)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    if output_path.endswith(".csv"):
+        df.to_csv(output_path, index=False)
+        return
+
+    table = to_table(df)
+    if output_path.endswith(".parquet"):
+        pq.write_table(table, output_path, row_group_size=BATCH_SIZE)
+        return
+
+    # Grava em arquivo temporário para nunca deixar um cache pela metade
+    tmp_path = f"{output_path}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=BATCH_SIZE):
+                writer.write_batch(batch)
+    os.replace(tmp_path, output_path)
+
+
+def read_data(input_path, columns=None):
+    """
+    Lê um arquivo de dados, carregando só as colunas pedidas.
+
+    Arquivos Arrow IPC e Parquet são lidos por memory map.
+    """
+    input_path = str(input_path)
+    if input_path.endswith(".csv"):
+        return pd.read_csv(input_path, usecols=columns)
+    if input_path.endswith(".parquet"):
+        return pq.read_table(input_path, columns=columns, memory_map=True).to_pandas()
+
+    reader = pa.ipc.open_file(pa.memory_map(input_path, "r"))
+    table = reader.read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas()
+
+
+def data_columns(input_path):
+    """
+    Nomes das colunas de um arquivo de dados, sem carregar os dados.
+    """
+    input_path = str(input_path)
+    if input_path.endswith(".csv"):
+        return list(pd.read_csv(input_path, nrows=0).columns)
+    if input_path.endswith(".parquet"):
+        return pq.read_schema(input_path).names
+    return pa.ipc.open_file(pa.memory_map(input_path, "r")).schema.names
+
+
+def iter_data_chunks(input_path, chunksize, columns=None):
+    """
+    Lê um arquivo de dados em blocos de até `chunksize` linhas.
+    """
+    input_path = str(input_path)
+    if input_path.endswith(".csv"):
+        yield from pd.read_csv(input_path, chunksize=chunksize, usecols=columns)
+        return
+
+    if input_path.endswith(".parquet"):
+        batches = pq.ParquetFile(input_path, memory_map=True).iter_batches(
+            batch_size=chunksize, columns=columns
+        )
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(input_path, "r"))
+        batches = (
+            reader.get_batch(i).select(columns) if columns else reader.get_batch(i)
+            for i in range(reader.num_record_batches)
+        )
+
+    pending = []
+    pending_rows = 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunksize:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunksize).to_pandas()
+            pending = table.slice(chunksize).to_batches()
+            pending_rows -= chunksize
+    if pending_rows:
+        yield pa.Table.from_batches(pending).to_pandas()
+
+
+def cache_raw_data(
+    input_path=RAW_DATA_PATH,
+    cache_path=RAW_CACHE_PATH,
+    manifest_path=CACHE_MANIFEST_PATH,
+):
+    """
+    Converte o Excel bruto em Arrow IPC uma única vez.
+
+    O cache é refeito automaticamente quando o conteúdo do arquivo de origem
+    muda. Retorna o manifesto atualizado.
+    """
+    manifest = read_manifest(manifest_path)
+    cached = manifest.get("raw", {})
+    fingerprint = file_fingerprint(input_path, cached.get("fingerprint"))
+
+    if os.path.exists(cache_path) and _same_content(
+        fingerprint, cached.get("fingerprint")
+    ):
+        if fingerprint is not cached.get("fingerprint"):
+            manifest["raw"]["fingerprint"] = fingerprint
+            write_manifest(manifest, manifest_path)
+        return manifest
+
+    write_data(pd.read_excel(input_path), cache_path)
+    manifest["raw"] = {"source": str(input_path), "fingerprint": fingerprint}
+    manifest.pop("splits", None)  # Os splits dependem do dado bruto
+    write_manifest(manifest, manifest_path)
+    print(f"Cache do dado bruto atualizado: {cache_path}")
+    return manifest
+
+
+def load_data(input_path=RAW_DATA_PATH, columns=None):
     """
     Carrega os dados e retorna um DataFrame
     """
-    return pd.read_excel(input_path)
+    cache_raw_data(input_path)
+    return read_data(RAW_CACHE_PATH, columns=columns)
 
 
 def split_df(df, test_size=0.2, random_state=42):
@@ -22,21 +230,43 @@ def save_splits(
     df_train, df_test, train_path=TRAIN_DATA_PATH, test_path=TEST_DATA_PATH
 ):
     """
-    Salva os conjuntos de treino e teste em arquivos CSV
+    Salva os conjuntos de treino e teste no formato dado pela extensão
     """
-    df_train.to_csv(train_path, index=False)
-    df_test.to_csv(test_path, index=False)
+    write_data(df_train, train_path)
+    write_data(df_test, test_path)
 
 
-def main():
-    df = load_data()
-    df_train, df_test = split_df(df)
-
+def main(test_size=0.2, random_state=42):
+    manifest = cache_raw_data()
     targetc = KFoldTargetEncoder()
-    df_train = targetc.fit_transform(df_train)
+    # Os splits em cache valem para o mesmo dado, divisão e target encoding
+    encoder_params = targetc.get_params()
+    encoder_params.pop("n_jobs")  # Não muda o resultado
+    splits = {
+        "raw_sha256": manifest["raw"]["fingerprint"]["sha256"],
+        "test_size": test_size,
+        "random_state": random_state,
+        "target_encoder": {"version": SPLITS_VERSION, **encoder_params},
+    }
+    if (
+        manifest.get("splits") == splits
+        and os.path.exists(TRAIN_DATA_PATH)
+        and os.path.exists(TEST_DATA_PATH)
+    ):
+        print(
+            f"Splits já atualizados.\nTreino: {TRAIN_DATA_PATH}\nTeste: {TEST_DATA_PATH}"
+        )
+        return
+
+    df = read_data(RAW_CACHE_PATH)
+    df_train, df_test = split_df(df, test_size=test_size, random_state=random_state)
+
+    df_train = targetc.fit_transform(df_train, df_train["fraude"])
     df_test = targetc.transform(df_test)
 
     save_splits(df_train, df_test)
+    manifest["splits"] = splits
+    write_manifest(manifest)
 
     print(f"Dados divididos.\nTreino: {TRAIN_DATA_PATH}\nTeste: {TEST_DATA_PATH}")
 
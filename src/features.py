@@ -1,55 +1,433 @@
 import pandas as pd
 import numpy as np
-from sklearn.base import BaseEstimator, TransformerMixin
+import scipy.sparse as sp
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator, ClassifierMixin, TransformerMixin, clone
 from sklearn.model_selection import KFold
 from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder
 
+# Mapeamentos do DataProcessor
+PAISES = ["BR", "AR"]
+PAIS_OUTROS = "Outros"
+DOC_ENTREGUE = "Y"
+
+# Features derivadas de outro campo de entrada, para as explicações
+DERIVED_FIELDS = {"is_missing": "entrega_doc_2"}
+TARGET_SUFFIX = "_Kfold_Target_Enc"
+
+
+class FeatureBuffer:
+    """
+    Buffer colunar pré-alocado compartilhado pelas etapas do pipeline.
+
+    As colunas de entrada são lidas do DataFrame original sem cópia. Cada etapa
+    escreve as suas colunas de saída direto na matriz `values`, já no layout de
+    features do modelo; colunas intermediárias (ex.: 'pais' processado) ficam em
+    `columns` até serem consumidas.
+    """
+
+    def __init__(self, X, feature_names, dtype=np.float64):
+        self.source = X
+        self.feature_names = list(feature_names)
+        self.index = {name: j for j, name in enumerate(self.feature_names)}
+        self.values = np.empty((len(X), len(self.feature_names)), dtype=dtype)
+        self.columns = {}
+        self._written = set()
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def get(self, col):
+        """
+        Retorna a versão mais recente de uma coluna.
+        """
+        if col in self.columns:
+            return self.columns[col]
+        if col in self._written:
+            return self.values[:, self.index[col]]
+        return self.source[col].to_numpy()
+
+    def out(self, col):
+        """
+        Retorna a fatia da matriz onde a etapa deve escrever a feature `col`.
+        """
+        self._written.add(col)
+        self.columns.pop(col, None)
+        return self.values[:, self.index[col]]
+
+    def set(self, col, values):
+        if col in self.index:
+            self.out(col)[:] = values
+        else:
+            self.columns[col] = values
+
+    def finalize(self):
+        """
+        Copia as features que passam direto da entrada e retorna a matriz.
+        """
+        for col in self.feature_names:
+            if col not in self._written:
+                self.out(col)[:] = self.get(col)
+        self.columns.clear()
+        return self.values
+
+
+def transform_buffered(steps, X, feature_names, dtype=np.float64):
+    """
+    Executa as etapas de pré-processamento sobre um único FeatureBuffer.
+
+    Modo opcional, sem as cópias do DataFrame feitas por `transform`. Retorna a
+    matriz de features no layout `feature_names`.
+    """
+    buffer = FeatureBuffer(X, feature_names, dtype=dtype)
+    for step in steps:
+        step.transform_into(buffer)
+    return buffer.finalize()
+
+
+def transform_timed(steps, X, histogram):
+    """
+    Aplica as etapas `(nome, transformador)` em sequência, registrando a
+    duração de cada uma em `histogram`, com o nome da etapa como label.
+    """
+    for name, step in steps:
+        with histogram.labels(name).time():
+            X = step.transform(X)
+    return X
+
+
+class CategoryGrouper(BaseEstimator, TransformerMixin):
+    """
+    Agrupa como "Outros" as categorias menos frequentes no treino.
+
+    O vocabulário de categorias frequentes é aprendido no fit, então a
+    transformação não depende do tamanho do lote.
+    """
+
+    def __init__(self, colname="categoria_produto", min_threshold=1000, other="Outros"):
+        self.colname = colname
+        self.min_threshold = min_threshold
+        self.other = other
+
+    def fit(self, X, y=None):
+        categoria_counts = X[self.colname].value_counts()
+        self.vocabulary_ = frozenset(
+            categoria_counts[categoria_counts >= self.min_threshold].index
+        )
+        return self
+
+    def fit_chunks(self, chunks):
+        """
+        Mesmo vocabulário do fit, contando as categorias bloco a bloco.
+        """
+        counts = pd.Series(dtype=np.int64)
+        for X, _ in chunks():
+            counts = counts.add(X[self.colname].value_counts(), fill_value=0)
+        self.vocabulary_ = frozenset(counts[counts >= self.min_threshold].index)
+        return self
+
+    def transform(self, X):
+        X_copy = X.copy()
+        col = X_copy[self.colname]
+        X_copy[self.colname] = col.where(
+            col.isin(self.vocabulary_) | col.isna(), self.other
+        )
+        return X_copy
+
+    def transform_into(self, buffer):
+        col = pd.Series(buffer.get(self.colname), copy=False)
+        keep = col.isin(self.vocabulary_) | col.isna()
+        buffer.set(self.colname, col.where(keep, self.other).to_numpy())
+
+
+def _fold_encoding(codes, y, tr_idx, val_idx, n_categories):
+    """
+    Média do target por categoria nas linhas de treino do fold, aplicada às
+    linhas de validação (NaN para categorias ausentes do treino).
+    """
+    tr_codes = codes[tr_idx]
+    valid = tr_codes >= 0
+    sums = np.bincount(
+        tr_codes[valid], weights=y[tr_idx][valid], minlength=n_categories
+    )
+    counts = np.bincount(tr_codes[valid], minlength=n_categories)
+
+    val_codes = codes[val_idx]
+    encoded = np.full(len(val_idx), np.nan)
+    seen = val_codes >= 0
+    seen[seen] = counts[val_codes[seen]] > 0
+    encoded[seen] = sums[val_codes[seen]] / counts[val_codes[seen]]
+    return encoded
+
+
+def _out_of_fold_map(fold_sums, fold_counts, folds, default):
+    """
+    Encoding de cada categoria: média do target fora do fold escolhido para
+    ela em `folds` (`default` sem linhas fora desse fold).
+    """
+    sums, counts = fold_sums.to_numpy(), fold_counts.to_numpy()
+    rows = np.arange(len(sums))
+    chosen = folds.reindex(fold_sums.index).to_numpy()
+    out_sums = sums.sum(axis=1) - sums[rows, chosen]
+    out_counts = counts.sum(axis=1) - counts[rows, chosen]
+    values = np.full(len(rows), default, dtype=np.float64)
+    np.divide(out_sums, out_counts, out=values, where=out_counts > 0)
+    return dict(zip(fold_sums.index, values))
+
+
+def _fold_tables(codes, folds, y, categories, n_folds):
+    """
+    Somas e contagens do target por (categoria, fold), uma linha por
+    categoria; códigos negativos (nulos) ficam de fora.
+    """
+    known = codes >= 0
+    index = codes[known] * n_folds + folds[known]
+    size = len(categories) * n_folds
+    sums = np.bincount(index, weights=y[known], minlength=size)
+    counts = np.bincount(index, minlength=size)
+    return (
+        pd.DataFrame(sums.reshape(-1, n_folds), index=categories),
+        pd.DataFrame(counts.reshape(-1, n_folds), index=categories),
+    )
+
 
 class KFoldTargetEncoder(BaseEstimator, TransformerMixin):
     """
     Aplica K-Fold Target Encoding para variáveis categóricas.
+
+    As categorias de cada coluna são fatoradas uma única vez e as médias fora
+    do fold são calculadas com somas e contagens por código inteiro. Com
+    `n_jobs`, os pares (coluna, fold) rodam em paralelo.
+
+    As somas e contagens do target por categoria e fold ficam guardadas,
+    junto do fold de onde veio o encoding de cada categoria, então
+    `partial_fit` incorpora lotes novos sem rever os dados do fit e recalcula
+    todas as categorias com a mesma média fora do fold.
     """
 
-    def __init__(self, colnames="categoria_produto", n_fold=5):
+    def __init__(self, colnames="categoria_produto", n_fold=5, n_jobs=None):
         self.colnames = colnames
         self.n_fold = n_fold
+        self.n_jobs = n_jobs
+
+    def __setstate__(self, state):
+        # Artefatos anteriores: uma única coluna em encoding_map_ e sem n_jobs
+        state.setdefault("n_jobs", None)
+        if "encoding_map_" in state and "encoding_maps_" not in state:
+            state["encoding_maps_"] = {state["colnames"]: state["encoding_map_"]}
+        super().__setstate__(state)
+
+    @property
+    def columns_(self):
+        if isinstance(self.colnames, str):
+            return [self.colnames]
+        return list(self.colnames)
 
     def fit(self, X, y=None):
+        y = np.asarray(y, dtype=np.float64)
         self.global_mean_ = y.mean()
-        self.encoding_map_ = {}
 
         kf = KFold(n_splits=self.n_fold, shuffle=True, random_state=42)
-        X_temp = X.copy()
-        X_temp["__target__"] = y
-
-        col_mean_name = f"{self.colnames}_Kfold_Target_Enc"
-        X_temp[col_mean_name] = np.nan
-
-        for tr_idx, val_idx in kf.split(X_temp):
-            X_tr, X_val = X_temp.iloc[tr_idx], X_temp.iloc[val_idx]
-            encoding = X_tr.groupby(self.colnames)["__target__"].mean()
-            X_temp.loc[X_val.index, col_mean_name] = X_val[self.colnames].map(encoding)
-
-        X_temp[col_mean_name].fillna(self.global_mean_, inplace=True)
-        self.encoding_map_ = (
-            X_temp[[self.colnames, col_mean_name]]
-            .dropna()
-            .drop_duplicates()
-            .set_index(self.colnames)
-            .to_dict()[col_mean_name]
+        folds = list(kf.split(np.empty((len(y), 1))))
+
+        factorized = {col: pd.factorize(X[col]) for col in self.columns_}
+        tasks = [(col, fold) for col in self.columns_ for fold in range(len(folds))]
+        results = Parallel(n_jobs=self.n_jobs)(
+            delayed(_fold_encoding)(
+                factorized[col][0], y, *folds[fold], len(factorized[col][1])
+            )
+            for col, fold in tasks
+        )
+
+        out_of_fold = {col: np.empty(len(y)) for col in self.columns_}
+        for (col, fold), encoded in zip(tasks, results):
+            out_of_fold[col][folds[fold][1]] = encoded
+        row_folds = np.empty(len(y), dtype=np.int64)
+        for fold, (_, val_idx) in enumerate(folds):
+            row_folds[val_idx] = fold
+
+        self.n_samples_ = len(y)
+        self.fold_sums_, self.fold_counts_, self.encoding_folds_ = {}, {}, {}
+        self.encoding_maps_ = {}
+        for col, (codes, categories) in factorized.items():
+            self.fold_sums_[col], self.fold_counts_[col] = _fold_tables(
+                codes, row_folds, y, categories, len(folds)
+            )
+
+            encoded = out_of_fold[col]
+            encoded[np.isnan(encoded)] = self.global_mean_
+
+            # Como no encoding original: pares (categoria, valor) únicos na
+            # ordem dos dados, ficando o último par de cada categoria
+            pairs = pd.DataFrame({"code": codes, "value": encoded, "fold": row_folds})
+            pairs = pairs[codes >= 0].drop_duplicates(["code", "value"])
+            last = pairs.groupby("code")[["value", "fold"]].last()
+            chosen = categories[last.index.to_numpy()]
+            self.encoding_maps_[col] = dict(zip(chosen, last["value"].to_numpy()))
+            self.encoding_folds_[col] = pd.Series(last["fold"].to_numpy(), chosen)
+
+        if isinstance(self.colnames, str):
+            self.encoding_map_ = self.encoding_maps_[self.colnames]
+
+        return self
+
+    def fit_chunks(self, chunks):
+        """
+        Mesmo resultado do fit, lendo os dados em blocos duas vezes.
+
+        A primeira leitura conta as linhas, o que fixa os folds do KFold. A
+        segunda soma o target por (categoria, fold) e guarda a primeira linha
+        de cada par, o que basta para escolher o valor de cada categoria como
+        o fit escolhe. Na memória ficam só o fold de cada linha e as tabelas
+        por categoria.
+        """
+        n_samples, target_total = 0, 0.0
+        for _, y in chunks():
+            n_samples += len(y)
+            target_total += np.sum(y, dtype=np.float64)
+        self.global_mean_ = target_total / n_samples
+
+        kf = KFold(n_splits=self.n_fold, shuffle=True, random_state=42)
+        row_folds = np.empty(n_samples, dtype=np.int64)
+        for fold, (_, val_idx) in enumerate(kf.split(np.empty((n_samples, 1)))):
+            row_folds[val_idx] = fold
+
+        sums = {col: [] for col in self.columns_}
+        counts = {col: [] for col in self.columns_}
+        first_rows = {col: [] for col in self.columns_}
+        offset = 0
+        for X, y in chunks():
+            y = np.asarray(y, dtype=np.float64)
+            folds = row_folds[offset : offset + len(y)]
+            rows = np.arange(offset, offset + len(y))
+            for col in self.columns_:
+                codes, categories = pd.factorize(X[col])
+                chunk_sums, chunk_counts = _fold_tables(
+                    codes, folds, y, categories, self.n_fold
+                )
+                sums[col].append(chunk_sums)
+                counts[col].append(chunk_counts)
+                known = codes >= 0
+                pairs = pd.Series(rows[known]).groupby(
+                    [categories[codes[known]], folds[known]]
+                )
+                first_rows[col].append(pairs.min())
+            offset += len(y)
+
+        self.n_samples_ = n_samples
+        self.fold_sums_, self.fold_counts_, self.encoding_folds_ = {}, {}, {}
+        self.encoding_maps_ = {}
+        for col in self.columns_:
+            fold_sums = pd.concat(sums[col]).groupby(level=0, sort=False).sum()
+            fold_counts = pd.concat(counts[col]).groupby(level=0, sort=False).sum()
+            first = pd.concat(first_rows[col]).groupby(level=[0, 1]).min()
+            self.fold_sums_[col], self.fold_counts_[col] = fold_sums, fold_counts
+
+            # Valor de cada par (categoria, fold) presente, como no fit
+            category, fold = first.index.get_level_values(
+                0
+            ), first.index.get_level_values(1)
+            out_sums = (
+                fold_sums.sum(axis=1)[category].to_numpy()
+                - fold_sums.to_numpy()[fold_sums.index.get_indexer(category), fold]
+            )
+            out_counts = (
+                fold_counts.sum(axis=1)[category].to_numpy()
+                - fold_counts.to_numpy()[fold_counts.index.get_indexer(category), fold]
+            )
+            values = np.full(len(first), self.global_mean_)
+            np.divide(out_sums, out_counts, out=values, where=out_counts > 0)
+
+            # Pares (categoria, valor) únicos na ordem da primeira linha, fica
+            # o último de cada categoria
+            pairs = pd.DataFrame(
+                {
+                    "category": category,
+                    "value": values,
+                    "fold": fold,
+                    "row": first.to_numpy(),
+                }
+            ).sort_values("row")
+            pairs = pairs.drop_duplicates(["category", "value"])
+            last = pairs.groupby("category", sort=False)[["value", "fold"]].last()
+            self.encoding_maps_[col] = dict(zip(last.index, last["value"].to_numpy()))
+            self.encoding_folds_[col] = last["fold"].astype(np.int64)
+
+        if isinstance(self.colnames, str):
+            self.encoding_map_ = self.encoding_maps_[self.colnames]
+
+        return self
+
+    def partial_fit(self, X, y):
+        """
+        Soma um lote novo às estatísticas do fit e recalcula o encoding de
+        todas as categorias como no fit: a média do target fora do fold de
+        cada uma, agora com todos os lotes.
+
+        As linhas do lote entram nos folds em rodízio; categorias novas usam o
+        fold da sua última linha.
+        """
+        if not hasattr(self, "fold_sums_"):
+            raise ValueError(
+                "Encoder treinado sem as somas do target; treine de novo com fit"
+            )
+        y = np.asarray(y, dtype=np.float64)
+        n_folds = self.fold_sums_[self.columns_[0]].shape[1]
+        row_folds = (self.n_samples_ + np.arange(len(y))) % n_folds
+        self.global_mean_ = (self.global_mean_ * self.n_samples_ + y.sum()) / (
+            self.n_samples_ + len(y)
         )
+        self.n_samples_ += len(y)
+
+        for col in self.columns_:
+            codes, categories = pd.factorize(X[col])
+            batch_sums, batch_counts = _fold_tables(
+                codes, row_folds, y, categories, n_folds
+            )
+            self.fold_sums_[col] = self.fold_sums_[col].add(batch_sums, fill_value=0)
+            self.fold_counts_[col] = self.fold_counts_[col].add(
+                batch_counts, fill_value=0
+            )
+
+            known = codes >= 0
+            last = pd.Series(row_folds[known]).groupby(codes[known]).last()
+            last.index = categories[last.index.to_numpy()]
+            folds = self.encoding_folds_[col]
+            self.encoding_folds_[col] = pd.concat(
+                [folds, last[~last.index.isin(folds.index)]]
+            )
 
+            # encoding_map_ é o mesmo dict, então também fica atualizado
+            encoding_map = self.encoding_maps_[col]
+            encoding_map.clear()
+            encoding_map.update(
+                _out_of_fold_map(
+                    self.fold_sums_[col],
+                    self.fold_counts_[col],
+                    self.encoding_folds_[col],
+                    self.global_mean_,
+                )
+            )
         return self
 
     def transform(self, X):
         X_copy = X.copy()
-        col_mean_name = f"{self.colnames}_Kfold_Target_Enc"
-        X_copy[col_mean_name] = (
-            X_copy[self.colnames].map(self.encoding_map_).fillna(self.global_mean_)
-        )
+        for col, encoding_map in self.encoding_maps_.items():
+            X_copy[f"{col}_Kfold_Target_Enc"] = (
+                X_copy[col].map(encoding_map).fillna(self.global_mean_)
+            )
         return X_copy
 
+    def transform_into(self, buffer):
+        for col, encoding_map in self.encoding_maps_.items():
+            values = pd.Series(buffer.get(col), copy=False)
+            buffer.set(
+                f"{col}_Kfold_Target_Enc",
+                values.map(encoding_map).fillna(self.global_mean_).to_numpy(),
+            )
+
 
 class ColumnDropper(BaseEstimator, TransformerMixin):
     """
@@ -59,17 +437,27 @@ class ColumnDropper(BaseEstimator, TransformerMixin):
     def fit(self, X, y=None):
         return self
 
+    def fit_chunks(self, chunks):
+        return self
+
+    columns = [
+        "data_compra",
+        "produto",
+        "score_fraude_modelo",
+        "categoria_produto",
+    ]
+
     def transform(self, X):
         return X.drop(
-            columns=[
-                "data_compra",
-                "produto",
-                "score_fraude_modelo",
-                "categoria_produto",
-            ],
+            columns=self.columns,
             errors="ignore",  # Ignora a ausência de colunas
         )
 
+    def transform_into(self, buffer):
+        # Colunas fora do layout do modelo nunca são copiadas para o buffer
+        for col in self.columns:
+            buffer.columns.pop(col, None)
+
 
 class DataProcessor(BaseEstimator, TransformerMixin):
     """
@@ -79,47 +467,172 @@ class DataProcessor(BaseEstimator, TransformerMixin):
     def fit(self, X, y=None):
         return self
 
+    def fit_chunks(self, chunks):
+        return self
+
     def transform(self, X):
         X_copy = X.copy()
 
-        # Verifica e transforma a coluna 'entrega_doc_2'
+        # Verifica e transforma a coluna 'entrega_doc_2' (nulo conta como "N")
         if "entrega_doc_2" in X_copy.columns:
-            X_copy["is_missing"] = X_copy["entrega_doc_2"].isnull().astype(int)
-            X_copy["entrega_doc_2"] = (
-                X_copy["entrega_doc_2"]
-                .fillna("N")
-                .apply(lambda x: 1 if x == "Y" else 0)
-            )
+            doc_2 = X_copy["entrega_doc_2"]
+            X_copy["is_missing"] = doc_2.isnull().astype(int)
+            X_copy["entrega_doc_2"] = doc_2.isin([DOC_ENTREGUE]).astype(int)
 
         # Verifica e transforma a coluna 'pais'
         if "pais" in X_copy.columns:
-            X_copy["pais"] = X_copy["pais"].apply(
-                lambda x: x if x in ["BR", "AR"] else "Outros"
-            )
+            pais = X_copy["pais"]
+            X_copy["pais"] = pais.where(pais.isin(PAISES), PAIS_OUTROS)
 
         # Verifica e transforma a coluna 'entrega_doc_3'
         if "entrega_doc_3" in X_copy.columns:
-            X_copy["entrega_doc_3"] = X_copy["entrega_doc_3"].apply(
-                lambda x: 1 if x == "Y" else 0
-            )
+            doc_3 = X_copy["entrega_doc_3"]
+            X_copy["entrega_doc_3"] = doc_3.isin([DOC_ENTREGUE]).astype(int)
 
         return X_copy
 
+    def transform_into(self, buffer):
+        doc_2 = pd.Series(buffer.get("entrega_doc_2"), copy=False)
+        buffer.set("is_missing", doc_2.isnull().to_numpy(dtype=np.int8))
+        buffer.set("entrega_doc_2", doc_2.isin([DOC_ENTREGUE]).to_numpy(dtype=np.int8))
+
+        pais = pd.Series(buffer.get("pais"), copy=False)
+        buffer.set("pais", pais.where(pais.isin(PAISES), PAIS_OUTROS).to_numpy())
+
+        doc_3 = pd.Series(buffer.get("entrega_doc_3"), copy=False)
+        buffer.set("entrega_doc_3", doc_3.isin([DOC_ENTREGUE]).to_numpy(dtype=np.int8))
+
+
+def _streaming_median(chunks, col, n_bins):
+    """
+    Mediana exata de uma coluna lida em blocos, com memória limitada.
+
+    Três leituras: faixa e contagem, histograma de `n_bins` bins iguais e,
+    por fim, só os valores dos bins que contêm os elementos centrais. Também
+    retorna o histograma, usado para aproximar os quantis.
+    """
+    low, high, n_values = np.inf, -np.inf, 0
+    for X, _ in chunks():
+        values = X[col].to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            low, high = min(low, values.min()), max(high, values.max())
+            n_values += len(values)
+    if n_values == 0:
+        return np.nan, None, None
+
+    edges = np.linspace(low, high, n_bins + 1)
+    counts = np.zeros(n_bins, dtype=np.int64)
+    for X, _ in chunks():
+        values = X[col].to_numpy(dtype=np.float64)
+        counts += np.histogram(values[~np.isnan(values)], edges)[0]
+
+    # Posições (na ordem) dos elementos centrais e os bins que as contêm
+    middle = sorted({(n_values - 1) // 2, n_values // 2})
+    cumulative = np.cumsum(counts)
+    # Um bin de folga em cada lado cobre valores na borda entre dois bins
+    bins = np.searchsorted(cumulative, np.array(middle) + 1) + [-1, 1]
+    selected, before = [], 0
+    for X, _ in chunks():
+        values = X[col].to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values)]
+        # Mesmo critério de bin do np.histogram: o último bin é fechado
+        found = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, n_bins - 1)
+        selected.append(values[(found >= bins[0]) & (found <= bins[1])])
+        before += np.count_nonzero(found < bins[0])
+    selected = np.sort(np.concatenate(selected))
+    median = np.mean([selected[i - before] for i in middle])
+    return median, edges, counts
+
+
+def _histogram_median(edges, counts):
+    """
+    Mediana aproximada por interpolação linear dentro do bin que a contém.
+    """
+    cumulative = np.cumsum(counts)
+    half = cumulative[-1] / 2
+    i = min(np.searchsorted(cumulative, half), len(counts) - 1)
+    before = cumulative[i - 1] if i > 0 else 0
+    fraction = (half - before) / counts[i] if counts[i] else 0.0
+    return edges[i] + fraction * (edges[i + 1] - edges[i])
+
 
 class ScoreImputer(BaseEstimator, TransformerMixin):
     """
     Imputa valores ausentes nas colunas de score.
+
+    Além da mediana, o fit guarda um histograma de cada coluna com bins nos
+    quantis do treino; `partial_fit` soma as contagens de um lote novo e
+    recalcula a mediana a partir delas.
     """
 
+    n_bins = 1000
+
     def __init__(self):
         self.imputers = {}
 
     def fit(self, X, y=None):
         cols = [f"score_{i}" for i in range(2, 11)]
+        self.histograms_ = {}
         for col in cols:
             imputer = SimpleImputer(strategy="median")
             imputer.fit(X[[col]])
             self.imputers[col] = imputer
+
+            values = X[col].to_numpy(dtype=np.float64)
+            values = values[~np.isnan(values)]
+            if len(values):
+                edges = np.unique(
+                    np.quantile(values, np.linspace(0, 1, self.n_bins + 1))
+                )
+                edges = np.append(edges, edges[-1]) if len(edges) == 1 else edges
+                self.histograms_[col] = (edges, np.histogram(values, edges)[0])
+        return self
+
+    def fit_chunks(self, chunks):
+        """
+        Mesmas medianas do fit, lendo os dados em blocos.
+
+        Os bins dos histogramas saem de quantis aproximados por um histograma
+        fino de bins iguais, então podem diferir um pouco dos do fit.
+        """
+        self.histograms_ = {}
+        for col in [f"score_{i}" for i in range(2, 11)]:
+            median, fine_edges, fine_counts = _streaming_median(
+                chunks, col, 100 * self.n_bins
+            )
+            imputer = SimpleImputer(strategy="median")
+            imputer.fit(pd.DataFrame({col: [median]}))
+            self.imputers[col] = imputer
+            if fine_edges is None:
+                continue
+
+            cumulative = np.concatenate([[0], np.cumsum(fine_counts)])
+            positions = np.linspace(0, cumulative[-1], self.n_bins + 1)
+            edges = np.unique(np.interp(positions, cumulative, fine_edges))
+            edges = np.append(edges, edges[-1]) if len(edges) == 1 else edges
+            counts = np.zeros(len(edges) - 1, dtype=np.int64)
+            for X, _ in chunks():
+                values = X[col].to_numpy(dtype=np.float64)
+                counts += np.histogram(values[~np.isnan(values)], edges)[0]
+            self.histograms_[col] = (edges, counts)
+        return self
+
+    def partial_fit(self, X, y=None):
+        """
+        Soma um lote novo aos histogramas do fit e atualiza as medianas.
+        """
+        if not hasattr(self, "histograms_"):
+            raise ValueError(
+                "Imputer treinado sem os histogramas; treine de novo com fit"
+            )
+        for col, (edges, counts) in self.histograms_.items():
+            values = X[col].to_numpy(dtype=np.float64)
+            # Valores fora da faixa do treino entram nos bins das pontas
+            values = np.clip(values[~np.isnan(values)], edges[0], edges[-1])
+            counts = counts + np.histogram(values, edges)[0]
+            self.histograms_[col] = (edges, counts)
+            self.imputers[col].statistics_[0] = _histogram_median(edges, counts)
         return self
 
     def transform(self, X):
@@ -128,13 +641,25 @@ class ScoreImputer(BaseEstimator, TransformerMixin):
             X_copy[col] = imputer.transform(X_copy[[col]])
         return X_copy
 
+    def transform_into(self, buffer):
+        for col, imputer in self.imputers.items():
+            values = buffer.get(col)
+            out = buffer.out(col)
+            out[:] = values
+            out[np.isnan(out)] = imputer.statistics_[0]
+
 
 class OneHotFeatureEncoder(BaseEstimator, TransformerMixin):
     """
     Aplica One-Hot Encoding em colunas categóricas.
+
+    Com `output="frame"` retorna um DataFrame float64, como sempre. Com
+    "dense" ou "sparse" retorna uma matriz float32 (densa ou CSR) que o
+    LightGBM recebe direto, e os nomes das colunas ficam em
+    `feature_names_out_`.
     """
 
-    def __init__(self):
+    def __init__(self, output="frame"):
         self.encoder = OneHotEncoder(sparse_output=False)
         self.cols = [
             "score_1",
@@ -144,31 +669,237 @@ class OneHotFeatureEncoder(BaseEstimator, TransformerMixin):
             "entrega_doc_3",
             "is_missing",
         ]
+        self.output = output
+
+    def __setstate__(self, state):
+        # Artefatos anteriores só tinham a saída em DataFrame
+        state.setdefault("output", "frame")
+        super().__setstate__(state)
+
+    @property
+    def dtype_(self):
+        return np.float64 if self.output == "frame" else np.float32
 
     def fit(self, X, y=None):
+        if self.output not in ("frame", "dense", "sparse"):
+            raise ValueError(f"Saída inválida: {self.output!r}")
         self.encoder.fit(X[self.cols])
+        self.passthrough_ = [col for col in X.columns if col not in self.cols]
+        self.feature_names_out_ = np.array(
+            self.passthrough_ + list(self.encoder.get_feature_names_out(self.cols)),
+            dtype=object,
+        )
         return self
 
-    def transform(self, X):
-        onehot_data = self.encoder.transform(X[self.cols])
-        onehot_df = pd.DataFrame(
-            onehot_data, columns=self.encoder.get_feature_names_out(self.cols)
-        )
-        return pd.concat(
-            [X.reset_index(drop=True).drop(self.cols, axis=1), onehot_df], axis=1
+    def fit_chunks(self, chunks):
+        """
+        Mesmas categorias do fit, juntando os valores únicos de cada bloco.
+        """
+        uniques, columns = {col: [] for col in self.cols}, None
+        for X, _ in chunks():
+            columns = columns if columns is not None else X.columns
+            for col in self.cols:
+                uniques[col].append(pd.unique(X[col]))
+        uniques = {
+            col: pd.unique(np.concatenate(values)) for col, values in uniques.items()
+        }
+        # O OneHotEncoder só vê os valores únicos, repetidos até o mesmo tamanho
+        size = max(len(values) for values in uniques.values())
+        sample = pd.DataFrame(
+            {col: np.resize(values, size) for col, values in uniques.items()}
         )
+        for col in columns:
+            if col not in sample:
+                sample[col] = 0.0
+        return self.fit(sample[list(columns)])
+
+    def get_feature_names_out(self, input_features=None):
+        return self.feature_names_out_
+
+    def _codes(self, values, col, categories):
+        """
+        Código de cada valor nas categorias do fit (-1 se desconhecido).
+        """
+        codes = pd.Categorical(values, categories=categories).codes
+        unknown = codes < 0
+        if self.encoder.handle_unknown == "error" and unknown.any():
+            raise ValueError(
+                f"Found unknown categories {list(pd.unique(np.asarray(values)[unknown]))}"
+                f" in column {col!r}"
+            )
+        return codes
+
+    def _onehot_indices(self, X):
+        """
+        Linhas e colunas (no bloco one-hot) das posições iguais a 1.
+        """
+        rows, cols, offset = [], [], 0
+        for col, categories in zip(self.cols, self.encoder.categories_):
+            codes = self._codes(X[col], col, categories)
+            known = codes >= 0
+            rows.append(np.flatnonzero(known))
+            cols.append(offset + codes[known])
+            offset += len(categories)
+        return np.concatenate(rows), np.concatenate(cols), offset
+
+    def transform(self, X):
+        if self.output == "frame":
+            onehot_data = self.encoder.transform(X[self.cols])
+            onehot_df = pd.DataFrame(
+                onehot_data, columns=self.encoder.get_feature_names_out(self.cols)
+            )
+            return pd.concat(
+                [X.reset_index(drop=True).drop(self.cols, axis=1), onehot_df], axis=1
+            )
+
+        passthrough = X[self.passthrough_].to_numpy(dtype=np.float32)
+        rows, cols, n_onehot = self._onehot_indices(X)
+
+        if self.output == "sparse":
+            onehot = sp.csr_matrix(
+                (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                shape=(len(X), n_onehot),
+            )
+            return sp.hstack([sp.csr_matrix(passthrough), onehot], format="csr")
+
+        out = np.zeros((len(X), len(self.feature_names_out_)), dtype=np.float32)
+        out[:, : passthrough.shape[1]] = passthrough
+        out[rows, passthrough.shape[1] + cols] = 1.0
+        return out
+
+    def transform_into(self, buffer):
+        names = iter(self.encoder.get_feature_names_out(self.cols))
+        for col, categories in zip(self.cols, self.encoder.categories_):
+            codes = self._codes(buffer.get(col), col, categories)
+            for code in range(len(categories)):
+                buffer.out(next(names))[:] = codes == code
+            buffer.columns.pop(col, None)
+
+
+class BoosterClassifier(ClassifierMixin, BaseEstimator):
+    """
+    Classificador binário sobre um booster já treinado pelo `lgb.train`.
+
+    Expõe o que o pipeline usa do LGBMClassifier: `booster_`,
+    `predict_proba`, `predict` e `n_jobs`. O `estimator` guarda o
+    LGBMClassifier com os hiperparâmetros do treino, de onde o boosting pode
+    continuar (`update_pipeline`).
+    """
+
+    def __init__(self, booster=None, estimator=None, n_jobs=None):
+        self.booster = booster
+        self.estimator = estimator
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y, **fit_params):
+        """
+        Treina uma cópia do `estimator` e passa a usar o booster dela.
+        """
+        self.booster = clone(self.estimator).fit(X, y, **fit_params).booster_
+        return self
+
+    def __sklearn_is_fitted__(self):
+        return self.booster is not None
+
+    @property
+    def booster_(self):
+        return self.booster
+
+    @property
+    def classes_(self):
+        return np.array([0, 1])
+
+    @property
+    def n_features_in_(self):
+        return self.booster.num_feature()
+
+    def predict_proba(self, X):
+        # n_jobs nulo ou negativo fica com o padrão do OpenMP
+        proba = self.booster.predict(X, num_threads=max(self.n_jobs or 0, 0))
+        return np.column_stack([1 - proba, proba])
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def pipeline_feature_names(pipeline):
+    """
+    Nomes das features na ordem em que o modelo as recebe.
+    """
+    names = getattr(pipeline.named_steps["encoder"], "feature_names_out_", None)
+    if names is not None:
+        return list(names)
+    return pipeline[-1].booster_.feature_name()
+
+
+def contribution_fields(feature_names, onehot):
+    """
+    Campos de entrada das features do modelo e a matriz 0/1 (feature x campo)
+    que soma as contribuições de cada campo numa única multiplicação.
+
+    Colunas one-hot (`{coluna}_{categoria}`) voltam à coluna de origem, o
+    target encoding à coluna categórica e o `is_missing` ao `entrega_doc_2`.
+    """
+    origin = {
+        f"{col}_{category}": col
+        for col, categories in onehot.items()
+        for category in categories
+    }
+    sources = []
+    for name in feature_names:
+        field = origin.get(name, name).removesuffix(TARGET_SUFFIX)
+        sources.append(DERIVED_FIELDS.get(field, field))
+
+    fields = list(dict.fromkeys(sources))
+    index = {field: k for k, field in enumerate(fields)}
+    matrix = np.zeros((len(sources), len(fields)))
+    matrix[np.arange(len(sources)), [index[source] for source in sources]] = 1.0
+    return fields, matrix
+
+
+def pipeline_contributions(pipeline, features):
+    """
+    Contribuições por campo de entrada (em log-odds) e valor base de cada
+    linha, pelo `pred_contrib` do LightGBM sobre as features do pipeline.
+    """
+    encoder = pipeline.named_steps["encoder"]
+    onehot = dict(zip(encoder.cols, encoder.encoder.categories_))
+    fields, matrix = contribution_fields(pipeline_feature_names(pipeline), onehot)
+    if len(features) == 0:
+        return fields, np.empty((0, len(fields))), np.empty(0)
+    contrib = pipeline[-1].booster_.predict(features, pred_contrib=True)
+    return fields, contrib[:, :-1] @ matrix, contrib[:, -1]
 
 
 def preprocess_categoria_produto(df, min_threshold=1000):
     """
-    Categoriza como outros as categorias de produtos menos frequentes
+    Categoriza como outros as categorias de produtos menos frequentes do próprio
+    DataFrame. No pipeline, use o CategoryGrouper, que aprende o vocabulário no
+    treino.
     """
+    return CategoryGrouper(min_threshold=min_threshold).fit_transform(df)
 
-    categoria_counts = df["categoria_produto"].value_counts()
-    categorias_menos_frequentes = categoria_counts[
-        categoria_counts < min_threshold
-    ].index
-    df["categoria_produto"] = df["categoria_produto"].replace(
-        categorias_menos_frequentes, "Outros"
+
+def ensure_category_grouper(pipeline):
+    """
+    Adiciona o CategoryGrouper a pipelines treinados antes dele existir.
+
+    Esses pipelines foram treinados com `preprocess_categoria_produto`, então o
+    vocabulário é recuperado das chaves do encoding_map_ do target encoder.
+    Devolve um pipeline novo com as mesmas etapas; o recebido não é alterado.
+    """
+    if "category_grouper" in pipeline.named_steps:
+        return pipeline
+
+    kfold = pipeline.named_steps["kfold_encoder"]
+    grouper = CategoryGrouper()
+    grouper.vocabulary_ = frozenset(
+        categoria
+        for categoria in kfold.encoding_maps_[grouper.colname]
+        if categoria != grouper.other
+    )
+    return Pipeline(
+        [("category_grouper", grouper), *pipeline.steps],
+        memory=pipeline.memory,
+        verbose=pipeline.verbose,
     )
-    return df
@@ -0,0 +1,241 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Buckets padrão de latência, em segundos
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _label_text(labelnames, labelvalues, extra=""):
+    pairs = [f'{k}="{v}"' for k, v in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Labeled:
+    """
+    Base das métricas com labels: cada combinação de valores é uma série,
+    criada por `series_factory`.
+    """
+
+    def __init__(self, name, documentation, series_factory, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._new_series = series_factory
+        self._series = {}
+        self._series_lock = threading.Lock()
+        if not self.labelnames:
+            # Sem labels, a única série existe desde o início e aparece zerada
+            self.labels()
+
+    def labels(self, *labelvalues):
+        """
+        Série correspondente aos valores de label, criada no primeiro uso.
+        """
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} espera os labels {self.labelnames}, recebeu {labelvalues}"
+            )
+        series = self._series.get(labelvalues)
+        if series is None:
+            with self._series_lock:
+                series = self._series.setdefault(labelvalues, self._new_series())
+        return series
+
+    def _header(self, kind):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {kind}",
+        ]
+
+
+class _HistogramSeries:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        """
+        Observa a duração do bloco `with`, em segundos.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram(_Labeled):
+    """
+    Histograma cumulativo no formato do Prometheus.
+
+    Sem `labelnames`, `observe` e `time` atuam direto no histograma; com
+    labels, em `histogram.labels(...)`.
+    """
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(
+            name, documentation, lambda: _HistogramSeries(self.buckets), labelnames
+        )
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    @property
+    def count(self):
+        return sum(series.count for series in list(self._series.values()))
+
+    def render(self):
+        lines = self._header("histogram")
+        for labelvalues, series in list(self._series.items()):
+            counts, total = series.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _label_text(self.labelnames, labelvalues, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            labels = _label_text(self.labelnames, labelvalues, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return "\n".join(lines)
+
+
+class _CounterSeries:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Labeled):
+    """
+    Contador monotônico no formato do Prometheus.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, _CounterSeries, labelnames)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    @property
+    def value(self):
+        return sum(series.value for series in list(self._series.values()))
+
+    def render(self):
+        lines = self._header("counter")
+        for labelvalues, series in list(self._series.items()):
+            labels = _label_text(self.labelnames, labelvalues)
+            lines.append(f"{self.name}{labels} {series.value}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """
+    Agrupa as métricas expostas no endpoint `/metrics`.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica já registrada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        return self.register(Histogram(name, documentation, buckets, labelnames))
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def render(self):
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """
+    Middleware ASGI que mede cada requisição HTTP até o último byte da
+    resposta, por rota e status.
+
+    Guarda o instante de chegada em `scope["request_start"]`, para os
+    endpoints medirem as suas próprias fases a partir dele.
+    """
+
+    def __init__(self, app, duration, requests):
+        self.app = app
+        self.duration = duration
+        self.requests = requests
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        scope["request_start"] = start
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Rotas desconhecidas ficam juntas para não multiplicar séries
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "other")
+            self.duration.labels(endpoint).observe(time.perf_counter() - start)
+            self.requests.labels(endpoint, str(status)).inc()
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,400 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+import joblib
+import numpy as np
+import pandas as pd
+from artifact import (
+    MANIFEST_FILE,
+    load_artifact,
+    read_manifest,
+    read_threshold,
+    sha256_file,
+)
+from features import ensure_category_grouper, pipeline_contributions, transform_timed
+from config import DECISION_THRESHOLD
+from scoring import CompiledScorer
+from synthetic import make_transactions
+
+logger = logging.getLogger(__name__)
+
+
+def model_version(path):
+    """
+    Versão curta de um modelo: hash do manifesto do artefato ou do pickle.
+
+    O horário do export fica de fora do hash, para que o mesmo modelo
+    exportado de novo mantenha a versão.
+    """
+    path = str(path)
+    if not os.path.isdir(path):
+        return sha256_file(path)[:12]
+    manifest = read_manifest(path)
+    manifest.pop("created_at", None)
+    content = json.dumps(manifest, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def _source_stamp(path):
+    """
+    Tamanho e mtime do arquivo que muda a cada nova versão do modelo.
+    """
+    path = str(path)
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST_FILE)
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ModelScores:
+    """
+    Probabilidades de um lote junto da versão e do threshold do modelo que
+    as calculou.
+
+    Fatias preservam a versão, então o MicroBatcher devolve a cada chamador
+    só as suas probabilidades sem perder de qual modelo elas vieram.
+    """
+
+    def __init__(self, proba, version, threshold=DECISION_THRESHOLD):
+        self.proba = proba
+        self.version = version
+        self.threshold = threshold
+
+    def __len__(self):
+        return len(self.proba)
+
+    def __getitem__(self, key):
+        return ModelScores(self.proba[key], self.version, self.threshold)
+
+    def predictions(self):
+        """
+        Decisão de cada registro: 1 (bloquear) quando o score passa do threshold.
+        """
+        return (self.proba > self.threshold).astype(np.int64)
+
+
+class ModelExplanation:
+    """
+    Contribuição de cada campo de entrada (em log-odds) para o score das
+    linhas `rows` de um lote, junto dos scores do lote inteiro.
+
+    Somadas ao `base_value`, as contribuições de uma linha dão o score bruto
+    (logit) do booster.
+    """
+
+    def __init__(self, scores, rows, fields, contributions, base_value):
+        self.scores = scores
+        self.rows = rows
+        self.fields = fields
+        self.contributions = contributions
+        self.base_value = base_value
+
+    def top(self, k=0):
+        """
+        Um dict campo -> contribuição por linha explicada, do maior para o
+        menor módulo, com só os `k` primeiros campos (todos se k=0).
+        """
+        if k < 0:
+            raise ValueError(f"k deve ser >= 0, recebido {k}")
+        order = np.argsort(-np.abs(self.contributions), axis=1, kind="stable")
+        if k:
+            order = order[:, :k]
+        values = np.take_along_axis(self.contributions, order, axis=1)
+        fields = np.asarray(self.fields, dtype=object)[order]
+        return [dict(zip(f, v)) for f, v in zip(fields.tolist(), values.tolist())]
+
+
+class LoadedModel:
+    """
+    Um modelo carregado: scorer compilado e/ou pipeline, com a sua versão.
+
+    Com `stage_histogram` (um Histogram com o label "stage"), a duração de
+    cada etapa da predição é registrada: montagem das features e booster no
+    scorer compilado, ou cada etapa nomeada do pipeline.
+    """
+
+    def __init__(
+        self,
+        source,
+        version,
+        scorer=None,
+        pipeline=None,
+        stage_histogram=None,
+        threshold=DECISION_THRESHOLD,
+    ):
+        if scorer is None and pipeline is None:
+            raise ValueError("LoadedModel precisa de um scorer ou de um pipeline")
+        self.source = str(source)
+        self.version = version
+        self.threshold = threshold
+        self.scorer = scorer
+        self.pipeline = pipeline
+        self.stage_histogram = stage_histogram
+        self.loaded_at = time.time()
+
+    @classmethod
+    def from_path(cls, path, compiled=True, num_threads=0, stage_histogram=None):
+        """
+        Carrega um artefato (diretório) ou um pipeline salvo com joblib.
+
+        `num_threads` limita as threads do LightGBM (0 mantém o padrão). O
+        threshold vem do manifesto do artefato; pickles usam o padrão.
+        """
+        version = model_version(path)
+        if os.path.isdir(path):
+            scorer = load_artifact(path, num_threads=num_threads)
+            return cls(
+                path,
+                version,
+                scorer=scorer,
+                stage_histogram=stage_histogram,
+                threshold=read_threshold(path),
+            )
+
+        pipeline = ensure_category_grouper(joblib.load(path))
+        if num_threads:
+            pipeline[-1].set_params(n_jobs=num_threads)
+        scorer = CompiledScorer.from_pipeline(pipeline) if compiled else None
+        if scorer is not None:
+            scorer.num_threads = num_threads
+        return cls(
+            path,
+            version,
+            scorer=scorer,
+            pipeline=pipeline,
+            stage_histogram=stage_histogram,
+        )
+
+    def _stage(self, name):
+        if self.stage_histogram is None:
+            return nullcontext()
+        return self.stage_histogram.labels(name).time()
+
+    def _predict_frame(self, X):
+        """
+        Executa o pipeline etapa por etapa, medindo cada uma.
+        """
+        if self.stage_histogram is None:
+            return self.pipeline.predict_proba(X)[:, 1]
+        X = transform_timed(self.pipeline.steps[:-1], X, self.stage_histogram)
+        with self._stage(self.pipeline.steps[-1][0]):
+            return self.pipeline[-1].predict_proba(X)[:, 1]
+
+    def predict_proba(self, records):
+        if len(records) == 0:
+            proba = np.empty(0, dtype=np.float64)
+        elif self.scorer is not None:
+            with self._stage("features"):
+                X = self.scorer.transform(records)
+            with self._stage("booster"):
+                proba = self.scorer.predict_features(X)
+        else:
+            with self._stage("dataframe"):
+                X = pd.DataFrame(records).drop(columns=["fraude"], errors="ignore")
+            proba = self._predict_frame(X)
+        return ModelScores(proba, self.version, self.threshold)
+
+    def predict_proba_columns(self, columns, n_rows):
+        """
+        Probabilidades para dados em formato colunar (um array por campo).
+        """
+        if n_rows == 0:
+            proba = np.empty(0, dtype=np.float64)
+        elif self.scorer is not None:
+            with self._stage("features"):
+                X = self.scorer.transform_columns(columns, n_rows)
+            with self._stage("booster"):
+                proba = self.scorer.predict_features(X)
+        else:
+            with self._stage("dataframe"):
+                X = pd.DataFrame(columns, index=range(n_rows))
+            proba = self._predict_frame(X)
+        return ModelScores(proba, self.version, self.threshold)
+
+    def explain(self, records, declined_only=False):
+        """
+        Scores e contribuições por campo de entrada de um lote de registros.
+
+        Com `declined_only`, o `pred_contrib` (bem mais caro que a predição)
+        roda só nos registros bloqueados.
+        """
+        if len(records) == 0:
+            scores = ModelScores(np.empty(0), self.version, self.threshold)
+            return ModelExplanation(
+                scores, np.empty(0, dtype=np.int64), [], np.empty((0, 0)), np.empty(0)
+            )
+        if self.scorer is not None:
+            with self._stage("features"):
+                X = self.scorer.transform(records)
+            with self._stage("booster"):
+                proba = self.scorer.predict_features(X)
+        else:
+            with self._stage("dataframe"):
+                frame = pd.DataFrame(records).drop(columns=["fraude"], errors="ignore")
+            if self.stage_histogram is None:
+                X = self.pipeline[:-1].transform(frame)
+            else:
+                X = transform_timed(
+                    self.pipeline.steps[:-1], frame, self.stage_histogram
+                )
+            X = np.asarray(X, dtype=np.float64)
+            with self._stage(self.pipeline.steps[-1][0]):
+                proba = self.pipeline[-1].booster_.predict(X)
+
+        scores = ModelScores(proba, self.version, self.threshold)
+        rows = (
+            np.flatnonzero(scores.predictions())
+            if declined_only
+            else np.arange(len(scores))
+        )
+        with self._stage("contrib"):
+            if self.scorer is not None:
+                fields = self.scorer.fields
+                values, base_value = self.scorer.explain_features(X[rows])
+            else:
+                fields, values, base_value = pipeline_contributions(
+                    self.pipeline, X[rows]
+                )
+        return ModelExplanation(scores, rows, fields, values, base_value)
+
+    def info(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "threshold": self.threshold,
+            "loaded_at": self.loaded_at,
+            "compiled": self.scorer is not None,
+        }
+
+
+def warmup_records(n_rows=64, seed=0):
+    """
+    Registros sintéticos no formato do payload de `/predict`.
+    """
+    df = make_transactions(n_rows, seed=seed, with_target=False)
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+class ModelManager:
+    """
+    Mantém o modelo em uso e troca de versão sem interromper as predições.
+
+    O novo modelo é carregado e aquecido fora do caminho das requisições; a
+    troca é a atribuição de uma única referência, então cada lote é pontuado
+    inteiro pela versão antiga ou pela nova. As `keep` versões anteriores
+    ficam em memória para rollback.
+    """
+
+    def __init__(
+        self,
+        loader=LoadedModel.from_path,
+        warmup=None,
+        warmup_batch_sizes=(1, 8, 64),
+        keep=1,
+    ):
+        self.loader = loader
+        self.warmup = warmup_records() if warmup is None else warmup
+        self.warmup_batch_sizes = warmup_batch_sizes
+        self._current = None
+        self._previous = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+    @property
+    def current(self):
+        return self._current
+
+    def _warm_up(self, model):
+        """
+        Pontua lotes sintéticos para validar o modelo e aquecer o booster.
+        """
+        for size in self.warmup_batch_sizes:
+            scores = model.predict_proba(self.warmup[:size])
+            if len(scores) != min(size, len(self.warmup)):
+                raise ValueError("Aquecimento retornou um número errado de scores")
+
+    def load(self, path, warm_up=True):
+        """
+        Carrega, aquece e ativa o modelo em `path`. Retorna o modelo ativo.
+
+        Se a carga ou o aquecimento falharem, o modelo atual continua ativo.
+        Com `warm_up=False`, nada é pontuado até `warm_up()`, como num
+        processo que ainda vai fazer fork dos workers (veja app/serve.py).
+        """
+        with self._lock:
+            model = self.loader(path)
+            if self._current is not None and model.version == self._current.version:
+                return self._current
+            if warm_up:
+                self._warm_up(model)
+
+            if self._current is not None:
+                self._previous.append(self._current)
+            self._current = model
+            logger.info("Modelo %s ativo (%s)", model.version, model.source)
+            return model
+
+    def warm_up(self):
+        """
+        Aquece o modelo ativo, carregado com `warm_up=False`.
+        """
+        with self._lock:
+            self._warm_up(self._current)
+
+    def reload(self):
+        """
+        Recarrega a partir da origem do modelo atual.
+        """
+        return self.load(self._current.source)
+
+    def rollback(self):
+        """
+        Volta para a versão anterior mantida em memória.
+        """
+        with self._lock:
+            if not self._previous:
+                raise LookupError("Nenhuma versão anterior disponível para rollback")
+            self._current = self._previous.pop()
+            logger.info("Rollback para o modelo %s", self._current.version)
+            return self._current
+
+    def info(self):
+        return {
+            "current": self._current.info() if self._current else None,
+            "previous": [model.info() for model in reversed(self._previous)],
+        }
+
+    def watch(self, path, interval=5.0):
+        """
+        Verifica `path` a cada `interval` segundos e carrega novas versões.
+        """
+        self.stop()
+        self._stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(path, interval), daemon=True
+        )
+        self._watcher.start()
+
+    def stop(self):
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, path, interval):
+        stamp = None
+        while not self._stop.wait(interval):
+            try:
+                new_stamp = _source_stamp(path)
+                if new_stamp != stamp:
+                    self.load(path)
+                    stamp = new_stamp
+            except Exception:  # pylint: disable=broad-except
+                # Arquivo pela metade ou modelo inválido: tenta no próximo ciclo
+                logger.exception("Falha ao recarregar o modelo de %s", path)
@@ -1,3 +1,8 @@
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 import joblib
 from sklearn.metrics import (
@@ -7,7 +12,13 @@ from sklearn.metrics import (
     recall_score,
     roc_auc_score,
 )
+from aggregates import ScoringSummary, aggregates_path
+from artifact import read_threshold
 from config import (
+    ARTIFACT_PATH,
+    DECISION_THRESHOLD,
+    EXPLANATIONS_PATH,
+    EXPLANATIONS_PATH_TRAIN,
     MODEL_PATH,
     TEST_DATA_PATH,
     PREDICTIONS_PATH,
@@ -16,18 +27,89 @@ from config import (
     PREDICTIONS_FILE_TRAIN,
     PREDICTIONS_PATH_TRAIN,
 )
-from features import preprocess_categoria_produto
+from dataset import iter_data_chunks
+from features import (
+    ensure_category_grouper,
+    pipeline_contributions,
+    pipeline_feature_names,
+    transform_buffered,
+)
+
+
+# Arquivos de entrada, predições e métricas de cada conjunto
+SPLITS = {
+    "test": (TEST_DATA_PATH, PREDICTIONS_PATH, PREDICTIONS_FILE),
+    "train": (TRAIN_DATA_PATH, PREDICTIONS_PATH_TRAIN, PREDICTIONS_FILE_TRAIN),
+}
+
+# Arquivo de explicações de cada conjunto
+EXPLANATIONS = {"test": EXPLANATIONS_PATH, "train": EXPLANATIONS_PATH_TRAIN}
+
+
+# Pipelines já carregados neste processo, por caminho e mtime. Processos do
+# pool criados por fork herdam o cache e compartilham as páginas do modelo.
+_loaded_models = {}
 
 
-def load_model(model_path=MODEL_PATH):
+def load_model(model_path=MODEL_PATH, verbose=True):
     """
     Carrega o modelo treinado.
     """
-    model = joblib.load(model_path)
-    print("Modelo carregado com sucesso!")
+    key = (str(model_path), os.stat(model_path).st_mtime_ns)
+    model = _loaded_models.get(key)
+    if model is None:
+        model = ensure_category_grouper(joblib.load(model_path))
+        _loaded_models[key] = model
+    if verbose:
+        print("Modelo carregado com sucesso!")
     return model
 
 
+def predict_proba(pipeline, X, buffered=False):
+    """
+    Calcula as probabilidades de fraude.
+
+    Com `buffered=True`, as etapas de pré-processamento escrevem num único
+    buffer de features pré-alocado, sem copiar o DataFrame a cada etapa, e o
+    buffer vai direto ao booster (o classificador avisaria da falta dos nomes
+    das colunas).
+    """
+    if not buffered:
+        return pipeline.predict_proba(X)[:, 1]
+    if len(X) == 0:  # O booster não aceita uma matriz vazia
+        return np.empty(0)
+    features = transform_features(pipeline, X, True)
+    return pipeline[-1].booster_.predict(np.asarray(features, np.float64))
+
+
+def transform_features(pipeline, X, buffered=False):
+    """
+    Matriz de features que o modelo recebe, pelo pipeline ou pelo buffer.
+    """
+    if not buffered:
+        return pipeline[:-1].transform(X)
+    return transform_buffered(
+        [step for _, step in pipeline.steps[:-1]],
+        X,
+        pipeline_feature_names(pipeline),
+        dtype=pipeline.named_steps["encoder"].dtype_,
+    )
+
+
+def write_metrics(metrics, output_path):
+    """
+    Salva as métricas em um arquivo, uma por linha.
+    """
+    with open(output_path, "w", encoding="utf-8") as f:
+        for metric, value in metrics.items():
+            if isinstance(value, str):  # Para erros ao calcular ROC AUC
+                f.write(f"{metric}: {value}\n")
+            else:
+                f.write(f"{metric}: {value:.4f}\n")
+
+    print(f"Métricas salvas em: {output_path}")
+
+
 def calculate_metrics(y_true, y_pred, y_proba, output_path=PREDICTIONS_FILE):
     metrics = {
         "Accuracy": accuracy_score(y_true, y_pred),
@@ -39,85 +121,340 @@ def calculate_metrics(y_true, y_pred, y_proba, output_path=PREDICTIONS_FILE):
     if y_proba is not None:
         metrics["ROC AUC"] = roc_auc_score(y_true, y_proba)
 
-    # Salva as métricas em um arquivo
-    with open(output_path, "w") as f:
-        for metric, value in metrics.items():
-            if isinstance(value, str):  # Para erros ao calcular ROC AUC
-                f.write(f"{metric}: {value}\n")
-            else:
-                f.write(f"{metric}: {value:.4f}\n")
+    write_metrics(metrics, output_path)
 
-    print(f"Métricas salvas em: {output_path}")
 
+class MetricsAccumulator:
+    """
+    Acumula a matriz de confusão e um histograma de scores por classe.
+
+    Permite calcular as métricas de um arquivo processado em blocos sem manter
+    as predições em memória. O ROC AUC vem do histograma, com empates dentro
+    do mesmo bin contando meio ponto.
+    """
+
+    def __init__(self, n_bins=2**16):
+        self.confusion = np.zeros((2, 2), dtype=np.int64)
+        self.score_hist = np.zeros((2, n_bins), dtype=np.int64)
+
+    def update(self, y_true, y_pred, y_proba):
+        y_true = np.asarray(y_true, dtype=np.int64)
+        y_pred = np.asarray(y_pred, dtype=np.int64)
+        np.add.at(self.confusion, (y_true, y_pred), 1)
 
-def make_predictions(data_path=TEST_DATA_PATH, threshold=0.61):
+        n_bins = self.score_hist.shape[1]
+        bins = np.minimum((np.asarray(y_proba) * n_bins).astype(np.int64), n_bins - 1)
+        for label in (0, 1):
+            self.score_hist[label] += np.bincount(
+                bins[y_true == label], minlength=n_bins
+            )
+        return self
 
-    pipeline = load_model()
+    def merge(self, other):
+        self.confusion += other.confusion
+        self.score_hist += other.score_hist
+        return self
 
-    data = pd.read_csv(data_path)
+    def roc_auc(self):
+        neg, pos = self.score_hist
+        if neg.sum() == 0 or pos.sum() == 0:
+            return "Indefinido: apenas uma classe presente"
+        neg_below = np.cumsum(neg) - neg
+        wins = (pos * (neg_below + 0.5 * neg)).sum()
+        return wins / (pos.sum() * neg.sum())
 
-    data_preprocessed = preprocess_categoria_produto(data)
+    def metrics(self):
+        (tn, fp), (fn, tp) = self.confusion
+        total = self.confusion.sum()
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = (
+            2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        )
+        return {
+            "Accuracy": (tp + tn) / total if total else 0.0,
+            "F1 Score": f1,
+            "Precision": precision,
+            "Recall": recall,
+            "ROC AUC": self.roc_auc(),
+        }
 
-    X_test = data_preprocessed.drop(columns=["fraude"], errors="ignore")
-    y_true = data_preprocessed.get("fraude", None)
 
-    y_proba = pipeline.predict_proba(X_test)[:, 1]
-    print("Probabilidades previstas calculadas com sucesso.")
+def score_chunk(pipeline, chunk, threshold=DECISION_THRESHOLD, buffered=False):
+    """
+    Pontua um bloco de dados e acumula as suas métricas e agregados.
+    """
+    X = chunk.drop(columns=["fraude"], errors="ignore")
+    y_true = chunk.get("fraude", None)
 
+    y_proba = predict_proba(pipeline, X, buffered=buffered)
     y_pred = (y_proba > threshold).astype(int)
-    print(f"Predições feitas com sucesso. Threshold: {threshold}")
 
-    # Salva as predições no dataframe
-    data["predicted_fraude"] = y_pred
-    data["predicted_proba"] = y_proba  # Salva as probabilidades
+    # Salva as predições no bloco
+    chunk["predicted_fraude"] = y_pred
+    chunk["predicted_proba"] = y_proba  # Salva as probabilidades
+
+    accumulator = None
     if y_true is not None:
-        data["true_fraude"] = y_true
+        chunk["true_fraude"] = y_true
+        accumulator = MetricsAccumulator().update(y_true, y_pred, y_proba)
+    summary = ScoringSummary(threshold).update(X, y_true, y_pred, y_proba)
+    return chunk, accumulator, summary
 
-    # Salva os resultados em arquivo
-    data.to_csv(PREDICTIONS_PATH, index=False)
-    print(f"Resultados salvos em: {PREDICTIONS_PATH}")
 
-    # Calcula métricas se y_true existir
-    if y_true is not None:
-        calculate_metrics(y_true=y_true, y_pred=y_pred, y_proba=y_proba)
+# Pipeline carregado uma vez em cada processo do pool
+_worker_pipeline = None
 
 
-def make_predictions_train(data_path=TRAIN_DATA_PATH, threshold=0.61):
+def _init_worker(model_path):
+    global _worker_pipeline  # pylint: disable=global-statement
+    _worker_pipeline = load_model(model_path, verbose=False)
+    # Cada processo usa uma thread no LightGBM; o paralelismo vem do pool
+    _worker_pipeline[-1].set_params(n_jobs=1)
 
-    pipeline = load_model()
 
-    data = pd.read_csv(data_path)
+def _score_to_csv(pipeline, chunk, threshold, buffered):
+    """
+    Pontua um bloco e já o formata como CSV, sem cabeçalho.
+    """
+    scored, accumulator, summary = score_chunk(pipeline, chunk, threshold, buffered)
+    csv_text = scored.to_csv(header=False, index=False)
+    return list(scored.columns), len(scored), csv_text, accumulator, summary
 
-    data_preprocessed = preprocess_categoria_produto(data)
 
-    X_test = data_preprocessed.drop(columns=["fraude"], errors="ignore")
-    y_true = data_preprocessed.get("fraude", None)
+def _score_in_worker(chunk, threshold, buffered):
+    return _score_to_csv(_worker_pipeline, chunk, threshold, buffered)
 
-    y_proba = pipeline.predict_proba(X_test)[:, 1]
-    print("Probabilidades previstas calculadas com sucesso.")
 
-    y_pred = (y_proba > threshold).astype(int)
-    print(f"Predições feitas com sucesso. Threshold: {threshold}")
+def model_threshold(model_path, artifact_path=None):
+    """
+    Threshold de decisão do modelo pontuado.
 
-    # Salva as predições no dataframe
-    data["predicted_fraude"] = y_pred
-    data["predicted_proba"] = y_proba  # Salva as probabilidades
-    if y_true is not None:
-        data["true_fraude"] = y_true
+    Vem do artefato `artifact_path` ou, sem ele, do artefato padrão quando
+    `model_path` é o pickle padrão. Outros pickles não trazem threshold
+    calibrado e usam o padrão.
+    """
+    if artifact_path is None and os.path.abspath(model_path) == os.path.abspath(
+        MODEL_PATH
+    ):
+        artifact_path = ARTIFACT_PATH
+    if artifact_path is None:
+        return DECISION_THRESHOLD
+    return read_threshold(artifact_path)
 
-    # Salva os resultados em arquivo
-    data.to_csv(PREDICTIONS_PATH_TRAIN, index=False)
-    print(f"Resultados salvos em: {PREDICTIONS_PATH_TRAIN}")
+
+def make_predictions(
+    data_path=None,
+    threshold=None,
+    buffered=False,
+    *,
+    split="test",
+    output_path=None,
+    metrics_path=None,
+    chunksize=100_000,
+    n_jobs=1,
+    model_path=MODEL_PATH,
+    summary_path=None,
+    artifact_path=None,
+):
+    """
+    Pontua um conjunto de dados em blocos, com memória limitada.
+
+    Os blocos são lidos em sequência, pontuados em um pool de `n_jobs`
+    processos e escritos na ordem de entrada assim que ficam prontos. As
+    métricas vêm de acumuladores atualizados bloco a bloco. Sem `threshold`,
+    usa o do artefato do modelo pontuado (veja `model_threshold`).
+
+    Os agregados do dashboard (ScoringSummary) vão para `summary_path`, por
+    padrão ao lado do arquivo de predições. Sem `data_path`, pontua o arquivo
+    do `split`.
+    """
+    default_data, default_output, default_metrics = SPLITS[split]
+    data_path = data_path or default_data
+    output_path = output_path or default_output
+    metrics_path = metrics_path or default_metrics
+    summary_path = summary_path or aggregates_path(output_path)
+    if threshold is None:
+        threshold = model_threshold(model_path, artifact_path)
+
+    accumulator = None
+    summary = ScoringSummary(threshold)
+    n_rows = 0
+
+    def write(f, columns, chunk_rows, csv_text, chunk_accumulator, chunk_summary):
+        nonlocal accumulator, n_rows
+        if n_rows == 0:
+            pd.DataFrame(columns=columns).to_csv(f, index=False)
+        f.write(csv_text)
+        n_rows += chunk_rows
+        if chunk_accumulator is not None:
+            accumulator = (
+                chunk_accumulator
+                if accumulator is None
+                else accumulator.merge(chunk_accumulator)
+            )
+        summary.merge(chunk_summary)
+
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        if n_jobs == 1:
+            pipeline = load_model(model_path)
+            for chunk in iter_data_chunks(data_path, chunksize):
+                write(f, *_score_to_csv(pipeline, chunk, threshold, buffered))
+        else:
+            # Carrega antes do fork para os processos herdarem o modelo
+            load_model(model_path)
+            # Limita os blocos em voo para manter a memória constante
+            with ProcessPoolExecutor(
+                max_workers=n_jobs, initializer=_init_worker, initargs=(model_path,)
+            ) as pool:
+                pending = deque()
+                for chunk in iter_data_chunks(data_path, chunksize):
+                    pending.append(
+                        pool.submit(_score_in_worker, chunk, threshold, buffered)
+                    )
+                    if len(pending) >= 2 * n_jobs:
+                        write(f, *pending.popleft().result())
+                while pending:
+                    write(f, *pending.popleft().result())
+
+    print(f"Predições feitas com sucesso. Threshold: {threshold}")
+    print(f"{n_rows} linhas pontuadas. Resultados salvos em: {output_path}")
+    summary.save(summary_path)
 
     # Calcula métricas se y_true existir
-    if y_true is not None:
-        calculate_metrics(
-            y_true=y_true,
-            y_pred=y_pred,
-            y_proba=y_proba,
-            output_path=PREDICTIONS_FILE_TRAIN,
+    if accumulator is not None:
+        write_metrics(accumulator.metrics(), metrics_path)
+    return accumulator
+
+
+def make_predictions_train(data_path=None, threshold=None, buffered=False, **kwargs):
+    """
+    Pontua o conjunto de treino; veja `make_predictions`.
+    """
+    return make_predictions(data_path, threshold, buffered, split="train", **kwargs)
+
+
+def explain_chunk(
+    pipeline, chunk, threshold=DECISION_THRESHOLD, declined_only=True, buffered=False
+):
+    """
+    Contribuições por campo de entrada (em log-odds) das linhas de um bloco,
+    ou só das bloqueadas com `declined_only`.
+
+    Retorna um DataFrame com a posição da linha no bloco, o score, o valor
+    base e uma coluna `contrib_<campo>` por campo de entrada.
+    """
+    X = chunk.drop(columns=["fraude"], errors="ignore")
+    features = np.asarray(transform_features(pipeline, X, buffered), np.float64)
+    y_proba = pipeline[-1].booster_.predict(features)
+    rows = np.flatnonzero(y_proba > threshold) if declined_only else np.arange(len(X))
+
+    fields, contributions, base_value = pipeline_contributions(pipeline, features[rows])
+    explained = pd.DataFrame(
+        contributions, columns=[f"contrib_{field}" for field in fields]
+    )
+    explained.insert(0, "row", rows)
+    explained.insert(1, "predicted_proba", y_proba[rows])
+    explained.insert(2, "base_value", base_value)
+    return explained
+
+
+def make_explanations(
+    split="test",
+    data_path=None,
+    output_path=None,
+    threshold=None,
+    chunksize=100_000,
+    declined_only=True,
+    buffered=False,
+    model_path=MODEL_PATH,
+    artifact_path=None,
+):
+    """
+    Explica em blocos as predições de um conjunto de dados.
+
+    Grava, para cada transação bloqueada (ou todas, sem `declined_only`), a
+    contribuição de cada campo de entrada ao score, com `row` sendo a posição
+    da linha no arquivo de entrada.
+    """
+    data_path = data_path or SPLITS[split][0]
+    output_path = output_path or EXPLANATIONS[split]
+    if threshold is None:
+        threshold = model_threshold(model_path, artifact_path)
+
+    pipeline = load_model(model_path)
+    offset = n_explained = 0
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        for chunk in iter_data_chunks(data_path, chunksize):
+            explained = explain_chunk(
+                pipeline, chunk, threshold, declined_only, buffered
+            )
+            explained["row"] += offset
+            explained.to_csv(f, header=offset == 0, index=False)
+            offset += len(chunk)
+            n_explained += len(explained)
+
+    print(f"{n_explained} de {offset} linhas explicadas em: {output_path}")
+    return n_explained
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pontua um conjunto de dados em blocos com o modelo treinado."
+    )
+    parser.add_argument("--split", choices=sorted(SPLITS), default="test")
+    parser.add_argument("--input", help="Arquivo de entrada (padrão: o do split)")
+    parser.add_argument("--output", help="Arquivo de predições (padrão: o do split)")
+    parser.add_argument("--metrics", help="Arquivo de métricas (padrão: o do split)")
+    parser.add_argument("--model", default=str(MODEL_PATH))
+    parser.add_argument(
+        "--artifact", help="Artefato de onde ler o threshold do modelo em --model"
+    )
+    parser.add_argument(
+        "--threshold", type=float, help="Padrão: o threshold do artefato do modelo"
+    )
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--n-jobs", type=int, default=1)
+    parser.add_argument("--buffered", action="store_true")
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Grava as contribuições por campo das transações bloqueadas",
+    )
+    parser.add_argument(
+        "--all-rows",
+        action="store_true",
+        help="Com --explain, explica todas as transações",
+    )
+    args = parser.parse_args()
+
+    if args.explain:
+        make_explanations(
+            split=args.split,
+            data_path=args.input,
+            output_path=args.output,
+            threshold=args.threshold,
+            chunksize=args.chunksize,
+            declined_only=not args.all_rows,
+            buffered=args.buffered,
+            model_path=args.model,
+            artifact_path=args.artifact,
         )
+        return
+
+    make_predictions(
+        split=args.split,
+        data_path=args.input,
+        output_path=args.output,
+        metrics_path=args.metrics,
+        threshold=args.threshold,
+        chunksize=args.chunksize,
+        n_jobs=args.n_jobs or os.cpu_count(),
+        buffered=args.buffered,
+        model_path=args.model,
+        artifact_path=args.artifact,
+    )
 
 
 if __name__ == "__main__":
-    make_predictions()
+    main()
@@ -1,67 +1,671 @@
-import pandas as pd
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from functools import partial
 import joblib
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
 from sklearn.pipeline import Pipeline
-from lightgbm import LGBMClassifier
-from config import TRAIN_DATA_PATH, MODEL_PATH
+from sklearn.utils.class_weight import compute_sample_weight
+from lightgbm import LGBMClassifier, early_stopping
+from artifact import read_threshold, save_artifact
+from config import (
+    ARTIFACT_PATH,
+    DATASET_CACHE_DIR,
+    MODEL_PARAMS_PATH,
+    TEST_DATA_PATH,
+    TRAIN_DATA_PATH,
+    MODEL_PATH,
+)
+from dataset import (
+    data_columns,
+    file_fingerprint,
+    iter_data_chunks,
+    read_data,
+    read_manifest,
+    write_manifest,
+)
 from features import (
+    BoosterClassifier,
+    CategoryGrouper,
     ColumnDropper,
     DataProcessor,
     ScoreImputer,
     OneHotFeatureEncoder,
-    preprocess_categoria_produto,
     KFoldTargetEncoder,
 )
+from thresholds import best_threshold, profit_curve
+
+# Configuração padrão do LGBMClassifier, usada sem um model_params.json
+MODEL_PARAMS = {
+    "class_weight": "balanced",
+    "random_state": 1234,
+    "boosting_type": "goss",
+    "colsample_bytree": 1.0,
+    "learning_rate": 0.05,
+    "max_depth": 30,
+    "min_child_samples": 10,
+    "min_child_weight": 1,
+    "n_estimators": 150,
+    "num_leaves": 50,
+    "reg_alpha": 0,
+    "reg_lambda": 5,
+    "subsample": 0.9,
+}
 
+# Valores sorteados para cada parâmetro na busca (--tune)
+SEARCH_SPACE = {
+    "boosting_type": ["gbdt", "goss"],
+    "learning_rate": [0.02, 0.05, 0.1],
+    "num_leaves": [15, 31, 50, 127],
+    "max_depth": [-1, 8, 30],
+    "min_child_samples": [10, 50, 200],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "subsample": [0.7, 0.9, 1.0],
+    "reg_alpha": [0, 1],
+    "reg_lambda": [0, 1, 5, 20],
+}
 
-def get_pipeline():
+# Construção do Dataset binário; sem o feature_pre_filter, o mesmo binário
+# serve para qualquer min_child_samples
+DATASET_PARAMS = {"max_bin": 255, "feature_pre_filter": False, "verbose": -1}
+
+# Incremente ao mudar o pré-processamento, para invalidar os binários em cache
+DATASET_CACHE_VERSION = 1
+
+
+def load_model_params(params_path=MODEL_PARAMS_PATH):
+    """
+    Resultado da última busca de hiperparâmetros, ou {} se não houver.
+    """
+    if params_path is None or not os.path.exists(params_path):
+        return {}
+    with open(params_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_pipeline(onehot_output="frame", model_params=None):
     """
     Retorna o pipeline de treinamento.
+
+    `onehot_output` escolhe a saída do OneHotFeatureEncoder: "frame"
+    (DataFrame float64), "dense" (float32) ou "sparse" (CSR float32).
+    `model_params` sobrescreve parâmetros de MODEL_PARAMS no LGBMClassifier.
     """
-    model = LGBMClassifier(
-        class_weight="balanced",
-        random_state=1234,
-        boosting_type="goss",
-        colsample_bytree=1.0,
-        learning_rate=0.05,
-        max_depth=30,
-        min_child_samples=10,
-        min_child_weight=1,
-        n_estimators=150,
-        num_leaves=50,
-        reg_alpha=0,
-        reg_lambda=5,
-        subsample=0.9,
-    )
+    model = LGBMClassifier(**{**MODEL_PARAMS, **(model_params or {})})
 
     pipeline = Pipeline(
         [
+            ("category_grouper", CategoryGrouper()),
             ("kfold_encoder", KFoldTargetEncoder()),
             ("drop_columns", ColumnDropper()),
             ("preprocessor", DataProcessor()),
             ("imputer", ScoreImputer()),
-            ("encoder", OneHotFeatureEncoder()),
+            ("encoder", OneHotFeatureEncoder(output=onehot_output)),
             ("model", model),
         ]
     )
     return pipeline
 
 
-def train_model(train_date=TRAIN_DATA_PATH):
-    df = pd.read_csv(train_date)
-
-    df_train = preprocess_categoria_produto(df)
+def train_model(
+    train_date=TRAIN_DATA_PATH,
+    model_path=MODEL_PATH,
+    artifact_path=ARTIFACT_PATH,
+    params_path=MODEL_PARAMS_PATH,
+):
+    df_train = read_data(train_date)
 
     X_train = df_train.drop(columns=["fraude"])
     y_train = df_train["fraude"]
 
-    pipeline = get_pipeline()
+    tuned = load_model_params(params_path)
+    if tuned:
+        print(f"Usando os hiperparâmetros de {params_path}")
+    pipeline = get_pipeline(model_params=tuned.get("params"))
 
     pipeline.fit(X_train, y_train)
     print("Modelo treinado com sucesso!")
 
-    joblib.dump(pipeline, MODEL_PATH)
-    print(f"Modelo salvo em {MODEL_PATH}")
+    joblib.dump(pipeline, model_path)
+    print(f"Modelo salvo em {model_path}")
+
+    save_artifact(pipeline, artifact_path, threshold=tuned.get("threshold"))
+    print(f"Artefato salvo em {artifact_path}")
+    return pipeline
+
+
+class MatrixSequence(lgb.Sequence):
+    """
+    Matriz (um memmap) lida pelo LightGBM em lotes de `batch_size` linhas.
+
+    As linhas saem em float64, que a amostragem dos bins exige.
+    """
+
+    def __init__(self, matrix, batch_size):
+        self.matrix = matrix
+        self.batch_size = batch_size
+
+    def __getitem__(self, idx):
+        return self.matrix[idx].astype(np.float64)
+
+    def __len__(self):
+        return len(self.matrix)
+
+
+def booster_params(model_params):
+    """
+    Parâmetros do LGBMClassifier no formato do lgb.train.
+    """
+    skip = {"class_weight", "importance_type", "n_estimators", "objective"}
+    params = {k: v for k, v in model_params.items() if k not in skip}
+    params = {k: v for k, v in params.items() if v is not None}
+    params.setdefault("verbose", -1)
+    return {**params, "objective": "binary"}
+
+
+def dataset_key(fingerprint, preprocessing, model_params):
+    """
+    Chave do Dataset em cache: conteúdo dos dados, configuração do
+    pré-processamento, parâmetros de binning e pesos das classes.
+    """
+    spec = {
+        "version": DATASET_CACHE_VERSION,
+        "lightgbm": lgb.__version__,
+        "data": fingerprint["sha256"],
+        "preprocessing": {
+            name: step.get_params() for name, step in preprocessing.steps
+        },
+        "dataset": DATASET_PARAMS,
+        "subsample_for_bin": model_params["subsample_for_bin"],
+        "class_weight": model_params["class_weight"],
+    }
+    encoded = json.dumps(spec, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def iter_transformed_chunks(data_path, chunksize, columns, steps):
+    """
+    Blocos `(X, y)` de um arquivo de treino passados pelas etapas `steps`.
+    """
+    for chunk in iter_data_chunks(data_path, chunksize, columns=columns):
+        y = chunk.pop("fraude").to_numpy()
+        for step in steps:
+            chunk = step.transform(chunk)
+        yield chunk, y
+
+
+def fit_in_chunks(preprocessing, data_path, columns=None, chunksize=100_000):
+    """
+    Ajusta o pré-processamento lendo o arquivo de treino em blocos.
+
+    Cada etapa é ajustada pelo seu `fit_chunks`, que relê o arquivo quantas
+    vezes precisar, com os blocos já transformados pelas etapas anteriores.
+    O resultado é o do `fit` com os dados inteiros, a menos dos bins dos
+    histogramas do ScoreImputer, sem nunca carregar mais de um bloco.
+    """
+    for i, (_, step) in enumerate(preprocessing.steps):
+        steps = [fitted for _, fitted in preprocessing.steps[:i]]
+        step.fit_chunks(
+            partial(iter_transformed_chunks, data_path, chunksize, columns, steps)
+        )
+    return preprocessing
+
+
+def build_dataset(
+    data_path,
+    model_params,
+    cache_dir=DATASET_CACHE_DIR,
+    chunksize=100_000,
+    pipeline_params=None,
+):
+    """
+    Dataset do LightGBM e pré-processamento ajustado de um arquivo de treino.
+
+    O pré-processamento é ajustado em blocos de `chunksize` linhas
+    (`fit_in_chunks`), só com as colunas que ele usa; depois os dados são
+    transformados, também em blocos, para uma matriz float32 em disco, que o
+    LightGBM amostra e lê em lotes para montar o Dataset. Em memória ficam um
+    bloco por vez, o target e o fold de cada linha. O binário do Dataset e o
+    pré-processamento ficam em `cache_dir`, sob uma chave do conteúdo dos
+    dados e da configuração, então as próximas execuções não leem nem
+    discretizam os dados. Retorna `(dataset, preprocessing, veio_do_cache)`.
+    """
+    data_path = os.path.abspath(data_path)
+    preprocessing = get_pipeline(onehot_output="dense")[:-1]
+    preprocessing.set_params(**(pipeline_params or {}))
+    dataset_params = {
+        **DATASET_PARAMS,
+        "bin_construct_sample_cnt": model_params["subsample_for_bin"],
+    }
+
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    manifest = read_manifest(manifest_path)
+    manifest[data_path] = file_fingerprint(data_path, manifest.get(data_path))
+    write_manifest(manifest, manifest_path)
+
+    key = dataset_key(manifest[data_path], preprocessing, model_params)
+    binary_path = os.path.join(cache_dir, f"{key}.bin")
+    preprocessing_path = os.path.join(cache_dir, f"{key}.preprocessing.pkl")
+    if os.path.exists(binary_path) and os.path.exists(preprocessing_path):
+        dataset = lgb.Dataset(binary_path, params=dataset_params)
+        return dataset, joblib.load(preprocessing_path), True
+
+    # Só as colunas descartadas sem passar antes por outra etapa ficam de fora
+    needed = {
+        preprocessing.named_steps["category_grouper"].colname,
+        *preprocessing.named_steps["kfold_encoder"].columns_,
+    }
+    dropped = set(ColumnDropper.columns) - needed
+    columns = [col for col in data_columns(data_path) if col not in dropped]
+
+    y = np.concatenate(
+        [
+            chunk["fraude"].to_numpy()
+            for chunk in iter_data_chunks(data_path, chunksize, columns=["fraude"])
+        ]
+    )
+    fit_in_chunks(preprocessing, data_path, columns, chunksize)
+    feature_names = list(preprocessing.named_steps["encoder"].feature_names_out_)
+
+    matrix_path = os.path.join(cache_dir, f"{key}.npy.tmp")
+    matrix = np.lib.format.open_memmap(
+        matrix_path, mode="w+", dtype=np.float32, shape=(len(y), len(feature_names))
+    )
+    offset = 0
+    for chunk in iter_data_chunks(data_path, chunksize, columns=columns):
+        chunk = chunk.drop(columns=["fraude"])
+        matrix[offset : offset + len(chunk)] = preprocessing.transform(chunk)
+        offset += len(chunk)
+
+    class_weight = model_params["class_weight"]
+    dataset = lgb.Dataset(
+        [MatrixSequence(matrix, chunksize)],
+        label=y,
+        weight=compute_sample_weight(class_weight, y) if class_weight else None,
+        feature_name=feature_names,
+        params=dataset_params,
+    ).construct()
+    dataset.save_binary(f"{binary_path}.tmp")
+    os.replace(f"{binary_path}.tmp", binary_path)
+    joblib.dump(preprocessing, f"{preprocessing_path}.tmp")
+    os.replace(f"{preprocessing_path}.tmp", preprocessing_path)
+    del matrix
+    os.remove(matrix_path)
+    return dataset, preprocessing, False
+
+
+def train_model_out_of_core(
+    train_date=TRAIN_DATA_PATH,
+    model_path=MODEL_PATH,
+    artifact_path=ARTIFACT_PATH,
+    params_path=MODEL_PARAMS_PATH,
+    cache_dir=DATASET_CACHE_DIR,
+    chunksize=100_000,
+    pipeline_params=None,
+):
+    """
+    Treina como o `train_model`, mas a partir do Dataset de `build_dataset`.
+
+    Os dados nunca passam inteiros pelo pipeline do sklearn e, com o Dataset
+    em cache, o treino vai direto ao boosting. Salva o mesmo pipeline e o
+    mesmo artefato do `train_model`.
+    """
+    tuned = load_model_params(params_path)
+    model = LGBMClassifier(**{**MODEL_PARAMS, **tuned.get("params", {})})
+    params = model.get_params()
+
+    start = time.perf_counter()
+    dataset, preprocessing, cached = build_dataset(
+        train_date, params, cache_dir, chunksize, pipeline_params
+    )
+    origin = "do cache" if cached else "construído"
+    print(f"Dataset {origin} em {time.perf_counter() - start:.1f}s")
+
+    booster = lgb.train(
+        booster_params(params), dataset, num_boost_round=params["n_estimators"]
+    )
+    booster.free_dataset()
+    print("Modelo treinado com sucesso!")
+
+    # O pipeline salvo transforma para DataFrame, como o do train_model
+    preprocessing.set_params(encoder__output="frame")
+    classifier = BoosterClassifier(booster, estimator=model, n_jobs=model.n_jobs)
+    pipeline = Pipeline(preprocessing.steps + [("model", classifier)])
+
+    joblib.dump(pipeline, model_path)
+    print(f"Modelo salvo em {model_path}")
+
+    save_artifact(pipeline, artifact_path, threshold=tuned.get("threshold"))
+    print(f"Artefato salvo em {artifact_path}")
+    return pipeline
+
+
+def sample_params(n_trials, random_state=1234):
+    """
+    Configurações candidatas: a padrão seguida de sorteios do SEARCH_SPACE.
+    """
+    rng = random.Random(random_state)
+    candidates = [{name: MODEL_PARAMS[name] for name in SEARCH_SPACE}]
+    while len(candidates) < n_trials:
+        params = {name: rng.choice(values) for name, values in SEARCH_SPACE.items()}
+        if params not in candidates:
+            candidates.append(params)
+    for params in candidates:
+        # O bagging só vale no gbdt; o GOSS recusa subsample_freq > 0
+        params["subsample_freq"] = 1 if params["boosting_type"] == "gbdt" else 0
+    return candidates
+
+
+def prepare_folds(X, y, n_splits=3, random_state=1234, pipeline_params=None):
+    """
+    Ajusta o pré-processamento uma única vez por fold de validação cruzada.
+
+    Retorna, para cada fold, as matrizes float32 de treino e validação já
+    transformadas, os rótulos e o valor das compras de validação (para o
+    lucro). Todas as configurações avaliadas reaproveitam essas matrizes.
+    """
+    y = np.asarray(y)
+    folds = []
+    splitter = StratifiedKFold(n_splits, shuffle=True, random_state=random_state)
+    for train_idx, valid_idx in splitter.split(X, y):
+        preprocessing = get_pipeline(onehot_output="dense")[:-1]
+        preprocessing.set_params(**(pipeline_params or {}))
+        X_train = preprocessing.fit_transform(X.iloc[train_idx], y[train_idx])
+        folds.append(
+            {
+                "X_train": X_train,
+                "y_train": y[train_idx],
+                "X_valid": preprocessing.transform(X.iloc[valid_idx]),
+                "y_valid": y[valid_idx],
+                "amount": X["valor_compra"].to_numpy()[valid_idx],
+            }
+        )
+    return folds
+
+
+def evaluate_params(params, fold, max_estimators=1000, early_stopping_rounds=50):
+    """
+    Treina uma configuração num fold, com parada antecipada pela AUC de
+    validação, e mede o lucro no melhor threshold das predições de validação.
+    """
+    model = LGBMClassifier(
+        **{
+            **MODEL_PARAMS,
+            **params,
+            "n_estimators": max_estimators,
+            "metric": "auc",
+            "n_jobs": 1,  # O paralelismo fica entre as configurações
+            "verbose": -1,
+        }
+    )
+    model.fit(
+        fold["X_train"],
+        fold["y_train"],
+        eval_set=[(fold["X_valid"], fold["y_valid"])],
+        callbacks=[early_stopping(early_stopping_rounds, verbose=False)],
+    )
+    # Direto no booster: a matriz não tem nomes de colunas para o sklearn checar
+    proba = model.booster_.predict(fold["X_valid"], num_iteration=model.best_iteration_)
+    best = best_threshold(profit_curve(fold["y_valid"], proba, fold["amount"]))
+    return {
+        "profit": float(best["profit"]),
+        "threshold": float(best["threshold"]),
+        "best_iteration": int(model.best_iteration_ or max_estimators),
+    }
+
+
+def search_params(
+    X,
+    y,
+    n_trials=30,
+    n_splits=3,
+    keep=0.5,
+    n_jobs=-1,
+    max_estimators=1000,
+    early_stopping_rounds=50,
+    random_state=1234,
+    pipeline_params=None,
+):
+    """
+    Busca a configuração do LightGBM de maior lucro na validação cruzada.
+
+    As configurações de `sample_params` são avaliadas em paralelo, um fold
+    por vez, sobre as matrizes de `prepare_folds` (o joblib as compartilha
+    com os processos por memmap). Depois de cada fold só a fração `keep`
+    com o maior lucro médio até ali segue para o próximo; as demais são
+    podadas. O resultado traz os parâmetros vencedores, com `n_estimators`
+    pela média das iterações da parada antecipada, e o threshold médio.
+    """
+    folds = prepare_folds(X, y, n_splits, random_state, pipeline_params)
+    trials = [
+        {"params": params, "folds": []}
+        for params in sample_params(n_trials, random_state)
+    ]
+
+    def mean_profit(trial):
+        return np.mean([result["profit"] for result in trial["folds"]])
+
+    alive = trials
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for i, fold in enumerate(folds):
+            results = parallel(
+                delayed(evaluate_params)(
+                    trial["params"], fold, max_estimators, early_stopping_rounds
+                )
+                for trial in alive
+            )
+            for trial, result in zip(alive, results):
+                trial["folds"].append(result)
+            if i < len(folds) - 1:
+                alive = sorted(alive, key=mean_profit, reverse=True)
+                alive = alive[: max(1, math.ceil(len(alive) * keep))]
+            print(f"Fold {i + 1}/{len(folds)}: {len(results)} configurações")
+
+    best = max(alive, key=mean_profit)
+    params = {
+        **best["params"],
+        "n_estimators": int(np.mean([r["best_iteration"] for r in best["folds"]])),
+    }
+    return {
+        "params": params,
+        "threshold": float(np.mean([r["threshold"] for r in best["folds"]])),
+        "cv_profit": float(mean_profit(best)),
+        "n_splits": n_splits,
+        "trials": [
+            {
+                "params": trial["params"],
+                "folds_evaluated": len(trial["folds"]),
+                "cv_profit": float(mean_profit(trial)),
+            }
+            for trial in trials
+        ],
+    }
+
+
+def tune_model(train_date=TRAIN_DATA_PATH, params_path=MODEL_PARAMS_PATH, **kwargs):
+    """
+    Roda a busca no conjunto de treino e grava o resultado em `params_path`,
+    de onde o `train_model` lê a configuração e o threshold.
+    """
+    df_train = read_data(train_date)
+    result = search_params(
+        df_train.drop(columns=["fraude"]), df_train["fraude"], **kwargs
+    )
+    with open(f"{params_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    os.replace(f"{params_path}.tmp", params_path)
+    print(
+        f"Melhor lucro médio na validação: {result['cv_profit']:.2f} "
+        f"(threshold {result['threshold']:.3f}); salvo em {params_path}"
+    )
+    return result
+
+
+def evaluate_pipeline(pipeline, X, y):
+    """
+    AUC e lucro no melhor threshold de um pipeline num conjunto rotulado.
+    """
+    proba = pipeline.predict_proba(X)[:, 1]
+    best = best_threshold(profit_curve(y, proba, X["valor_compra"]))
+    return {
+        "auc": float(roc_auc_score(y, proba)),
+        "profit": float(best["profit"]),
+        "threshold": float(best["threshold"]),
+    }
+
+
+def update_pipeline(pipeline, X, y, n_estimators=50):
+    """
+    Continua o boosting de um pipeline treinado com um lote novo rotulado.
+
+    As features do lote saem do pré-processamento como estava antes dele
+    (sem o target do próprio lote no target encoding) e as novas árvores
+    partem do booster atual (`init_model`). Depois, as etapas com
+    `partial_fit` somam o lote às suas estatísticas. O vocabulário do
+    CategoryGrouper e as categorias do one-hot continuam os do fit.
+    """
+    y = np.asarray(y)
+    preprocessing, model = pipeline[:-1], pipeline[-1]
+    # O BoosterClassifier do treino out-of-core guarda o LGBMClassifier original
+    estimator = model.estimator if isinstance(model, BoosterClassifier) else model
+    updated = clone(estimator).set_params(n_estimators=n_estimators)
+    updated.fit(preprocessing.transform(X), y, init_model=model.booster_)
+
+    last = max(
+        i
+        for i, (_, step) in enumerate(preprocessing.steps)
+        if hasattr(step, "partial_fit")
+    )
+    Xt = X
+    for _, step in preprocessing.steps[: last + 1]:
+        if hasattr(step, "partial_fit"):
+            step.partial_fit(Xt, y)
+        Xt = step.transform(Xt)
+
+    pipeline.steps[-1] = ("model", updated)
+    return pipeline
+
+
+def update_model(
+    batch_path,
+    model_path=MODEL_PATH,
+    artifact_path=ARTIFACT_PATH,
+    n_estimators=50,
+    eval_path=TEST_DATA_PATH,
+    history_path=TRAIN_DATA_PATH,
+    params_path=MODEL_PARAMS_PATH,
+):
+    """
+    Atualiza o modelo salvo com um lote novo e compara com um retreino completo.
+
+    Reporta o tempo e a AUC/lucro em `eval_path` do modelo atualizado e, com
+    `history_path` (os dados do último treino), de um pipeline treinado do
+    zero no histórico mais o lote. Quando a diferença crescer, é hora de
+    reconstruir o modelo com o `train_model`.
+    """
+    df_batch = read_data(batch_path)
+    X_batch, y_batch = df_batch.drop(columns=["fraude"]), df_batch["fraude"]
+    df_eval = read_data(eval_path)
+    X_eval, y_eval = df_eval.drop(columns=["fraude"]), df_eval["fraude"]
+
+    pipeline = joblib.load(model_path)
+    start = time.perf_counter()
+    update_pipeline(pipeline, X_batch, y_batch, n_estimators)
+    report = {
+        "incremental": {
+            "seconds": time.perf_counter() - start,
+            **evaluate_pipeline(pipeline, X_eval, y_eval),
+        }
+    }
+
+    if history_path is not None:
+        history = pd.concat([read_data(history_path), df_batch], ignore_index=True)
+        start = time.perf_counter()
+        full = get_pipeline(model_params=load_model_params(params_path).get("params"))
+        full.fit(history.drop(columns=["fraude"]), history["fraude"])
+        report["full_retrain"] = {
+            "seconds": time.perf_counter() - start,
+            **evaluate_pipeline(full, X_eval, y_eval),
+        }
+
+    for name, result in report.items():
+        print(
+            f"{name}: {result['seconds']:.1f}s, AUC {result['auc']:.4f}, "
+            f"lucro {result['profit']:.2f}"
+        )
+
+    threshold = read_threshold(artifact_path)
+    joblib.dump(pipeline, model_path)
+    save_artifact(pipeline, artifact_path, threshold=threshold)
+    print(f"Modelo atualizado salvo em {model_path} e {artifact_path}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina o pipeline de fraude.")
+    parser.add_argument(
+        "--tune",
+        action="store_true",
+        help="Busca os hiperparâmetros do LightGBM antes de treinar",
+    )
+    parser.add_argument(
+        "--update",
+        metavar="BATCH",
+        help="Continua o treino do modelo salvo com um lote novo rotulado",
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=50, help="Árvores novas por atualização"
+    )
+    parser.add_argument(
+        "--no-compare",
+        action="store_true",
+        help="Não compara a atualização com um retreino completo",
+    )
+    parser.add_argument(
+        "--out-of-core",
+        action="store_true",
+        help="Treina em blocos, com o Dataset do LightGBM em cache",
+    )
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--params", default=str(MODEL_PARAMS_PATH))
+    parser.add_argument("--n-trials", type=int, default=30)
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--keep", type=float, default=0.5)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    if args.update:
+        update_model(
+            args.update,
+            n_estimators=args.rounds,
+            history_path=None if args.no_compare else TRAIN_DATA_PATH,
+            params_path=args.params,
+        )
+        return
+    if args.tune:
+        tune_model(
+            params_path=args.params,
+            n_trials=args.n_trials,
+            n_splits=args.folds,
+            keep=args.keep,
+            n_jobs=args.n_jobs,
+        )
+    if args.out_of_core:
+        train_model_out_of_core(params_path=args.params, chunksize=args.chunksize)
+    else:
+        train_model(params_path=args.params)
 
 
 if __name__ == "__main__":
-    train_model()
+    main()
@@ -0,0 +1,411 @@
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from aggregates import ScoringSummary
+from artifact import read_threshold
+from config import (
+    ARTIFACT_PATH,
+    MONITORING_DIR,
+    PREDICTIONS_PATH,
+    PREDICTIONS_PATH_TRAIN,
+)
+from dataset import file_fingerprint
+from prediction_log import segment_paths
+
+STATE_FILE = "state.json"
+RESULTS_FILE = "results.parquet"
+
+# Colunas geradas pelo make_predictions e pelo log de predições da API, fora
+# do perfil das features
+PREDICTION_COLUMNS = [
+    "predicted_fraude",
+    "predicted_proba",
+    "true_fraude",
+    "threshold",
+    "model_version",
+    "endpoint",
+    "logged_at",
+]
+
+# Coluna que define o dia de cada transação: a data da compra nos arquivos do
+# make_predictions ou o momento do scoring nos segmentos do log da API
+DATE_COLUMNS = ["data_compra", "logged_at"]
+
+# Bins do histograma de scores por chunk e faixas usadas na calibração
+N_BINS = 200
+CALIBRATION_BINS = 20
+
+
+def read_chunks(path, chunksize=100_000):
+    """
+    Lê um arquivo de predições (CSV ou segmento Parquet do log) em blocos.
+    """
+    if str(path).endswith(".parquet"):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def iter_daily_chunks(path, date=None, chunksize=100_000):
+    """
+    Lê um arquivo de predições em blocos e gera (dia, bloco) por dia.
+
+    Sem uma coluna de data, `date` atribui o arquivo inteiro a um único dia.
+    """
+    for chunk in read_chunks(path, chunksize):
+        if date is not None:
+            yield str(date), chunk
+            continue
+        date_column = next((c for c in DATE_COLUMNS if c in chunk), None)
+        if date_column is None:
+            raise ValueError(f"{path} não tem {DATE_COLUMNS}; informe a data")
+        days = pd.to_datetime(chunk[date_column]).dt.strftime("%Y-%m-%d")
+        for day, rows in chunk.groupby(days, sort=False):
+            yield day, rows
+
+
+def summarize(chunk, threshold):
+    """
+    Resumo mesclável de um bloco de predições, com o threshold usado.
+
+    O threshold vem da coluna `threshold` das predições (no log da API, o do
+    modelo que pontuou cada linha; o mais frequente, se o bloco tiver mais de
+    um) e `threshold` só vale para arquivos sem essa coluna.
+    """
+    logged = chunk["threshold"].mode() if "threshold" in chunk else ()
+    if len(logged):
+        threshold = float(logged.iloc[0])
+    X = chunk.drop(columns=PREDICTION_COLUMNS + ["fraude"], errors="ignore")
+    y_true = chunk["true_fraude"] if "true_fraude" in chunk else None
+    return ScoringSummary(threshold, n_bins=N_BINS).update(
+        X, y_true, chunk["predicted_fraude"], chunk["predicted_proba"]
+    )
+
+
+def calibration(reference):
+    """
+    Probabilidade observada de fraude em cada bin de score da referência.
+
+    Os bins são agrupados em faixas de `CALIBRATION_BINS` para reduzir o
+    ruído; faixas vazias usam o próprio score como estimativa.
+    """
+    neg, pos = reference.score_counts.reshape(2, CALIBRATION_BINS, -1).sum(axis=2)
+    centers = (np.arange(CALIBRATION_BINS) + 0.5) / CALIBRATION_BINS
+    total = neg + pos
+    calibrated = np.where(total > 0, pos / np.maximum(total, 1), centers)
+    return np.repeat(calibrated, N_BINS // CALIBRATION_BINS)
+
+
+def _binary_metrics(neg, pos, threshold_bin):
+    """
+    Métricas a partir de histogramas (possivelmente fracionários) de scores
+    de não fraudes e fraudes; bins a partir de `threshold_bin` são bloqueados.
+    """
+    tn, fn = neg[:threshold_bin].sum(), pos[:threshold_bin].sum()
+    fp, tp = neg[threshold_bin:].sum(), pos[threshold_bin:].sum()
+    total = tn + fn + fp + tp
+    precision = tp / (tp + fp) if tp + fp else np.nan
+    recall = tp / (tp + fn) if tp + fn else np.nan
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else np.nan
+    neg_below = np.cumsum(neg) - neg
+    roc_auc = (
+        (pos * (neg_below + 0.5 * neg)).sum() / (pos.sum() * neg.sum())
+        if pos.sum() and neg.sum()
+        else np.nan
+    )
+    return {
+        "roc_auc": roc_auc,
+        "f1": f1,
+        "precision": precision,
+        "recall": recall,
+        "accuracy": (tp + tn) / total if total else np.nan,
+    }
+
+
+def performance(summary, calibrated=None):
+    """
+    Métricas realizadas (com rótulos) ou estimadas pela probabilidade
+    calibrada de cada bin, como no CBPE.
+    """
+    threshold_bin = int(np.ceil(summary.threshold * N_BINS))
+    if calibrated is None:
+        neg, pos = summary.score_counts
+    else:
+        counts = summary.score_counts.sum(axis=0)
+        neg, pos = counts * (1 - calibrated), counts * calibrated
+    return _binary_metrics(neg, pos, threshold_bin)
+
+
+def chunk_results(day, summary, reference, calibrated, period):
+    """
+    Linhas de resultado de um chunk: desempenho estimado e realizado, taxa de
+    nulos, valores não vistos na referência e médias das colunas.
+    """
+    rows = []
+
+    def add(kind, column, value):
+        rows.append((day, period, kind, column, float(value), summary.n_rows))
+
+    for metric, value in performance(summary, calibrated).items():
+        add("estimated_performance", metric, value)
+    if summary.labeled:
+        for metric, value in performance(summary).items():
+            add("realized_performance", metric, value)
+    for column, nulls in summary.nulls.items():
+        add("missing_rate", column, nulls / summary.n_rows)
+    for column, counts in summary.categories.items():
+        seen = reference.categories.get(column, {})
+        add("unseen_values", column, sum(n for v, n in counts.items() if v not in seen))
+    for column, mean in summary.means().items():
+        add("mean", column, mean)
+    return rows
+
+
+def with_alerts(results):
+    """
+    Adiciona limites de alerta (média ± 3 desvios dos chunks de referência)
+    e marca os chunks de análise fora deles.
+    """
+    reference = results[results["period"] == "reference"]
+    # O desempenho estimado é comparado ao realizado na referência, como no CBPE
+    realized = reference[reference["kind"] == "realized_performance"]
+    reference = pd.concat(
+        [
+            reference[reference["kind"] != "estimated_performance"],
+            realized.assign(kind="estimated_performance"),
+        ]
+    )
+    bounds = (
+        reference.groupby(["kind", "column"])["value"]
+        .agg(["mean", "std"])
+        .fillna({"std": 0.0})
+    )
+    bounds["lower"] = bounds["mean"] - 3 * bounds["std"]
+    bounds["upper"] = bounds["mean"] + 3 * bounds["std"]
+
+    results = results.drop(columns=["lower", "upper", "alert"], errors="ignore")
+    results = results.join(bounds[["lower", "upper"]], on=["kind", "column"])
+    results["alert"] = (results["period"] == "analysis") & (
+        (results["value"] < results["lower"]) | (results["value"] > results["upper"])
+    )
+    return results
+
+
+class MonitoringStore:
+    """
+    Estado persistido do monitoramento: resumos diários da referência e da
+    análise, arquivos já processados e a tabela de resultados por chunk.
+
+    Cada dia guarda um ScoringSummary. Os arquivos de inferência são
+    identificados pelo caminho e guardam os seus próprios resumos diários;
+    o resumo de um dia é a soma dos resumos dos arquivos. Um arquivo
+    reescrito no mesmo caminho substitui a contribuição anterior, em vez de
+    somar as linhas de novo, e só os dias tocados têm os resultados
+    recalculados.
+    """
+
+    def __init__(self, directory=MONITORING_DIR):
+        self.directory = str(directory)
+        self.state_path = os.path.join(self.directory, STATE_FILE)
+        self.results_path = os.path.join(self.directory, RESULTS_FILE)
+        self.state = {
+            "reference": {"fingerprint": None, "days": {}},
+            "analysis": {"files": {}, "days": {}},
+        }
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def days(self, period):
+        return {
+            day: ScoringSummary.from_dict(data)
+            for day, data in self.state[period]["days"].items()
+        }
+
+    def reference_summary(self):
+        summaries = list(self.days("reference").values())
+        if not summaries:
+            raise LookupError("Referência ausente: rode o job com --reference")
+        total = summaries[0]
+        for summary in summaries[1:]:
+            total.merge(summary)
+        return total
+
+    def results(self):
+        if not os.path.exists(self.results_path):
+            return pd.DataFrame()
+        return pd.read_parquet(self.results_path)
+
+    @staticmethod
+    def _summarize_file(path, threshold, date=None):
+        days = {}
+        for day, chunk in iter_daily_chunks(path, date=date):
+            summary = summarize(chunk, threshold)
+            days[day] = days[day].merge(summary) if day in days else summary
+        return days
+
+    def _rebuild_analysis_days(self, days):
+        """
+        Refaz o resumo de cada dia a partir dos resumos dos arquivos.
+        """
+        totals = {}
+        for entry in self.state["analysis"]["files"].values():
+            for day in days & entry["days"].keys():
+                summary = ScoringSummary.from_dict(entry["days"][day])
+                totals[day] = totals[day].merge(summary) if day in totals else summary
+        state_days = self.state["analysis"]["days"]
+        for day in days:
+            if day in totals:
+                state_days[day] = totals[day].to_dict()
+            else:
+                state_days.pop(day, None)
+
+    def update_reference(self, path, threshold):
+        """
+        Recalcula os resumos da referência se o arquivo mudou.
+        """
+        previous = self.state["reference"]["fingerprint"]
+        fingerprint = file_fingerprint(path, previous)
+        if previous and previous.get("sha256") == fingerprint["sha256"]:
+            return False
+        days = self._summarize_file(path, threshold)
+        self.state["reference"] = {
+            "fingerprint": fingerprint,
+            "days": {day: summary.to_dict() for day, summary in days.items()},
+        }
+        return True
+
+    def ingest(self, path, threshold, date=None):
+        """
+        Processa um arquivo de inferência novo ou alterado; arquivos sem
+        mudança são ignorados. Retorna os dias atualizados, incluindo os que
+        só a versão anterior do arquivo tocava.
+        """
+        key = os.path.abspath(path)
+        files = self.state["analysis"]["files"]
+        previous = files.get(key)
+        fingerprint = file_fingerprint(path, previous and previous["fingerprint"])
+        if previous and previous["fingerprint"]["sha256"] == fingerprint["sha256"]:
+            return set()
+        days = self._summarize_file(path, threshold, date)
+        files[key] = {
+            "fingerprint": fingerprint,
+            "days": {day: summary.to_dict() for day, summary in days.items()},
+        }
+        touched = set(days) | set(previous["days"] if previous else ())
+        self._rebuild_analysis_days(touched)
+        return touched
+
+    def refresh(self, reference_changed, touched):
+        """
+        Recalcula os resultados dos chunks afetados e os limites de alerta.
+        """
+        reference = self.reference_summary()
+        calibrated = calibration(reference)
+        results = self.results()
+        if reference_changed or results.empty:
+            to_compute = {
+                "reference": self.days("reference"),
+                "analysis": self.days("analysis"),
+            }
+            results = pd.DataFrame()
+        else:
+            analysis = self.days("analysis")
+            to_compute = {
+                "analysis": {day: analysis[day] for day in touched if day in analysis}
+            }
+            results = results[
+                ~((results["period"] == "analysis") & results["date"].isin(touched))
+            ]
+
+        rows = [
+            row
+            for period, days in to_compute.items()
+            for day, summary in days.items()
+            for row in chunk_results(day, summary, reference, calibrated, period)
+        ]
+        columns = ["date", "period", "kind", "column", "value", "n_rows"]
+        results = pd.concat(
+            [results, pd.DataFrame(rows, columns=columns)], ignore_index=True
+        )
+        return with_alerts(results).sort_values(["period", "date", "kind", "column"])
+
+    def save(self, results):
+        os.makedirs(self.directory, exist_ok=True)
+        results.to_parquet(f"{self.results_path}.tmp", index=False)
+        os.replace(f"{self.results_path}.tmp", self.results_path)
+        with open(f"{self.state_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+
+def run_monitoring(
+    inference_paths,
+    reference_path=PREDICTIONS_PATH_TRAIN,
+    directory=MONITORING_DIR,
+    threshold=None,
+    date=None,
+):
+    """
+    Atualiza o monitoramento com novos arquivos de predições.
+
+    A referência (predições do treino, com rótulos) é resumida por dia uma
+    vez e refeita só quando o arquivo muda; cada arquivo de inferência é
+    processado uma única vez, um dia por vez. Um diretório é lido como log
+    de predições da API, com cada segmento completo tratado como um arquivo.
+    O `threshold` (por padrão, o do artefato) vale para os arquivos sem a
+    coluna `threshold`; nos demais, vale o registrado em cada predição.
+    """
+    threshold = read_threshold(ARTIFACT_PATH) if threshold is None else threshold
+    store = MonitoringStore(directory)
+    reference_changed = store.update_reference(reference_path, threshold)
+    touched = set()
+    for path in inference_paths:
+        paths = segment_paths(path) if os.path.isdir(path) else [path]
+        for segment in paths:
+            touched |= store.ingest(segment, threshold, date)
+
+    if reference_changed or touched:
+        store.save(store.refresh(reference_changed, touched))
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Atualiza o monitoramento de drift com novas predições."
+    )
+    parser.add_argument(
+        "inference",
+        nargs="*",
+        default=[str(PREDICTIONS_PATH)],
+        help="Arquivos de predições do make_predictions ou diretórios do log da API",
+    )
+    parser.add_argument("--reference", default=str(PREDICTIONS_PATH_TRAIN))
+    parser.add_argument("--output", default=str(MONITORING_DIR))
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        help="Threshold dos arquivos sem a coluna threshold (padrão: o do artefato)",
+    )
+    parser.add_argument(
+        "--date", help="Dia dos arquivos sem coluna data_compra (AAAA-MM-DD)"
+    )
+    args = parser.parse_args()
+
+    store = run_monitoring(
+        args.inference, args.reference, args.output, args.threshold, args.date
+    )
+    results = store.results()
+    analysis = results[results["period"] == "analysis"]
+    print(
+        f"{analysis['date'].nunique()} dias monitorados, "
+        f"{int(analysis['alert'].sum())} alertas. Resultados em {store.results_path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from metrics import Counter
+
+
+def record_key(record, version):
+    """
+    Chave canônica de um registro: hash dos campos ordenados e a versão do modelo.
+    """
+    payload = json.dumps(record, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.blake2b(payload.encode(), digest_size=16).digest()
+    return version, digest
+
+
+class PredictionCache:
+    """
+    Cache LRU com TTL das probabilidades já calculadas.
+
+    As entradas expiram `ttl_seconds` depois de gravadas e as menos usadas
+    saem quando o cache passa de `max_size` itens. A chave inclui a versão do
+    modelo, e o cache inteiro é descartado quando uma versão nova aparece.
+    """
+
+    def __init__(
+        self,
+        max_size=10_000,
+        ttl_seconds=30.0,
+        registry=None,
+        prefix="",
+        clock=time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self.hits = Counter(
+            f"{prefix}prediction_cache_hits_total",
+            "Registros respondidos pelo cache de predições.",
+        )
+        self.misses = Counter(
+            f"{prefix}prediction_cache_misses_total",
+            "Registros ausentes ou expirados no cache de predições.",
+        )
+        self.evictions = Counter(
+            f"{prefix}prediction_cache_evictions_total",
+            "Entradas removidas do cache por limite de tamanho.",
+        )
+        if registry is not None:
+            for counter in (self.hits, self.misses, self.evictions):
+                registry.register(counter)
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self, records, version):
+        return [record_key(record, version) for record in records]
+
+    def get_many(self, keys):
+        """
+        Probabilidades em cache de cada chave, com NaN onde não há entrada válida.
+        """
+        proba = np.full(len(keys), np.nan)
+        now = self.clock()
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key[0] != self._version:
+                    # Modelo novo: as entradas antigas não servem mais
+                    self._entries.clear()
+                    self._version = key[0]
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                proba[i] = value
+        n_hits = int(np.count_nonzero(~np.isnan(proba)))
+        self.hits.inc(n_hits)
+        self.misses.inc(len(keys) - n_hits)
+        return proba
+
+    def put_many(self, keys, proba):
+        expires_at = self.clock() + self.ttl
+        n_evicted = 0
+        with self._lock:
+            for key, value in zip(keys, proba):
+                if key[0] != self._version:
+                    continue
+                self._entries[key] = (expires_at, float(value))
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                n_evicted += 1
+        self.evictions.inc(n_evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
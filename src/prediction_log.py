@@ -0,0 +1,292 @@
+import asyncio
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+from columnar import FIELDS
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+ARROW_TYPES = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "str": pa.string(),
+    "optional_str": pa.string(),
+}
+
+# Campos de entrada seguidos do resultado de cada transação pontuada
+SCHEMA = pa.schema(
+    [(name, ARROW_TYPES[kind]) for name, kind in FIELDS.items()]
+    + [
+        ("predicted_proba", pa.float64()),
+        ("predicted_fraude", pa.int64()),
+        ("threshold", pa.float64()),
+        ("model_version", pa.string()),
+        ("endpoint", pa.string()),
+        ("logged_at", pa.timestamp("ms", tz="UTC")),
+    ]
+)
+INPUT_SCHEMA = pa.schema([SCHEMA.field(name) for name in FIELDS])
+
+POLICIES = ("block", "drop")
+
+# Intervalo entre tentativas de enfileirar com a fila cheia, no event loop
+ASYNC_POLL_SECONDS = 0.005
+
+
+def segment_paths(directory):
+    """
+    Segmentos completos de um log de predições, do mais antigo ao mais novo.
+    """
+    return sorted(glob.glob(os.path.join(str(directory), "*.parquet")))
+
+
+def read_prediction_log(directory, columns=None):
+    """
+    Lê todos os segmentos completos de um log de predições como DataFrame.
+    """
+    paths = segment_paths(directory)
+    if not paths:
+        return SCHEMA.empty_table().to_pandas()
+    return pq.ParquetDataset(paths).read(columns=columns).to_pandas()
+
+
+class PredictionLogger:
+    """
+    Grava as transações pontuadas em segmentos Parquet sem bloquear a API.
+
+    Cada chamada a `log_*` só põe o lote numa fila limitada a `max_queue`
+    itens; uma thread escreve em grupos de pelo menos `batch_rows` linhas
+    (ou a cada `flush_interval` segundos). O segmento atual é fechado e
+    renomeado para `.parquet` ao passar de `segment_rows` linhas ou
+    `segment_seconds` segundos, então leitores nunca veem um segmento
+    incompleto. Com a fila cheia, `policy="drop"` descarta o lote e conta
+    as linhas perdidas; `policy="block"` segura quem chamou por até
+    `block_timeout` segundos, aplicando a pressão de volta na API, e depois
+    descarta o lote com um aviso no log. Os descartes são contados em
+    `dropped` com o motivo no label `reason`. Nos
+    endpoints assíncronos, as versões `*_async` esperam sem bloquear o event
+    loop, então só a requisição que loga fica parada.
+    """
+
+    def __init__(
+        self,
+        directory,
+        max_queue=10_000,
+        batch_rows=1_000,
+        flush_interval=1.0,
+        segment_rows=100_000,
+        segment_seconds=300.0,
+        policy="block",
+        block_timeout=5.0,
+        registry=None,
+        prefix="",
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Política inválida: {policy!r} (use {POLICIES})")
+        self.directory = str(directory)
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.segment_rows = segment_rows
+        self.segment_seconds = segment_seconds
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.logged = Counter(
+            f"{prefix}prediction_log_rows_total",
+            "Transações gravadas no log de predições.",
+        )
+        self.dropped = Counter(
+            f"{prefix}prediction_log_dropped_rows_total",
+            "Transações não gravadas no log de predições, por motivo.",
+            labelnames=("reason",),
+        )
+        self.segments = Counter(
+            f"{prefix}prediction_log_segments_total",
+            "Segmentos do log de predições fechados.",
+        )
+        if registry is not None:
+            for counter in (self.logged, self.dropped, self.segments):
+                registry.register(counter)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._writer = None
+        self._segment = None
+        self._segment_rows = 0
+        self._segment_opened = 0.0
+        self._sequence = 0
+
+    def start(self):
+        """
+        Inicia a thread de escrita (uma por processo, depois do fork).
+        """
+        if self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """
+        Grava o que estiver na fila e fecha o segmento atual.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def log_records(self, records, scores, endpoint):
+        """
+        Enfileira registros (dicts no formato do /predict) e os seus scores.
+        """
+        self._put(("records", records, scores, endpoint, time.time()), len(records))
+
+    def log_columns(self, columns, scores, endpoint):
+        """
+        Enfileira colunas já validadas (um array por campo) e os seus scores.
+        """
+        self._put(("columns", columns, scores, endpoint, time.time()), len(scores))
+
+    async def log_records_async(self, records, scores, endpoint):
+        """
+        Como `log_records`, mas a espera com a fila cheia não bloqueia o loop.
+        """
+        item = ("records", records, scores, endpoint, time.time())
+        await self._put_async(item, len(records))
+
+    async def log_columns_async(self, columns, scores, endpoint):
+        """
+        Como `log_columns`, mas a espera com a fila cheia não bloqueia o loop.
+        """
+        item = ("columns", columns, scores, endpoint, time.time())
+        await self._put_async(item, len(scores))
+
+    def _put_nowait(self, item, n_rows):
+        """
+        Tenta enfileirar sem esperar; False se a política manda esperar.
+        """
+        if n_rows == 0:
+            return True
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if self.policy == "block":
+                return False
+            self.dropped.labels("queue_full").inc(n_rows)
+        return True
+
+    def _drop_blocked(self, n_rows):
+        self.dropped.labels("block_timeout").inc(n_rows)
+        logger.warning(
+            "Log de predições sem espaço após %.1fs; %d transações descartadas",
+            self.block_timeout,
+            n_rows,
+        )
+
+    def _put(self, item, n_rows):
+        if self._put_nowait(item, n_rows):
+            return
+        # Segura a thread de quem chamou até a escrita alcançar
+        try:
+            self._queue.put(item, timeout=self.block_timeout)
+        except queue.Full:
+            self._drop_blocked(n_rows)
+
+    async def _put_async(self, item, n_rows):
+        if self._put_nowait(item, n_rows):
+            return
+        # Espera cedendo o event loop: as outras requisições seguem atendidas
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.block_timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(ASYNC_POLL_SECONDS)
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+        self._drop_blocked(n_rows)
+
+    def _to_table(self, item):
+        kind, data, scores, endpoint, logged_at = item
+        if kind == "records":
+            table = pa.Table.from_pylist(data, schema=INPUT_SCHEMA)
+        else:
+            table = pa.table({name: data[name] for name in FIELDS}, schema=INPUT_SCHEMA)
+        n_rows = len(scores)
+        results = {
+            "predicted_proba": scores.proba,
+            "predicted_fraude": scores.predictions(),
+            "threshold": [scores.threshold] * n_rows,
+            "model_version": [scores.version] * n_rows,
+            "endpoint": [endpoint] * n_rows,
+            "logged_at": [int(logged_at * 1000)] * n_rows,
+        }
+        for name, values in results.items():
+            table = table.append_column(
+                SCHEMA.field(name), pa.array(values, type=SCHEMA.field(name).type)
+            )
+        return table
+
+    def _run(self):
+        pending, n_pending = [], 0
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                stopping = True
+            elif item:
+                try:
+                    pending.append(self._to_table(item))
+                    n_pending += pending[-1].num_rows
+                except (pa.ArrowException, KeyError, TypeError, ValueError):
+                    logger.exception("Lote inválido descartado do log de predições")
+                    self.dropped.labels("invalid").inc(len(item[2]))
+
+            due = time.monotonic() - last_flush >= self.flush_interval
+            if pending and (n_pending >= self.batch_rows or due or stopping):
+                self._write(pa.concat_tables(pending))
+                pending, n_pending = [], 0
+            if due or stopping:
+                last_flush = time.monotonic()
+                if self._writer is not None and (
+                    stopping
+                    or time.monotonic() - self._segment_opened >= self.segment_seconds
+                ):
+                    self._close_segment()
+
+    def _write(self, table):
+        try:
+            if self._writer is None:
+                self._open_segment()
+            self._writer.write_table(table)
+            self._segment_rows += table.num_rows
+            self.logged.inc(table.num_rows)
+            if self._segment_rows >= self.segment_rows:
+                self._close_segment()
+        except OSError:
+            logger.exception("Falha ao gravar o log de predições")
+            self.dropped.labels("write_error").inc(table.num_rows)
+
+    def _open_segment(self):
+        # O pid separa os segmentos dos workers que gravam no mesmo diretório
+        self._sequence += 1
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{self._sequence:06d}"
+        self._segment = os.path.join(self.directory, f"{name}.parquet")
+        self._writer = pq.ParquetWriter(f"{self._segment}.tmp", SCHEMA)
+        self._segment_rows = 0
+        self._segment_opened = time.monotonic()
+
+    def _close_segment(self):
+        self._writer.close()
+        os.replace(f"{self._segment}.tmp", self._segment)
+        self._writer = None
+        self.segments.inc()
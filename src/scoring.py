@@ -0,0 +1,337 @@
+import math
+import threading
+import numpy as np
+import pandas as pd
+from features import (
+    DOC_ENTREGUE,
+    PAIS_OUTROS,
+    PAISES,
+    contribution_fields,
+    ensure_category_grouper,
+    pipeline_feature_names,
+)
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class CompiledScorer:
+    """
+    Versão compilada de um pipeline treinado.
+
+    Guarda o vocabulário de categorias já combinado com o target encoding, as
+    medianas do imputer, os mapeamentos de país e documentos e o layout do
+    one-hot como dicionários e arrays simples, e escreve cada requisição direto
+    em uma matriz NumPy pré-alocada que vai para o booster. As probabilidades
+    são idênticas às de `pipeline.predict_proba`.
+
+    `num_threads` limita as threads do LightGBM na predição (0 usa o padrão
+    do OpenMP).
+    """
+
+    def __init__(
+        self,
+        booster,
+        feature_names,
+        target_encodings,
+        global_mean,
+        medians,
+        onehot,
+        handle_unknown="error",
+        dtype=np.float64,
+        num_threads=0,
+    ):
+        self.booster = booster
+        self.feature_names = list(feature_names)
+        self.target_encodings = target_encodings
+        self.global_mean = float(global_mean)
+        self.medians = medians
+        self.onehot = onehot
+        self.handle_unknown = handle_unknown
+        self.dtype = np.dtype(dtype)
+        self.num_threads = num_threads
+        self._local = threading.local()
+        self._compile()
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """
+        Compila um pipeline treinado por `get_pipeline()`.
+        """
+        steps = ensure_category_grouper(pipeline).named_steps
+        grouper = steps["category_grouper"]
+        kfold = steps["kfold_encoder"]
+        encoder = steps["encoder"]
+        model = pipeline[-1]
+
+        onehot = {
+            col: categories.tolist()
+            for col, categories in zip(encoder.cols, encoder.encoder.categories_)
+        }
+        # Cada coluna codificada vira um lookup categoria -> valor com um valor
+        # padrão; na coluna agrupada, o vocabulário já entra no lookup
+        global_mean = float(kfold.global_mean_)
+        target_encodings = {}
+        for col, encoding_map in kfold.encoding_maps_.items():
+            if col == grouper.colname:
+                # Ordenado: o vocabulário é um frozenset, e a especificação
+                # (e com ela a versão do artefato) deve sair igual a cada export
+                lookup = {
+                    categoria: float(encoding_map.get(categoria, global_mean))
+                    for categoria in sorted(grouper.vocabulary_)
+                }
+                default = float(encoding_map.get(grouper.other, global_mean))
+            else:
+                lookup = {k: float(v) for k, v in encoding_map.items()}
+                default = global_mean
+            target_encodings[col] = {"lookup": lookup, "default": default}
+
+        medians = {
+            col: float(imputer.statistics_[0])
+            for col, imputer in steps["imputer"].imputers.items()
+        }
+
+        return cls(
+            booster=model.booster_,
+            feature_names=pipeline_feature_names(pipeline),
+            target_encodings=target_encodings,
+            global_mean=global_mean,
+            medians=medians,
+            onehot=onehot,
+            handle_unknown=encoder.encoder.handle_unknown,
+            dtype=encoder.dtype_,
+        )
+
+    def to_spec(self):
+        """
+        Especificação do pré-processamento em tipos JSON, sem o booster.
+        """
+        return {
+            "feature_names": self.feature_names,
+            "target_encodings": self.target_encodings,
+            "global_mean": self.global_mean,
+            "medians": self.medians,
+            "onehot": self.onehot,
+            "handle_unknown": self.handle_unknown,
+            "dtype": self.dtype.name,
+        }
+
+    @classmethod
+    def from_spec(cls, spec, booster, num_threads=0):
+        """
+        Reconstrói o scorer a partir de `to_spec()` e de um booster carregado.
+        """
+        return cls(booster=booster, num_threads=num_threads, **spec)
+
+    def input_schema(self):
+        """
+        Campos lidos de cada registro e os seus tipos.
+        """
+        schema = {name: "number" for _, name, _ in self._numeric_slots}
+        schema.update({col: "string" for _, col, _, _ in self._target_slots})
+        schema.update(
+            {
+                "score_1": "integer",
+                "pais": "string",
+                "entrega_doc_1": "integer",
+                "entrega_doc_2": "string",
+                "entrega_doc_3": "string",
+            }
+        )
+        return schema
+
+    def _compile(self):
+        """
+        Resolve, para cada coluna do booster, de onde vem o seu valor.
+        """
+        index = {name: j for j, name in enumerate(self.feature_names)}
+        self._onehot_slots = {}
+        resolved = set()
+        for col, categories in self.onehot.items():
+            slots = {}
+            for category in categories:
+                name = f"{col}_{category}"
+                if name not in index:
+                    raise ValueError(f"Coluna one-hot ausente no modelo: {name}")
+                slots[category] = index[name]
+                resolved.add(name)
+            self._onehot_slots[col] = slots
+
+        self._target_slots = []
+        for col, encoding in self.target_encodings.items():
+            name = f"{col}_Kfold_Target_Enc"
+            self._target_slots.append(
+                (index[name], col, encoding["lookup"], encoding["default"])
+            )
+            resolved.add(name)
+
+        # Demais colunas numéricas passam direto, com imputação pela mediana
+        self._numeric_slots = [
+            (index[name], name, self.medians.get(name, np.nan))
+            for name in self.feature_names
+            if name not in resolved
+        ]
+        self.fields, self._field_matrix = contribution_fields(
+            self.feature_names, self.onehot
+        )
+
+    def _derive(self, record):
+        """
+        Aplica os mapeamentos do DataProcessor às colunas do one-hot.
+        """
+        doc_2 = record.get("entrega_doc_2")
+        pais = record.get("pais")
+        return {
+            "score_1": record.get("score_1"),
+            "pais": pais if pais in PAISES else PAIS_OUTROS,
+            "entrega_doc_1": record.get("entrega_doc_1"),
+            "entrega_doc_2": int(doc_2 == DOC_ENTREGUE),
+            "entrega_doc_3": int(record.get("entrega_doc_3") == DOC_ENTREGUE),
+            "is_missing": int(_is_missing(doc_2)),
+        }
+
+    def _buffer(self, n_rows):
+        """
+        Retorna a matriz pré-alocada da thread atual, crescendo se necessário.
+        """
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape[0] < n_rows:
+            buffer = np.empty(
+                (max(n_rows, 64), len(self.feature_names)), dtype=self.dtype
+            )
+            self._local.buffer = buffer
+        return buffer[:n_rows]
+
+    def transform(self, records, out=None):
+        """
+        Escreve os registros na matriz de features do booster.
+
+        Sem `out`, a matriz retornada é reutilizada pela próxima chamada na
+        mesma thread.
+        """
+        X = self._buffer(len(records)) if out is None else out
+        X.fill(0.0)
+
+        for i, record in enumerate(records):
+            row = X[i]
+            for j, name, fill in self._numeric_slots:
+                value = record.get(name)
+                row[j] = fill if _is_missing(value) else value
+
+            for j, col, lookup, default in self._target_slots:
+                categoria = record.get(col)
+                row[j] = (
+                    self.global_mean
+                    if _is_missing(categoria)
+                    else lookup.get(categoria, default)
+                )
+
+            for col, value in self._derive(record).items():
+                slots = self._onehot_slots.get(col)
+                if slots is None:
+                    continue
+                j = slots.get(value)
+                if j is not None:
+                    row[j] = 1.0
+                elif self.handle_unknown == "error":
+                    raise ValueError(
+                        f"Categoria desconhecida {value!r} na coluna {col!r}"
+                    )
+        return X
+
+    def predict_proba(self, records):
+        """
+        Retorna a probabilidade de fraude de cada registro.
+        """
+        if len(records) == 0:
+            return np.empty(0, dtype=np.float64)
+        return self.predict_features(self.transform(records))
+
+    def predict_features(self, X):
+        """
+        Probabilidades a partir da matriz de features já montada.
+        """
+        if self.num_threads:
+            return self.booster.predict(X, num_threads=self.num_threads)
+        return self.booster.predict(X)
+
+    def explain_features(self, X):
+        """
+        Contribuição de cada campo de entrada (em log-odds, na ordem de
+        `fields`) e valor base, pelo `pred_contrib` do booster sobre a matriz
+        de features já montada.
+        """
+        if len(X) == 0:
+            return np.empty((0, len(self.fields))), np.empty(0)
+        if self.num_threads:
+            contrib = self.booster.predict(
+                X, pred_contrib=True, num_threads=self.num_threads
+            )
+        else:
+            contrib = self.booster.predict(X, pred_contrib=True)
+        return contrib[:, :-1] @ self._field_matrix, contrib[:, -1]
+
+    def _derive_columns(self, columns, n_rows):
+        """
+        Versão vetorizada de `_derive`, coluna a coluna.
+        """
+        missing = np.full(n_rows, None, dtype=object)
+        pais = np.asarray(columns.get("pais", missing), dtype=object)
+        doc_2 = np.asarray(columns.get("entrega_doc_2", missing), dtype=object)
+        doc_3 = np.asarray(columns.get("entrega_doc_3", missing), dtype=object)
+        return {
+            "score_1": np.asarray(columns.get("score_1", missing)),
+            "pais": np.where(np.isin(pais, PAISES), pais, PAIS_OUTROS),
+            "entrega_doc_1": np.asarray(columns.get("entrega_doc_1", missing)),
+            "entrega_doc_2": (doc_2 == DOC_ENTREGUE).astype(np.int64),
+            "entrega_doc_3": (doc_3 == DOC_ENTREGUE).astype(np.int64),
+            "is_missing": pd.isna(doc_2).astype(np.int64),
+        }
+
+    def transform_columns(self, columns, n_rows, out=None):
+        """
+        Escreve dados em formato colunar (um array por campo) na matriz de
+        features, com o mesmo resultado de `transform`.
+        """
+        X = self._buffer(n_rows) if out is None else out
+        X.fill(0.0)
+
+        for j, name, fill in self._numeric_slots:
+            if name not in columns:
+                X[:, j] = fill
+                continue
+            values = np.asarray(columns[name], dtype=np.float64)
+            X[:, j] = np.where(np.isnan(values), fill, values)
+
+        for j, col, lookup, default in self._target_slots:
+            X[:, j] = np.fromiter(
+                (
+                    self.global_mean if _is_missing(c) else lookup.get(c, default)
+                    for c in columns.get(col, [None] * n_rows)
+                ),
+                dtype=np.float64,
+                count=n_rows,
+            )
+
+        for col, values in self._derive_columns(columns, n_rows).items():
+            slots = self._onehot_slots.get(col)
+            if slots is None:
+                continue
+            matched = np.zeros(n_rows, dtype=bool)
+            for category, j in slots.items():
+                hit = values == category
+                X[:, j] = hit
+                matched |= hit
+            if self.handle_unknown == "error" and not matched.all():
+                value = values[np.argmin(matched)]
+                raise ValueError(f"Categoria desconhecida {value!r} na coluna {col!r}")
+        return X
+
+    def predict_proba_columns(self, columns, n_rows):
+        """
+        Probabilidades de fraude para dados em formato colunar.
+        """
+        if n_rows == 0:
+            return np.empty(0, dtype=np.float64)
+        return self.predict_features(self.transform_columns(columns, n_rows))
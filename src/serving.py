@@ -0,0 +1,49 @@
+import os
+
+# Variáveis que limitam os pools de threads de OpenMP e das bibliotecas BLAS
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+
+def available_cpus():
+    """
+    Número de CPUs que este processo pode usar.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def thread_budget(n_cpus, workers=None, threads=None):
+    """
+    Divide as CPUs entre processos da API e threads do LightGBM por processo.
+
+    Sem nenhum dos dois, usa um processo por CPU com uma thread cada; com só
+    um deles, o outro completa `workers * threads <= n_cpus`.
+    """
+    if (workers is not None and workers < 1) or (threads is not None and threads < 1):
+        raise ValueError("workers e threads devem ser positivos")
+    if workers is None and threads is None:
+        threads = 1
+    if workers is None:
+        workers = max(1, n_cpus // threads)
+    if threads is None:
+        threads = max(1, n_cpus // workers)
+    return workers, threads
+
+
+def pin_threads(threads, environ=os.environ):
+    """
+    Fixa o tamanho dos pools de threads nativos.
+
+    Precisa rodar antes da importação de NumPy e LightGBM, que leem essas
+    variáveis ao carregar.
+    """
+    for name in THREAD_ENV_VARS:
+        environ[name] = str(threads)
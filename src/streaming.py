@@ -0,0 +1,104 @@
+import asyncio
+import orjson
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+# Tamanho máximo de uma linha, para um corpo sem quebras não crescer sem limite
+MAX_LINE_BYTES = 1 << 20
+
+
+async def iter_ndjson(byte_stream):
+    """
+    Decodifica um fluxo de bytes NDJSON, um objeto por linha.
+
+    Gera pares (número da linha, objeto); linhas em branco são ignoradas.
+    """
+    pending = b""
+    line_number = 0
+    async for data in byte_stream:
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, _loads(line, line_number)
+        if len(pending) > MAX_LINE_BYTES:
+            raise ValueError(
+                f"Linha {line_number + 1} maior que {MAX_LINE_BYTES} bytes"
+            )
+    if pending.strip():
+        yield line_number + 1, _loads(pending, line_number + 1)
+
+
+def _loads(line, line_number):
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"JSON inválido na linha {line_number}: {e}") from e
+
+
+def error_line(message):
+    return orjson.dumps({"error": message}) + b"\n"
+
+
+async def score_ndjson(byte_stream, score_chunk, chunk_size=1000, max_pending=2):
+    """
+    Pontua um fluxo NDJSON em blocos de `chunk_size` registros.
+
+    A leitura corre em paralelo ao scoring, mas para quando `max_pending`
+    blocos aguardam na fila; assim a memória fica limitada a poucos blocos e
+    a pressão volta para quem envia. `score_chunk` recebe uma lista de
+    registros e devolve as linhas NDJSON de resposta. Um erro encerra o fluxo
+    com uma linha `{"error": ...}`.
+    """
+    queue = asyncio.Queue(maxsize=max_pending)
+
+    async def read():
+        try:
+            chunk, first_line = [], None
+            async for line_number, record in iter_ndjson(byte_stream):
+                chunk.append(record)
+                first_line = first_line or line_number
+                if len(chunk) == chunk_size:
+                    await queue.put((first_line, chunk))
+                    chunk, first_line = [], None
+            if chunk:
+                await queue.put((first_line, chunk))
+            await queue.put(None)
+        except Exception as e:  # pylint: disable=broad-except
+            await queue.put(e)
+
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                yield error_line(str(item))
+                return
+            first_line, chunk = item
+            try:
+                yield await run_in_threadpool(score_chunk, chunk)
+            except Exception as e:  # pylint: disable=broad-except
+                last_line = first_line + len(chunk) - 1
+                yield error_line(f"Linhas {first_line} a {last_line}: {e}")
+                return
+    finally:
+        reader.cancel()
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que pode ser enviada enquanto o corpo da requisição
+    ainda está sendo lido.
+
+    A StreamingResponse padrão consome as mensagens de `receive` para detectar
+    desconexões, o que compete com a leitura do corpo; aqui a desconexão chega
+    pela própria leitura da requisição.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
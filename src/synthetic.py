@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+SCORE_COLS = [f"score_{i}" for i in range(2, 11)]
+
+
+def _categorias(rng, n_rows, n_categorias, skew):
+    """
+    Sorteia categorias de produto; com `skew` > 0, a frequência segue uma lei
+    de Zipf (poucas categorias muito comuns e uma cauda longa de raras).
+    """
+    names = np.array([f"cat_{c:07x}" for c in range(n_categorias)], dtype=object)
+    if skew <= 0:
+        return names[rng.integers(0, n_categorias, n_rows)]
+    weights = 1 / np.arange(1, n_categorias + 1) ** skew
+    return names[rng.choice(n_categorias, n_rows, p=weights / weights.sum())]
+
+
+def make_transactions(
+    n_rows, seed=42, n_categorias=50, with_target=True, categoria_skew=0.0
+):
+    """
+    Gera transações sintéticas no mesmo schema dos dados brutos.
+
+    Para benchmarks realistas, use muitas categorias com `categoria_skew`
+    (por exemplo, 10 mil categorias e skew 1.1).
+    """
+    rng = np.random.default_rng(seed)
+
+    df = pd.DataFrame(
+        {
+            "score_1": rng.integers(1, 5, n_rows),
+            "score_2": rng.random(n_rows).round(4),
+            "score_3": rng.exponential(40000, n_rows).round(2),
+            "score_4": rng.integers(0, 50, n_rows).astype(float),
+            "score_5": rng.random(n_rows),
+            "score_6": rng.integers(0, 40, n_rows).astype(float),
+            "pais": rng.choice(
+                ["BR", "AR", "US", "MX"], n_rows, p=[0.8, 0.12, 0.05, 0.03]
+            ),
+            "score_7": rng.integers(0, 20, n_rows),
+            "categoria_produto": _categorias(rng, n_rows, n_categorias, categoria_skew),
+            "score_8": rng.random(n_rows),
+            "score_9": rng.integers(0, 5000, n_rows).astype(float),
+            "score_10": rng.integers(0, 400, n_rows).astype(float),
+            "entrega_doc_1": rng.integers(0, 2, n_rows),
+            "entrega_doc_2": rng.choice(
+                np.array(["Y", "N", None], dtype=object), n_rows
+            ),
+            "entrega_doc_3": rng.choice(["Y", "N"], n_rows),
+            "valor_compra": rng.lognormal(3.5, 1.2, n_rows).round(2),
+        }
+    )
+
+    # Alguns scores ausentes, como nos dados reais
+    for col in SCORE_COLS:
+        df.loc[rng.random(n_rows) < 0.02, col] = np.nan
+
+    if with_target:
+        df["data_compra"] = pd.Timestamp("2024-01-01") + pd.to_timedelta(
+            rng.integers(0, 90 * 24 * 3600, n_rows), unit="s"
+        )
+        produtos = np.array([f"produto_{p}" for p in range(1000)], dtype=object)
+        df["produto"] = produtos[rng.integers(0, 1000, n_rows)]
+        df["score_fraude_modelo"] = rng.integers(0, 100, n_rows)
+        logit = -3 + 1.5 * (df["entrega_doc_3"] == "N") + 2 * df["score_5"]
+        df["fraude"] = (rng.random(n_rows) < 1 / (1 + np.exp(-logit))).astype(int)
+
+    return df
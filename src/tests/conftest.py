@@ -0,0 +1,55 @@
+import importlib.util
+import os
+import pytest
+from artifact import save_artifact
+from models.train import get_pipeline
+from synthetic import make_transactions
+
+APP_MAIN = os.path.join(os.path.dirname(__file__), "..", "..", "app", "main.py")
+ADMIN_TOKEN = "token-de-teste"
+
+
+@pytest.fixture(scope="session")
+def fitted_pipeline():
+    df = make_transactions(2000)
+    pipeline = get_pipeline()
+    pipeline.set_params(category_grouper__min_threshold=45, model__verbose=-1)
+    pipeline.fit(df.drop(columns=["fraude"]), df["fraude"])
+    return pipeline
+
+
+@pytest.fixture(scope="session")
+def api_artifact(fitted_pipeline, tmp_path_factory):
+    artifact_dir = tmp_path_factory.mktemp("api") / "artifact"
+    save_artifact(fitted_pipeline, artifact_dir, threshold=0.5)
+    return artifact_dir
+
+
+@pytest.fixture(scope="session")
+def api(api_artifact):
+    """
+    O módulo app/main.py carregado com o artefato de teste, sem log de
+    predições nem cache e com token de administração. É importado uma única
+    vez, pois as métricas da API ficam no registro global.
+    """
+    env = {
+        "MODEL_ARTIFACT_PATH": str(api_artifact),
+        "PREDICTION_LOG_DIR": "",
+        "PREDICTION_CACHE_SIZE": "0",
+        "ADMIN_TOKEN": ADMIN_TOKEN,
+    }
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        spec = importlib.util.spec_from_file_location("app_main", APP_MAIN)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def client(api):
+    from fastapi.testclient import TestClient  # pylint: disable=import-outside-toplevel
+
+    with TestClient(api.app) as test_client:
+        yield test_client
@@ -0,0 +1,187 @@
+import numpy as np
+import orjson
+import pytest
+from artifact import save_artifact
+from synthetic import SCORE_COLS, make_transactions
+from tests.conftest import ADMIN_TOKEN
+
+
+def api_records(n_rows, seed=0):
+    df = make_transactions(n_rows, seed=seed, with_target=False)
+    df[SCORE_COLS] = df[SCORE_COLS].fillna(0)  # O schema da API não aceita nulos
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def test_admin_endpoints_require_token(client):
+    for method, path in [
+        ("get", "/admin/model"),
+        ("post", "/admin/reload"),
+        ("post", "/admin/rollback"),
+    ]:
+        assert getattr(client, method)(path).status_code == 403
+        response = getattr(client, method)(path, headers={"X-Admin-Token": "errado"})
+        assert response.status_code == 403
+
+
+def test_admin_reload_and_rollback(client, fitted_pipeline, api_artifact):
+    headers = {"X-Admin-Token": ADMIN_TOKEN}
+    records = api_records(20)
+    original = client.get("/admin/model", headers=headers).json()["current"]
+
+    save_artifact(fitted_pipeline, api_artifact, threshold=0.2)
+    reloaded = client.post("/admin/reload", headers=headers)
+    assert reloaded.status_code == 200
+    new_version = reloaded.json()["version"]
+    assert new_version != original["version"]
+    predicted = client.post("/predict", json={"data": records}).json()
+    assert predicted["model_version"] == new_version
+
+    rolled_back = client.post("/admin/rollback", headers=headers)
+    assert rolled_back.json()["version"] == original["version"]
+    predicted = client.post("/predict", json={"data": records}).json()
+    assert predicted["model_version"] == original["version"]
+    assert client.post("/admin/rollback", headers=headers).status_code == 409
+
+    proba = np.array([r["probability"] for r in predicted["results"]])
+    assert [r["prediction"] for r in predicted["results"]] == (proba > 0.5).tolist()
+
+
+def test_columnar_matches_predict(client):
+    records = api_records(50, seed=1)
+    rows = client.post("/predict", json={"data": records}).json()
+    columns = {name: [r[name] for r in records] for name in records[0]}
+    response = client.post("/predict/columnar", json={"data": columns})
+
+    assert response.status_code == 200
+    columnar = response.json()
+    assert columnar["model_version"] == rows["model_version"]
+    assert columnar["prediction"] == [r["prediction"] for r in rows["results"]]
+    np.testing.assert_allclose(
+        columnar["probability"], [r["probability"] for r in rows["results"]]
+    )
+
+
+@pytest.mark.parametrize(
+    "values",
+    [[[0.1, 0.2], [0.3], [0.4]], [[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]]],
+)
+def test_columnar_rejects_nested_columns(client, values):
+    records = api_records(3)
+    columns = {name: [r[name] for r in records] for name in records[0]}
+    columns["score_2"] = values
+    response = client.post("/predict/columnar", json={"data": columns})
+    assert response.status_code == 422
+    assert "score_2" in response.json()["detail"]
+
+
+def test_columnar_rejects_ragged_columns(client):
+    records = api_records(3)
+    columns = {name: [r[name] for r in records] for name in records[0]}
+    columns["score_1"] = columns["score_1"][:2]
+    response = client.post("/predict/columnar", json={"data": columns})
+    assert response.status_code == 422
+
+
+def ndjson_body(records, chunk_bytes=64):
+    """
+    Corpo NDJSON enviado em pedaços pequenos, que cortam as linhas ao meio.
+    """
+    body = b"".join(orjson.dumps(record) + b"\n" for record in records)
+    for start in range(0, len(body), chunk_bytes):
+        yield body[start : start + chunk_bytes]
+
+
+def test_stream_preserves_line_order(client, api, monkeypatch):
+    monkeypatch.setattr(api, "STREAM_CHUNK_SIZE", 7)
+    records = api_records(30, seed=2)
+    expected = client.post("/predict", json={"data": records}).json()["results"]
+
+    response = client.post(
+        "/predict/stream",
+        content=ndjson_body(records),
+        headers={"content-type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [line["prediction"] for line in lines] == [
+        row["prediction"] for row in expected
+    ]
+    np.testing.assert_allclose(
+        [line["probability"] for line in lines],
+        [row["probability"] for row in expected],
+    )
+
+
+def test_stream_reports_invalid_line(client, api, monkeypatch):
+    monkeypatch.setattr(api, "STREAM_CHUNK_SIZE", 2)
+    lines = [orjson.dumps(record) for record in api_records(5)]
+    lines.insert(4, b'{"merchant_id": ')
+    body = b"\n".join(lines) + b"\n"
+
+    response = client.post("/predict/stream", content=body)
+
+    results = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [set(result) for result in results[:4]] == [
+        {"prediction", "probability", "model_version"}
+    ] * 4
+    assert len(results) == 5
+    assert "linha 5" in results[-1]["error"]
+
+
+def test_stream_reports_invalid_chunk(client, api, monkeypatch):
+    monkeypatch.setattr(api, "STREAM_CHUNK_SIZE", 2)
+    records = api_records(6)
+    records[3]["score_1"] = "alto"
+    body = b"".join(orjson.dumps(record) + b"\n" for record in records)
+
+    response = client.post("/predict/stream", content=body)
+
+    results = [orjson.loads(line) for line in response.text.splitlines()]
+    assert len(results) == 3
+    assert all("error" not in result for result in results[:2])
+    assert results[-1]["error"].startswith("Linhas 3 a 4:")
+    assert "score_1" in results[-1]["error"]
+
+
+def explain(client, records, **params):
+    response = client.post("/explain", json={"data": records}, params=params)
+    assert response.status_code == 200
+    return response.json()["results"]
+
+
+def test_explain_top(client):
+    records = api_records(20, seed=3)
+    full = explain(client, records)
+    n_fields = len(full[0]["explanation"]["contributions"])
+
+    for row in full:
+        explanation = row["explanation"]
+        logit = explanation["base_value"] + sum(explanation["contributions"].values())
+        assert 1 / (1 + np.exp(-logit)) == pytest.approx(row["probability"])
+
+    top = explain(client, records, top=3)
+    for row, short in zip(full, top):
+        contributions = short["explanation"]["contributions"]
+        assert list(contributions) == list(row["explanation"]["contributions"])[:3]
+        magnitudes = [abs(value) for value in contributions.values()]
+        assert magnitudes == sorted(magnitudes, reverse=True)
+
+    assert explain(client, records, top=n_fields + 5) == full
+
+
+def test_explain_declined_only(client):
+    results = explain(client, api_records(200, seed=4), declined_only="true")
+    declined = [row for row in results if row["prediction"] == 1]
+    approved = [row for row in results if row["prediction"] == 0]
+
+    assert declined and approved
+    assert all(row["explanation"] is not None for row in declined)
+    assert all(row["explanation"] is None for row in approved)
+
+
+def test_explain_rejects_negative_top(client):
+    response = client.post(
+        "/explain", json={"data": api_records(2)}, params={"top": -1}
+    )
+    assert response.status_code == 422
@@ -0,0 +1,63 @@
+import json
+import os
+import numpy as np
+import pytest
+from artifact import MANIFEST_FILE, SPEC_FILE, load_artifact, save_artifact
+from model_manager import model_version
+from synthetic import make_transactions
+
+
+def to_records(df):
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def test_artifact_roundtrip_matches_pipeline(fitted_pipeline, tmp_path):
+    artifact_dir = os.path.join(tmp_path, "artifact")
+    manifest = save_artifact(fitted_pipeline, artifact_dir)
+    save_artifact(fitted_pipeline, artifact_dir)  # Sobrescreve sem erro
+
+    scorer = load_artifact(artifact_dir)
+    data = make_transactions(200, seed=3, with_target=False)
+
+    expected = fitted_pipeline.predict_proba(data)[:, 1]
+    assert np.array_equal(scorer.predict_proba(to_records(data)), expected)
+    assert manifest["schema"]["features"] == scorer.feature_names
+    assert "categoria_produto" in manifest["schema"]["input"]
+
+
+def test_artifact_rejects_corruption_and_unknown_version(fitted_pipeline, tmp_path):
+    artifact_dir = os.path.join(tmp_path, "artifact")
+    save_artifact(fitted_pipeline, artifact_dir)
+
+    with open(os.path.join(artifact_dir, SPEC_FILE), "a", encoding="utf-8") as f:
+        f.write(" ")
+    with pytest.raises(ValueError, match="Checksum"):
+        load_artifact(artifact_dir)
+
+    manifest_path = os.path.join(artifact_dir, MANIFEST_FILE)
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["format_version"] = 99
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    with pytest.raises(ValueError, match="Versão"):
+        load_artifact(artifact_dir)
+
+
+def test_artifact_version_is_reproducible(fitted_pipeline, tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    save_artifact(fitted_pipeline, first, threshold=0.4)
+    save_artifact(fitted_pipeline, second, threshold=0.4)
+
+    # Mesmo modelo exportado em outro momento
+    with open(second / MANIFEST_FILE, encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["created_at"] = "2000-01-01T00:00:00+0000"
+    with open(second / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    assert (first / SPEC_FILE).read_bytes() == (second / SPEC_FILE).read_bytes()
+    assert model_version(first) == model_version(second)
+    with open(first / SPEC_FILE, encoding="utf-8") as f:
+        lookup = json.load(f)["target_encodings"]["categoria_produto"]["lookup"]
+    assert list(lookup) == sorted(lookup)
@@ -0,0 +1,53 @@
+import asyncio
+import numpy as np
+from batching import MicroBatcher
+
+
+def score_fn_factory(calls):
+    def score_fn(records):
+        calls.append(len(records))
+        if any(r.get("invalido") for r in records):
+            raise ValueError("registro inválido")
+        return np.array([r["valor"] for r in records], dtype=float)
+
+    return score_fn
+
+
+def test_micro_batcher_coalesces_requests():
+    calls = []
+    batcher = MicroBatcher(score_fn_factory(calls), max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        requests = [[{"valor": i}, {"valor": i + 0.5}] for i in range(10)]
+        return await asyncio.gather(*[batcher.submit(r) for r in requests])
+
+    results = asyncio.run(run())
+
+    for i, proba in enumerate(results):
+        assert list(proba) == [i, i + 0.5]
+    assert calls == [8, 8, 4]
+    assert batcher.batch_size.count == 3
+    assert batcher.queue_wait.count == 10
+
+
+def test_micro_batcher_isolates_failures():
+    calls = []
+    batcher = MicroBatcher(score_fn_factory(calls), max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.submit([{"valor": 1}]),
+            batcher.submit([{"invalido": True}]),
+            return_exceptions=True,
+        )
+
+    ok, erro = asyncio.run(run())
+
+    assert list(ok) == [1]
+    assert isinstance(erro, ValueError)
+
+
+def test_micro_batcher_empty_request():
+    batcher = MicroBatcher(score_fn_factory([]))
+
+    assert len(asyncio.run(batcher.submit([]))) == 0
@@ -0,0 +1,56 @@
+import orjson
+import pytest
+from columnar import FIELDS, decode_columnar, encode_columnar
+from synthetic import SCORE_COLS, make_transactions
+
+
+def columnar_body(n_rows, **overrides):
+    df = make_transactions(n_rows, with_target=False)
+    df[SCORE_COLS] = df[SCORE_COLS].fillna(0)
+    data = {name: df[name].tolist() for name in FIELDS}
+    data.update(overrides)
+    return orjson.dumps({"data": data})
+
+
+def test_decode_columnar():
+    columns, n_rows = decode_columnar(
+        columnar_body(3, score_4=[1, 2, 3], entrega_doc_2=["Y", None, "N"])
+    )
+
+    assert n_rows == 3
+    assert columns["score_1"].dtype.kind == "i"
+    assert columns["score_4"].dtype == "float64"
+    assert list(columns["entrega_doc_2"]) == ["Y", None, "N"]
+
+
+@pytest.mark.parametrize(
+    "overrides, message",
+    [
+        ({"score_2": [0.1, None, 0.3]}, "score_2"),
+        ({"score_1": [1, 2.5, 3]}, "inteiros"),
+        ({"pais": ["BR", 1, "AR"]}, "pais"),
+        ({"pais": ["BR", None, "AR"]}, "pais"),
+        ({"valor_compra": [1.0]}, "mesmo tamanho"),
+        ({"score_2": [[0.1, 0.2], [0.3], [0.4]]}, "score_2"),
+        ({"score_2": [[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]]}, "score_2"),
+    ],
+)
+def test_decode_columnar_rejects_invalid(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        decode_columnar(columnar_body(3, **overrides))
+
+
+def test_decode_columnar_rejects_bad_payload():
+    with pytest.raises(ValueError, match="JSON"):
+        decode_columnar(b"{")
+    with pytest.raises(ValueError, match="ausentes"):
+        decode_columnar(orjson.dumps({"data": {"score_1": [1]}}))
+
+
+def test_encode_columnar():
+    columns, n_rows = decode_columnar(columnar_body(2))
+    body = orjson.loads(encode_columnar(columns["score_1"], columns["score_2"], "v1"))
+
+    assert body["prediction"] == columns["score_1"].tolist()
+    assert body["model_version"] == "v1"
+    assert n_rows == 2
@@ -0,0 +1,66 @@
+import json
+import os
+import pandas as pd
+import pandas.testing as pdt
+from dataset import (
+    cache_raw_data,
+    data_columns,
+    file_fingerprint,
+    iter_data_chunks,
+    read_data,
+    read_manifest,
+    write_data,
+)
+from synthetic import make_transactions
+
+
+def test_arrow_roundtrip_and_projection(tmp_path):
+    df = make_transactions(500)
+    path = os.path.join(tmp_path, "dados.arrow")
+    write_data(df, path)
+
+    pdt.assert_frame_equal(read_data(path), df, check_dtype=False)
+    assert data_columns(path) == list(df.columns)
+
+    subset = read_data(path, columns=["pais", "fraude"])
+    assert list(subset.columns) == ["pais", "fraude"]
+    assert pd.api.types.is_datetime64_any_dtype(read_data(path)["data_compra"])
+
+
+def test_iter_data_chunks(tmp_path):
+    df = make_transactions(1050)
+    for ext in ["arrow", "csv"]:
+        path = os.path.join(tmp_path, f"dados.{ext}")
+        write_data(df, path)
+
+        chunks = list(iter_data_chunks(path, chunksize=400, columns=["score_1"]))
+        assert [len(c) for c in chunks] == [400, 400, 250]
+        assert list(chunks[0].columns) == ["score_1"]
+
+
+def test_cache_raw_data_invalidation(tmp_path, monkeypatch):
+    # O Excel é substituído por CSV para não depender do openpyxl
+    monkeypatch.setattr(pd, "read_excel", pd.read_csv)
+    source = os.path.join(tmp_path, "dados.csv")
+    cache = os.path.join(tmp_path, "cache", "dados.arrow")
+    manifest_path = os.path.join(tmp_path, "cache", "manifest.json")
+    make_transactions(100).to_csv(source, index=False)
+
+    manifest = cache_raw_data(source, cache, manifest_path)
+    assert len(read_data(cache)) == 100
+    assert manifest["raw"]["fingerprint"] == file_fingerprint(source)
+
+    # Sem mudança na origem, o cache não é regravado
+    mtime = os.stat(cache).st_mtime_ns
+    cache_raw_data(source, cache, manifest_path)
+    assert os.stat(cache).st_mtime_ns == mtime
+
+    manifest = read_manifest(manifest_path)
+    manifest["splits"] = {"raw_sha256": manifest["raw"]["fingerprint"]["sha256"]}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    make_transactions(200, seed=7).to_csv(source, index=False)
+    manifest = cache_raw_data(source, cache, manifest_path)
+    assert len(read_data(cache)) == 200
+    assert "splits" not in manifest
@@ -1,5 +1,16 @@
+import numpy as np
 import pandas as pd
-from features import preprocess_categoria_produto, KFoldTargetEncoder, ColumnDropper
+from sklearn.model_selection import KFold
+from sklearn.pipeline import Pipeline
+from features import (
+    preprocess_categoria_produto,
+    KFoldTargetEncoder,
+    ColumnDropper,
+    CategoryGrouper,
+    DataProcessor,
+    OneHotFeatureEncoder,
+    ensure_category_grouper,
+)
 
 
 def test_column_dropper():
@@ -39,6 +50,68 @@ def test_kfold_target_encoder():
     assert result["categoria_produto_Kfold_Target_Enc"].isnull().sum() == 0
 
 
+def test_kfold_target_encoder_multiple_columns():
+
+    data = pd.DataFrame(
+        {
+            "categoria_produto": ["A", "B", "A", "B", "C", None] * 5,
+            "pais": ["BR", "BR", "AR", "US", "BR", "AR"] * 5,
+            "fraude": [0, 1, 0, 1, 0, 1] * 5,
+        }
+    )
+    X, y = data[["categoria_produto", "pais"]], data["fraude"]
+
+    encoder = KFoldTargetEncoder(colnames=["categoria_produto", "pais"], n_fold=3)
+    result = encoder.fit(X, y).transform(X)
+
+    single = KFoldTargetEncoder(colnames="pais", n_fold=3).fit(X, y)
+    parallel = KFoldTargetEncoder(
+        colnames=["categoria_produto", "pais"], n_fold=3, n_jobs=2
+    ).fit(X, y)
+
+    assert set(encoder.encoding_maps_) == {"categoria_produto", "pais"}
+    assert encoder.encoding_maps_["pais"] == single.encoding_map_
+    assert parallel.encoding_maps_ == encoder.encoding_maps_
+    assert result["pais_Kfold_Target_Enc"].isnull().sum() == 0
+    assert result["categoria_produto_Kfold_Target_Enc"].isnull().sum() == 0
+
+
+def test_kfold_target_encoder_partial_fit_recomputes_out_of_fold():
+
+    history = pd.DataFrame(
+        {
+            "pais": ["BR", "AR", "US", "BR", "AR", "BR"] * 5,
+            "fraude": [0, 1, 0, 1, 0, 0] * 5,
+        }
+    )
+    batch = pd.DataFrame({"pais": ["BR", "CL", "BR", "CL"], "fraude": [1, 1, 1, 0]})
+    encoder = KFoldTargetEncoder(colnames="pais", n_fold=3).fit(
+        history[["pais"]], history["fraude"]
+    )
+    before = dict(encoder.encoding_map_)
+
+    encoder.partial_fit(batch[["pais"]].iloc[:0], batch["fraude"].iloc[:0])
+    assert encoder.encoding_map_ == before
+
+    encoder.partial_fit(batch[["pais"]], batch["fraude"])
+
+    # Média fora do fold de cada categoria, com os folds do fit para o
+    # histórico e o rodízio para o lote
+    folds = np.empty(len(history), dtype=int)
+    kf = KFold(n_splits=3, shuffle=True, random_state=42)
+    for fold, (_, val_idx) in enumerate(kf.split(history)):
+        folds[val_idx] = fold
+    data = pd.concat([history, batch], ignore_index=True)
+    data["fold"] = np.concatenate([folds, (len(history) + np.arange(4)) % 3])
+    for category, value in encoder.encoding_map_.items():
+        chosen = encoder.encoding_folds_["pais"][category]
+        outside = data[(data["pais"] == category) & (data["fold"] != chosen)]
+        expected = outside["fraude"].mean() if len(outside) else data["fraude"].mean()
+        assert np.isclose(value, expected), category
+    assert encoder.encoding_map_["AR"] == before["AR"]  # Fora do lote
+    assert np.isclose(encoder.global_mean_, data["fraude"].mean())
+
+
 def test_preprocess_categoria_produto():
 
     data = pd.DataFrame(
@@ -53,3 +126,81 @@ def test_preprocess_categoria_produto():
     assert (
         result["categoria_produto"] == ["A", "Outros", "Outros", "A", "Outros"]
     ).all()
+
+
+def test_category_grouper_uses_fit_vocabulary():
+
+    train = pd.DataFrame({"categoria_produto": ["A", "A", "A", "B", "C"]})
+
+    grouper = CategoryGrouper(min_threshold=2).fit(train)
+
+    # Um lote de uma linha não pode mudar o vocabulário aprendido no treino
+    result = grouper.transform(pd.DataFrame({"categoria_produto": ["A"]}))
+    assert result["categoria_produto"].tolist() == ["A"]
+
+    result = grouper.transform(pd.DataFrame({"categoria_produto": ["B", "Z"]}))
+    assert result["categoria_produto"].tolist() == ["Outros", "Outros"]
+
+
+def test_ensure_category_grouper_recovers_vocabulary():
+
+    data = pd.DataFrame(
+        {
+            "categoria_produto": ["A", "Outros", "A", "Outros"],
+            "fraude": [0, 1, 0, 1],
+        }
+    )
+    encoder = KFoldTargetEncoder(n_fold=2).fit(
+        data[["categoria_produto"]], data["fraude"]
+    )
+    original = Pipeline([("kfold_encoder", encoder)])
+    pipeline = ensure_category_grouper(original)
+
+    grouper = pipeline.named_steps["category_grouper"]
+    assert pipeline.steps[0][0] == "category_grouper"
+    assert grouper.vocabulary_ == {"A"}
+    assert [name for name, _ in original.steps] == ["kfold_encoder"]
+    assert pipeline.named_steps["kfold_encoder"] is encoder
+
+
+def test_data_processor():
+
+    df = pd.DataFrame(
+        {
+            "entrega_doc_2": ["Y", None, "N"],
+            "entrega_doc_3": ["N", "Y", None],
+            "pais": ["BR", "US", None],
+        }
+    )
+
+    result = DataProcessor().transform(df)
+
+    assert result["entrega_doc_2"].tolist() == [1, 0, 0]
+    assert result["is_missing"].tolist() == [0, 1, 0]
+    assert result["entrega_doc_3"].tolist() == [0, 1, 0]
+    assert result["pais"].tolist() == ["BR", "Outros", "Outros"]
+
+
+def test_onehot_feature_encoder_output_modes():
+
+    df = pd.DataFrame(
+        {
+            "score_1": [1, 2, 3, 4],
+            "pais": ["BR", "AR", "Outros", "BR"],
+            "entrega_doc_1": [0, 1, 1, 0],
+            "entrega_doc_2": [1, 0, 0, 1],
+            "entrega_doc_3": [0, 0, 1, 1],
+            "is_missing": [0, 1, 0, 0],
+            "valor_compra": [10.5, np.nan, 3.0, 7.25],
+        }
+    )
+
+    frame = OneHotFeatureEncoder().fit(df).transform(df)
+    dense_encoder = OneHotFeatureEncoder(output="dense").fit(df)
+    dense = dense_encoder.transform(df)
+    sparse = OneHotFeatureEncoder(output="sparse").fit(df).transform(df)
+
+    assert dense.dtype == np.float32
+    assert list(dense_encoder.get_feature_names_out()) == list(frame.columns)
+    np.testing.assert_array_equal(dense, frame.to_numpy(dtype=np.float32))
+    np.testing.assert_array_equal(sparse.toarray(), dense)
@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+from metrics import Counter, Histogram, MetricsRegistry, RequestMetricsMiddleware
+
+
+def test_histogram_with_labels():
+    registry = MetricsRegistry()
+    histogram = registry.histogram(
+        "etapa_seconds", "Duração.", buckets=(0.1, 1), labelnames=("step",)
+    )
+    histogram.labels("kfold").observe(0.05)
+    histogram.labels("kfold").observe(0.5)
+    with histogram.labels("model").time():
+        pass
+
+    text = registry.render()
+    assert 'etapa_seconds_bucket{step="kfold",le="0.1"} 1' in text
+    assert 'etapa_seconds_bucket{step="kfold",le="+Inf"} 2' in text
+    assert 'etapa_seconds_count{step="model"} 1' in text
+    assert histogram.count == 3
+    with pytest.raises(ValueError):
+        histogram.labels("a", "b")
+
+
+def test_unlabeled_metrics_render_zero():
+    histogram = Histogram("vazio_seconds", "Sem observações.", buckets=(1,))
+    counter = Counter("vazio_total", "Sem incrementos.")
+
+    assert 'vazio_seconds_bucket{le="+Inf"} 0' in histogram.render()
+    assert counter.render().endswith("vazio_total 0")
+
+
+def test_request_metrics_middleware():
+    duration = Histogram("req_seconds", "Duração.", labelnames=("endpoint",))
+    requests = Counter("req_total", "Requisições.", labelnames=("endpoint", "status"))
+
+    class Route:
+        path = "/predict"
+
+    async def app(scope, receive, send):
+        assert "request_start" in scope
+        scope["route"] = Route()
+        await send({"type": "http.response.start", "status": 201})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    middleware = RequestMetricsMiddleware(app, duration, requests)
+    asyncio.run(middleware({"type": "http"}, None, send))
+
+    assert duration.labels("/predict").count == 1
+    assert requests.labels("/predict", "201").value == 1
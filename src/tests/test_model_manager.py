@@ -0,0 +1,126 @@
+import os
+import time
+import numpy as np
+import pytest
+import joblib
+from artifact import save_artifact
+from metrics import Histogram
+from model_manager import LoadedModel, ModelManager, warmup_records
+from models.train import get_pipeline
+from scoring import CompiledScorer
+from synthetic import make_transactions
+
+
+@pytest.fixture(scope="module")
+def other_pipeline():
+    df = make_transactions(1000, seed=11)
+    pipeline = get_pipeline()
+    pipeline.set_params(category_grouper__min_threshold=20, model__verbose=-1)
+    pipeline.fit(df.drop(columns=["fraude"]), df["fraude"])
+    return pipeline
+
+
+def test_reload_swaps_and_rolls_back(fitted_pipeline, other_pipeline, tmp_path):
+    artifact_dir = os.path.join(tmp_path, "artifact")
+    save_artifact(fitted_pipeline, artifact_dir)
+    manager = ModelManager()
+    first = manager.load(artifact_dir)
+    records = warmup_records(10)
+
+    save_artifact(other_pipeline, artifact_dir)
+    second = manager.reload()
+    assert second.version != first.version
+    assert manager.current is second
+
+    scores = manager.current.predict_proba(records)
+    assert scores.version == second.version
+    assert scores[:3].version == second.version and len(scores[:3]) == 3
+
+    assert manager.rollback() is first
+    assert np.array_equal(
+        manager.current.predict_proba(records).proba,
+        fitted_pipeline.predict_proba(make_transactions(10, seed=0, with_target=False))[
+            :, 1
+        ],
+    )
+    with pytest.raises(LookupError):
+        manager.rollback()
+
+
+def test_failed_load_keeps_current_model(fitted_pipeline, tmp_path):
+    artifact_dir = os.path.join(tmp_path, "artifact")
+    save_artifact(fitted_pipeline, artifact_dir)
+    manager = ModelManager()
+    current = manager.load(artifact_dir)
+
+    with pytest.raises(FileNotFoundError):
+        manager.load(os.path.join(tmp_path, "inexistente"))
+    assert manager.current is current
+
+
+def test_watch_loads_new_version(fitted_pipeline, other_pipeline, tmp_path):
+    artifact_dir = os.path.join(tmp_path, "artifact")
+    save_artifact(fitted_pipeline, artifact_dir)
+    manager = ModelManager(loader=LoadedModel.from_path)
+    first = manager.load(artifact_dir)
+
+    manager.watch(artifact_dir, interval=0.05)
+    try:
+        save_artifact(other_pipeline, artifact_dir)
+        deadline = time.time() + 10
+        while manager.current is first and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        manager.stop()
+    assert manager.current is not first
+
+
+def test_loaded_model_times_each_stage(fitted_pipeline, tmp_path):
+    model_path = os.path.join(tmp_path, "model.pkl")
+    joblib.dump(fitted_pipeline, model_path)
+    histogram = Histogram("stage_seconds", "Etapas.", labelnames=("stage",))
+    records = warmup_records(5)
+
+    compiled = LoadedModel.from_path(model_path, stage_histogram=histogram)
+    pandas = LoadedModel.from_path(
+        model_path, compiled=False, stage_histogram=histogram
+    )
+
+    assert np.array_equal(
+        compiled.predict_proba(records).proba, pandas.predict_proba(records).proba
+    )
+    text = histogram.render()
+    for stage in ["features", "booster", "dataframe"] + [
+        name for name, _ in fitted_pipeline.steps
+    ]:
+        assert f'stage_seconds_count{{stage="{stage}"}} 1' in text
+
+
+def test_explain_maps_contributions_to_input_fields(fitted_pipeline):
+    records = warmup_records(50)
+    compiled = LoadedModel(
+        "memória", "v1", scorer=CompiledScorer.from_pipeline(fitted_pipeline)
+    )
+    plain = LoadedModel("memória", "v1", pipeline=fitted_pipeline, threshold=0.3)
+
+    full = compiled.explain(records)
+    assert "pais" in full.fields and "is_missing" not in full.fields
+    assert "categoria_produto" in full.fields
+    np.testing.assert_allclose(
+        1 / (1 + np.exp(-(full.contributions.sum(axis=1) + full.base_value))),
+        compiled.predict_proba(records).proba,
+    )
+
+    declined = plain.explain(records, declined_only=True)
+    assert declined.fields == full.fields
+    assert (
+        declined.rows.tolist() == np.flatnonzero(declined.scores.proba > 0.3).tolist()
+    )
+    np.testing.assert_allclose(
+        declined.contributions, full.contributions[declined.rows], atol=1e-9
+    )
+    top = full.top(2)[0]
+    assert list(top.values()) == sorted(top.values(), key=abs, reverse=True)
+    assert len(top) == 2
+    with pytest.raises(ValueError):
+        full.top(-1)
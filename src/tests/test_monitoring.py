@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from monitoring import MonitoringStore, run_monitoring
+from synthetic import make_transactions
+
+
+def fake_predictions(n_rows, seed, path, labeled=True):
+    df = make_transactions(n_rows, seed=seed)
+    rng = np.random.default_rng(seed)
+    df["predicted_proba"] = np.clip(rng.normal(0.3 + 0.4 * df["fraude"], 0.2), 0, 1)
+    df["predicted_fraude"] = (df["predicted_proba"] > 0.5).astype(int)
+    if labeled:
+        df["true_fraude"] = df["fraude"]
+    else:
+        df = df.drop(columns=["fraude"])
+    df.to_csv(path, index=False)
+    return df
+
+
+def test_monitoring_is_incremental_and_flags_drift(tmp_path):
+    fake_predictions(3000, 0, tmp_path / "reference.csv")
+    inference = fake_predictions(2000, 1, tmp_path / "inference.csv", labeled=False)
+    inference.loc[inference["data_compra"] >= "2024-03-01", "pais"] = "CL"
+    first, second = inference.iloc[:1000], inference.iloc[1000:]
+    first.to_csv(tmp_path / "first.csv", index=False)
+    second.to_csv(tmp_path / "second.csv", index=False)
+
+    def run(paths, output):
+        return run_monitoring(
+            [tmp_path / p for p in paths], tmp_path / "reference.csv", output, 0.5
+        )
+
+    run(["first.csv"], tmp_path / "incremental")
+    run(["first.csv", "second.csv"], tmp_path / "incremental")  # first é ignorado
+    incremental = MonitoringStore(tmp_path / "incremental")
+    full = run(["first.csv", "second.csv"], tmp_path / "full")
+
+    key = ["period", "date", "kind", "column"]
+    pd.testing.assert_frame_equal(
+        incremental.results().sort_values(key).reset_index(drop=True),
+        full.results().sort_values(key).reset_index(drop=True),
+    )
+
+    results = full.results()
+    analysis = results[results["period"] == "analysis"]
+    unseen = analysis[
+        (analysis["kind"] == "unseen_values") & (analysis["column"] == "pais")
+    ]
+    assert unseen["alert"].tolist() == (unseen["date"] >= "2024-03-01").tolist()
+    assert sum(len(s.nulls) > 0 for s in full.days("analysis").values()) == len(
+        analysis["date"].unique()
+    )
+    assert set(analysis["kind"]) == {
+        "estimated_performance",
+        "missing_rate",
+        "unseen_values",
+        "mean",
+    }
+
+
+def test_rewritten_file_replaces_its_previous_rows(tmp_path):
+    fake_predictions(3000, 0, tmp_path / "reference.csv")
+    inference = fake_predictions(2000, 1, tmp_path / "all.csv", labeled=False)
+    path = tmp_path / "inference.csv"
+
+    def run(output):
+        return run_monitoring([path], tmp_path / "reference.csv", output, 0.5)
+
+    late = inference[inference["data_compra"] >= "2024-03-01"]
+    late.to_csv(path, index=False)
+    run(tmp_path / "rewritten")
+    inference.iloc[:1000].to_csv(path, index=False)  # Reescrito no mesmo caminho
+    run(tmp_path / "rewritten")
+    inference.to_csv(path, index=False)
+    rewritten = run(tmp_path / "rewritten")
+    full = run(tmp_path / "full")
+
+    days = rewritten.days("analysis")
+    assert sum(summary.n_rows for summary in days.values()) == 2000
+    assert days.keys() == full.days("analysis").keys()
+    key = ["period", "date", "kind", "column"]
+    pd.testing.assert_frame_equal(
+        rewritten.results().sort_values(key).reset_index(drop=True),
+        full.results().sort_values(key).reset_index(drop=True),
+    )
+
+
+def test_logged_threshold_overrides_default(tmp_path):
+    fake_predictions(3000, 0, tmp_path / "reference.csv")
+    inference = fake_predictions(1000, 1, tmp_path / "inference.csv", labeled=False)
+    inference["threshold"] = np.where(inference["data_compra"] < "2024-03-01", 0.3, 0.7)
+    inference.to_csv(tmp_path / "inference.csv", index=False)
+
+    store = run_monitoring(
+        [tmp_path / "inference.csv"], tmp_path / "reference.csv", tmp_path, 0.5
+    )
+
+    assert {s.threshold for s in store.days("reference").values()} == {0.5}
+    for day, summary in store.days("analysis").items():
+        assert summary.threshold == (0.3 if day < "2024-03-01" else 0.7)
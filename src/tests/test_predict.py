@@ -1,5 +1,21 @@
 import os
-from models.predict import calculate_metrics
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import confusion_matrix, roc_auc_score
+from aggregates import ScoringSummary, aggregates_path
+from artifact import save_artifact
+from config import DECISION_THRESHOLD
+from models.predict import (
+    MetricsAccumulator,
+    calculate_metrics,
+    make_explanations,
+    make_predictions,
+    model_threshold,
+    predict_proba,
+)
+from synthetic import make_transactions
 
 
 def test_calculate_metrics(tmp_path):
@@ -18,3 +34,158 @@ def test_calculate_metrics(tmp_path):
     assert "Accuracy" in content
     assert "F1 Score" in content
     assert "ROC AUC" in content
+
+
+def test_predict_proba_buffered(fitted_pipeline):
+
+    X = make_transactions(500, seed=11).drop(columns=["fraude"])
+
+    expected = predict_proba(fitted_pipeline, X)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        result = predict_proba(fitted_pipeline, X, buffered=True)
+
+    assert np.array_equal(result, expected)
+    assert predict_proba(fitted_pipeline, X.iloc[:0], buffered=True).shape == (0,)
+
+
+def test_metrics_accumulator_matches_full_arrays():
+
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, 1000)
+    y_proba = np.clip(rng.normal(0.4 + 0.2 * y_true, 0.2), 0, 1)
+    y_pred = (y_proba > 0.5).astype(int)
+
+    accumulator = MetricsAccumulator()
+    for start in range(0, 1000, 300):
+        chunk = slice(start, start + 300)
+        accumulator.merge(
+            MetricsAccumulator().update(y_true[chunk], y_pred[chunk], y_proba[chunk])
+        )
+    metrics = accumulator.metrics()
+
+    assert metrics["Accuracy"] == np.mean(y_true == y_pred)
+    assert abs(metrics["ROC AUC"] - roc_auc_score(y_true, y_proba)) < 1e-3
+
+
+def test_make_predictions_streaming(fitted_pipeline, tmp_path):
+
+    model_path = tmp_path / "model.pkl"
+    data_path = tmp_path / "test.csv"
+    joblib.dump(fitted_pipeline, model_path)
+    data = make_transactions(1000, seed=12)
+    data.to_csv(data_path, index=False)
+
+    outputs = []
+    for n_jobs in (1, 2):
+        output_path = tmp_path / f"predictions_{n_jobs}.csv"
+        make_predictions(
+            data_path=data_path,
+            output_path=output_path,
+            metrics_path=tmp_path / f"metrics_{n_jobs}.txt",
+            chunksize=300,
+            n_jobs=n_jobs,
+            model_path=model_path,
+        )
+        outputs.append(pd.read_csv(output_path))
+
+    expected = predict_proba(
+        fitted_pipeline, pd.read_csv(data_path).drop(columns=["fraude"])
+    )
+    assert len(outputs[0]) == 1000
+    np.testing.assert_allclose(outputs[0]["predicted_proba"], expected)
+    pd.testing.assert_frame_equal(outputs[0], outputs[1])
+    assert "ROC AUC" in (tmp_path / "metrics_1.txt").read_text()
+
+
+def test_make_predictions_writes_dashboard_aggregates(fitted_pipeline, tmp_path):
+
+    model_path = tmp_path / "model.pkl"
+    data_path = tmp_path / "test.csv"
+    output_path = tmp_path / "predictions.csv"
+    joblib.dump(fitted_pipeline, model_path)
+    make_transactions(1000, seed=13).to_csv(data_path, index=False)
+
+    make_predictions(
+        data_path=data_path,
+        output_path=output_path,
+        metrics_path=tmp_path / "metrics.txt",
+        threshold=0.5,
+        chunksize=300,
+        model_path=model_path,
+    )
+    summary = ScoringSummary.load(aggregates_path(output_path))
+    df = pd.read_csv(output_path)
+
+    assert summary.n_rows == 1000 and summary.threshold == 0.5
+    assert np.array_equal(
+        summary.confusion, confusion_matrix(df["true_fraude"], df["predicted_fraude"])
+    )
+    assert summary.score_histogram()["count"].sum() == 1000
+    pd.testing.assert_series_equal(
+        summary.means()[["score_2", "valor_compra"]],
+        df[["score_2", "valor_compra"]].mean(),
+    )
+    pd.testing.assert_series_equal(
+        summary.proportions("pais").sort_index(),
+        df["pais"].value_counts(normalize=True).sort_index(),
+        check_names=False,
+    )
+    approved = df["predicted_fraude"] == 0
+    assert np.isclose(
+        summary.fraud_losses,
+        df.loc[approved & (df["true_fraude"] == 1), "valor_compra"].sum(),
+    )
+
+
+def test_threshold_comes_from_the_scored_model(fitted_pipeline, tmp_path):
+
+    model_path = tmp_path / "candidate.pkl"
+    artifact_path = tmp_path / "candidate_artifact"
+    data_path = tmp_path / "test.csv"
+    joblib.dump(fitted_pipeline, model_path)
+    save_artifact(fitted_pipeline, artifact_path, threshold=0.37)
+    make_transactions(200, seed=14).to_csv(data_path, index=False)
+
+    assert model_threshold(model_path) == DECISION_THRESHOLD
+    assert model_threshold(model_path, artifact_path) == 0.37
+
+    output_path = tmp_path / "predictions.csv"
+    make_predictions(
+        data_path=data_path,
+        output_path=output_path,
+        metrics_path=tmp_path / "metrics.txt",
+        model_path=model_path,
+        artifact_path=artifact_path,
+    )
+    df = pd.read_csv(output_path)
+    summary = ScoringSummary.load(aggregates_path(output_path))
+    assert summary.threshold == 0.37
+    assert df["predicted_fraude"].tolist() == (df["predicted_proba"] > 0.37).tolist()
+
+
+def test_make_explanations_only_declined(fitted_pipeline, tmp_path):
+
+    model_path = tmp_path / "model.pkl"
+    data_path = tmp_path / "test.csv"
+    joblib.dump(fitted_pipeline, model_path)
+    make_transactions(1000, seed=12).to_csv(data_path, index=False)
+
+    output_path = tmp_path / "explanations.csv"
+    make_explanations(
+        data_path=data_path,
+        output_path=output_path,
+        threshold=0.5,
+        chunksize=300,
+        model_path=model_path,
+    )
+    explained = pd.read_csv(output_path)
+
+    y_proba = predict_proba(
+        fitted_pipeline, pd.read_csv(data_path).drop(columns=["fraude"])
+    )
+    assert explained["row"].tolist() == np.flatnonzero(y_proba > 0.5).tolist()
+    contributions = explained.filter(like="contrib_")
+    assert "contrib_entrega_doc_2" in contributions
+    logit = contributions.sum(axis=1) + explained["base_value"]
+    np.testing.assert_allclose(1 / (1 + np.exp(-logit)), explained["predicted_proba"])
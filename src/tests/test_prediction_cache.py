@@ -0,0 +1,59 @@
+import numpy as np
+from metrics import MetricsRegistry
+from prediction_cache import PredictionCache, record_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_record_key_is_canonical():
+    a = {"pais": "BR", "score_1": 4, "entrega_doc_2": None}
+    b = {"entrega_doc_2": None, "score_1": 4, "pais": "BR"}
+
+    assert record_key(a, "v1") == record_key(b, "v1")
+    assert record_key(a, "v1") != record_key(a, "v2")
+    assert record_key(a, "v1") != record_key(dict(a, score_1=3), "v1")
+
+
+def test_cache_ttl_lru_and_counters():
+    clock = FakeClock()
+    registry = MetricsRegistry()
+    cache = PredictionCache(max_size=2, ttl_seconds=10, registry=registry, clock=clock)
+    keys = cache.keys([{"id": i} for i in range(3)], "v1")
+
+    assert np.isnan(cache.get_many(keys[:2])).all()
+    cache.put_many(keys[:2], [0.1, 0.2])
+    assert list(cache.get_many(keys[:2])) == [0.1, 0.2]
+
+    # Inserir a terceira chave remove a menos usada
+    cache.get_many(keys[1:2])
+    cache.put_many(keys[2:], [0.3])
+    result = cache.get_many(keys)
+    assert np.isnan(result[0]) and list(result[1:]) == [0.2, 0.3]
+
+    clock.now = 11
+    assert np.isnan(cache.get_many(keys[1:])).all()
+
+    assert cache.hits.value == 5
+    assert cache.misses.value == 5
+    assert cache.evictions.value == 1
+    assert "prediction_cache_hits_total 5" in registry.render()
+
+
+def test_cache_invalidates_on_model_change():
+    cache = PredictionCache()
+    record = [{"id": 1}]
+    cache.get_many(cache.keys(record, "v1"))
+    cache.put_many(cache.keys(record, "v1"), [0.5])
+
+    assert np.isnan(cache.get_many(cache.keys(record, "v2"))).all()
+    assert len(cache) == 0
+
+    # Resultados atrasados da versão antiga não entram mais
+    cache.put_many(cache.keys(record, "v1"), [0.5])
+    assert len(cache) == 0
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import time
+import numpy as np
+from columnar import records_to_columns
+from model_manager import ModelScores
+from prediction_log import PredictionLogger, read_prediction_log, segment_paths
+from synthetic import SCORE_COLS, make_transactions
+
+
+def api_records(n_rows, seed=0):
+    df = make_transactions(n_rows, seed=seed, with_target=False)
+    df[SCORE_COLS] = df[SCORE_COLS].fillna(0)
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def test_logger_writes_rotating_segments(tmp_path):
+    records = api_records(50)
+    columns, _ = records_to_columns(records)
+    logger = PredictionLogger(tmp_path, batch_rows=40, segment_rows=120)
+    logger.start()
+    for i in range(4):
+        logger.log_records(records, ModelScores(np.full(50, i / 4), "v1"), "/predict")
+    logger.log_columns(columns, ModelScores(np.full(50, 0.9), "v2"), "/columnar")
+    logger.close()
+
+    df = read_prediction_log(tmp_path)
+    assert len(segment_paths(tmp_path)) == 2 and logger.segments.value == 2
+    assert len(df) == 250 and logger.logged.value == 250
+    assert (
+        df["categoria_produto"].tolist()
+        == [r["categoria_produto"] for r in records] * 5
+    )
+    assert df["predicted_fraude"].tolist() == [0] * 150 + [1] * 100
+    assert set(df.loc[df["endpoint"] == "/columnar", "model_version"]) == {"v2"}
+
+
+def test_full_queue_drops_or_blocks(tmp_path, caplog):
+    records = api_records(10)
+    scores = ModelScores(np.zeros(10), "v1")
+
+    dropping = PredictionLogger(tmp_path / "drop", max_queue=1, policy="drop")
+    for _ in range(3):
+        dropping.log_records(records, scores, "/predict")  # Sem escritor ativo
+    assert dropping.dropped.labels("queue_full").value == 20
+
+    blocking = PredictionLogger(
+        tmp_path / "block", max_queue=1, policy="block", block_timeout=0.01
+    )
+    blocking.log_records(records, scores, "/predict")
+    with caplog.at_level(logging.WARNING, logger="prediction_log"):
+        blocking.log_records(records, scores, "/predict")  # Espera e desiste
+    assert blocking.dropped.labels("block_timeout").value == 10
+    assert "10 transações descartadas" in caplog.text
+    blocking.start()
+    blocking.close()
+    assert len(read_prediction_log(tmp_path / "block")) == 10
+
+
+def test_blocked_async_log_does_not_stall_the_event_loop(tmp_path):
+    records = api_records(10)
+    scores = ModelScores(np.zeros(10), "v1")
+    logger = PredictionLogger(tmp_path, max_queue=1, block_timeout=0.5)
+    logger.log_records(records, scores, "/predict")  # Fila cheia, sem escritor
+
+    async def other_request(start):
+        await asyncio.sleep(0.01)
+        return time.perf_counter() - start
+
+    async def run():
+        start = time.perf_counter()
+        blocked = asyncio.create_task(
+            logger.log_records_async(records, scores, "/predict")
+        )
+        elapsed = await other_request(start)
+        assert not blocked.done()
+        logger.start()  # A escrita alcança e libera o lote que esperava
+        await blocked
+        return elapsed
+
+    assert asyncio.run(run()) < 0.25
+    logger.close()
+    assert logger.dropped.value == 0
+    assert len(read_prediction_log(tmp_path)) == 20
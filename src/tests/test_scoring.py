@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from models.train import get_pipeline
+from scoring import CompiledScorer
+from synthetic import make_transactions
+
+
+def to_records(df):
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def test_compiled_scorer_matches_pipeline(fitted_pipeline):
+    data = make_transactions(300, seed=7, with_target=False)
+    data.loc[0, "categoria_produto"] = "cat_nunca_vista"
+    data.loc[1, "categoria_produto"] = None
+
+    scorer = CompiledScorer.from_pipeline(fitted_pipeline)
+
+    expected = fitted_pipeline.predict_proba(data)[:, 1]
+    result = scorer.predict_proba(to_records(data))
+
+    assert np.array_equal(result, expected)
+
+
+def test_compiled_scorer_columns_match_records(fitted_pipeline):
+    data = make_transactions(300, seed=8, with_target=False)
+    data.loc[0, "categoria_produto"] = "cat_nunca_vista"
+    data.loc[1, "entrega_doc_2"] = None
+    columns = {col: data[col].to_numpy() for col in data.columns}
+
+    scorer = CompiledScorer.from_pipeline(fitted_pipeline)
+
+    expected = scorer.predict_proba(to_records(data))
+    result = scorer.predict_proba_columns(columns, len(data))
+
+    assert np.array_equal(result, expected)
+
+
+def test_compiled_scorer_multiple_target_columns():
+    df = make_transactions(1000, seed=5)
+    pipeline = get_pipeline()
+    pipeline.set_params(
+        kfold_encoder__colnames=["categoria_produto", "produto", "pais"],
+        model__verbose=-1,
+    )
+    pipeline.fit(df.drop(columns=["fraude"]), df["fraude"])
+    data = make_transactions(100, seed=6).drop(columns=["fraude"])
+
+    scorer = CompiledScorer.from_pipeline(pipeline)
+
+    expected = pipeline.predict_proba(data)[:, 1]
+    result = scorer.predict_proba(to_records(data))
+
+    assert np.array_equal(result, expected)
+
+
+def test_compiled_scorer_independent_of_batch_size(fitted_pipeline):
+    records = to_records(make_transactions(50, seed=3, with_target=False))
+
+    scorer = CompiledScorer.from_pipeline(fitted_pipeline)
+
+    batch = scorer.predict_proba(records)
+    single = np.concatenate([scorer.predict_proba([r]) for r in records])
+
+    assert np.array_equal(batch, single)
+
+
+def test_compiled_scorer_unknown_category(fitted_pipeline):
+    record = to_records(make_transactions(1, with_target=False))[0]
+    record["score_1"] = 9
+
+    scorer = CompiledScorer.from_pipeline(fitted_pipeline)
+
+    with pytest.raises(ValueError):
+        scorer.predict_proba([record])
@@ -0,0 +1,113 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from prediction_log import segment_paths
+from serving import THREAD_ENV_VARS, pin_threads, thread_budget
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+
+
+@pytest.mark.parametrize(
+    "n_cpus, workers, threads, expected",
+    [
+        (8, None, None, (8, 1)),
+        (8, 2, None, (2, 4)),
+        (8, None, 4, (2, 4)),
+        (8, 3, 2, (3, 2)),
+        (2, 4, None, (4, 1)),
+        (1, None, 2, (1, 2)),
+    ],
+)
+def test_thread_budget(n_cpus, workers, threads, expected):
+    assert thread_budget(n_cpus, workers, threads) == expected
+
+
+@pytest.mark.parametrize("workers, threads", [(0, 1), (0, None), (None, 0), (-1, 2)])
+def test_thread_budget_rejects_invalid(workers, threads):
+    with pytest.raises(ValueError):
+        thread_budget(4, workers, threads)
+
+
+def test_pin_threads():
+    environ = {}
+    pin_threads(3, environ)
+    assert environ == {name: "3" for name in THREAD_ENV_VARS}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def post_payload(url, body):
+    request = urllib.request.Request(
+        url, data=body, headers={"content-type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def wait_for_workers(url, body, log_dir, n_workers, timeout=30):
+    """
+    Envia requisições concorrentes até o log ter segmentos de `n_workers` pids.
+    """
+    n_rows = len(json.loads(body)["data"])
+    deadline = time.monotonic() + timeout
+    pids = set()
+    with ThreadPoolExecutor(8) as pool:
+        while time.monotonic() < deadline:
+            try:
+                responses = list(pool.map(lambda _: post_payload(url, body), range(8)))
+            except OSError:  # Workers ainda subindo
+                time.sleep(0.2)
+                continue
+            assert all(len(r["results"]) == n_rows for r in responses)
+            # Segmentos: <horário>-<pid>-<sequência>.parquet
+            pids = {os.path.basename(p).split("-")[1] for p in segment_paths(log_dir)}
+            if len(pids) >= n_workers:
+                return pids
+            time.sleep(0.2)
+    return pids
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="o launcher usa os.fork")
+def test_forked_workers_score_with_several_threads(api_artifact, tmp_path):
+    # Com mais de uma thread, um pool do OpenMP herdado do pai trava os workers
+    port = free_port()
+    log_dir = tmp_path / "log"
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([os.path.join(ROOT, "src"), ROOT]),
+        "MODEL_ARTIFACT_PATH": str(api_artifact),
+        "PREDICTION_LOG_DIR": str(log_dir),
+        "PREDICTION_LOG_SEGMENT_SECONDS": "0",
+        "PREDICTION_CACHE_SIZE": "0",
+    }
+    launcher = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--host", "127.0.0.1", "--port", str(port)]
+        + ["--workers", "2", "--threads", "2"],
+        cwd=ROOT,
+        env=env,
+        start_new_session=True,
+    )
+    try:
+        with open(os.path.join(ROOT, "test_payload.json"), "rb") as f:
+            body = f.read()
+        pids = wait_for_workers(f"http://127.0.0.1:{port}/predict", body, log_dir, 2)
+        assert len(pids) == 2
+    finally:
+        launcher.send_signal(signal.SIGTERM)
+        try:
+            launcher.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            # Workers travados não atendem ao SIGTERM
+            os.killpg(launcher.pid, signal.SIGKILL)
+            launcher.wait()
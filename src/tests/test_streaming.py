@@ -0,0 +1,64 @@
+import asyncio
+import orjson
+import pytest
+from streaming import iter_ndjson, score_ndjson
+
+
+async def byte_stream(pieces, produced=None):
+    for piece in pieces:
+        if produced is not None:
+            produced.append(piece)
+        yield piece
+
+
+def collect(async_gen):
+    async def run():
+        return [item async for item in async_gen]
+
+    return asyncio.run(run())
+
+
+def score_chunk(records):
+    return b"".join(orjson.dumps({"id": r["id"]}) + b"\n" for r in records)
+
+
+def test_iter_ndjson_splits_lines_across_pieces():
+    pieces = [b'{"id": 1}\n{"i', b'd": 2}\n\n', b'{"id": 3}']
+
+    result = collect(iter_ndjson(byte_stream(pieces)))
+
+    assert result == [(1, {"id": 1}), (2, {"id": 2}), (4, {"id": 3})]
+
+
+def test_score_ndjson_keeps_order_and_bounds_reading():
+    produced = []
+    pieces = [orjson.dumps({"id": i}) + b"\n" for i in range(100)]
+
+    async def run():
+        lines = []
+        stream = score_ndjson(
+            byte_stream(pieces, produced), score_chunk, chunk_size=10, max_pending=1
+        )
+        async for output in stream:
+            # Sem consumo da resposta, a leitura não avança mais que alguns blocos
+            await asyncio.sleep(0.01)
+            assert len(produced) <= len(lines) + 10 * 3
+            lines.extend(output.splitlines())
+        return lines
+
+    lines = asyncio.run(run())
+
+    assert [orjson.loads(line)["id"] for line in lines] == list(range(100))
+
+
+@pytest.mark.parametrize(
+    "pieces, message",
+    [
+        ([b'{"id": 1}\n', b"{ruim\n"], "linha 2"),
+        ([b'{"id": 1}\n', b'{"sem_id": 2}\n'], "Linhas 1 a 2"),
+    ],
+)
+def test_score_ndjson_reports_errors(pieces, message):
+    outputs = collect(score_ndjson(byte_stream(pieces), score_chunk, chunk_size=5))
+
+    assert message in orjson.loads(outputs[-1])["error"]
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+from artifact import read_threshold, save_artifact, write_threshold
+from config import DECISION_THRESHOLD
+from model_manager import LoadedModel, model_version, warmup_records
+from sklearn.metrics import precision_score, recall_score
+from thresholds import best_threshold, profit_curve, profit_from_prediction
+
+
+def test_profit_curve_matches_one_pass_per_threshold():
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, 500)
+    y_proba = np.round(rng.random(500), 2)  # Com empates
+    amount = rng.gamma(2.0, 100.0, 500)
+
+    curve = profit_curve(y_true, y_proba, amount)
+    assert curve["threshold"].is_monotonic_increasing
+    for _, row in curve.sample(20, random_state=0).iterrows():
+        y_pred = (y_proba > row["threshold"]).astype(int)
+        fraud_losses, revenues, profit = profit_from_prediction(y_true, y_pred, amount)
+        assert np.isclose(row["profit"], profit)
+        assert np.isclose(row["fraud_losses"], fraud_losses)
+        assert np.isclose(row["revenues"], revenues)
+        assert np.isclose(row["approval_rate"], (y_pred == 0).mean())
+        assert np.isclose(row["recall"], recall_score(y_true, y_pred))
+        assert np.isclose(
+            row["precision"], precision_score(y_true, y_pred, zero_division=0)
+        )
+
+    best = best_threshold(curve)
+    assert best["profit"] == curve["profit"].max()
+
+
+def test_threshold_is_stored_with_artifact(fitted_pipeline, tmp_path):
+    artifact_dir = os.path.join(tmp_path, "artifact")
+    save_artifact(fitted_pipeline, artifact_dir)
+    assert read_threshold(artifact_dir) == DECISION_THRESHOLD
+    version = model_version(artifact_dir)
+
+    write_threshold(artifact_dir, 0.0, {"profit": 1.5})
+    model = LoadedModel.from_path(artifact_dir)
+    scores = model.predict_proba(warmup_records(10))
+
+    assert model.threshold == 0.0 and model.version != version
+    assert model.info()["threshold"] == 0.0
+    assert (scores.predictions() == (scores.proba > 0)).all()
+    assert scores[:3].threshold == 0.0
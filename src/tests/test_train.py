@@ -0,0 +1,139 @@
+import copy
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+from models.train import (
+    MODEL_PARAMS,
+    build_dataset,
+    fit_in_chunks,
+    get_pipeline,
+    search_params,
+    train_model_out_of_core,
+    update_model,
+    update_pipeline,
+)
+from synthetic import make_transactions
+
+
+def test_search_params_prunes_and_picks_best_profit():
+    df = make_transactions(3000)
+    result = search_params(
+        df.drop(columns=["fraude"]),
+        df["fraude"],
+        n_trials=4,
+        n_splits=2,
+        n_jobs=2,
+        max_estimators=60,
+        early_stopping_rounds=10,
+        pipeline_params={"category_grouper__min_threshold": 45},
+    )
+    evaluated = [trial["folds_evaluated"] for trial in result["trials"]]
+    assert sorted(evaluated) == [1, 1, 2, 2]
+    finished = [t for t in result["trials"] if t["folds_evaluated"] == 2]
+    assert result["cv_profit"] == max(t["cv_profit"] for t in finished)
+    assert 1 <= result["params"]["n_estimators"] <= 60
+    assert 0 <= result["threshold"] <= 1
+
+    model = get_pipeline(model_params=result["params"])[-1]
+    assert model.get_params()["num_leaves"] == result["params"]["num_leaves"]
+    assert model.get_params()["class_weight"] == "balanced"
+
+
+def test_update_pipeline_continues_boosting_and_merges_stats(fitted_pipeline):
+    pipeline = copy.deepcopy(fitted_pipeline)
+    n_trees = pipeline[-1].booster_.num_trees()
+    batch = make_transactions(1000, seed=7)
+    batch.loc[batch["categoria_produto"].isin(pipeline[0].vocabulary_), "fraude"] = 1
+
+    update_pipeline(pipeline, batch.drop(columns=["fraude"]), batch["fraude"], 20)
+
+    assert pipeline[-1].booster_.num_trees() == n_trees + 20
+    kfold = pipeline.named_steps["kfold_encoder"]
+    seen = pipeline[0].transform(batch)["categoria_produto"].unique()
+    before = fitted_pipeline.named_steps["kfold_encoder"].encoding_map_
+    assert all(kfold.encoding_map_[c] > before[c] for c in seen if c != "Outros")
+
+    # A mediana dos histogramas fica perto da exata de treino + lote
+    history = make_transactions(2000)
+    imputer = pipeline.named_steps["imputer"]
+    for col in ["score_2", "score_5"]:
+        exact = np.nanmedian(np.concatenate([history[col], batch[col]]))
+        assert np.isclose(imputer.imputers[col].statistics_[0], exact, rtol=0.01)
+
+
+def test_update_model_reports_against_full_retrain(fitted_pipeline, tmp_path):
+    for name, seed in [("train", 0), ("batch", 1), ("test", 2)]:
+        feather.write_feather(
+            make_transactions(2000, seed=seed), tmp_path / f"{name}.arrow"
+        )
+    joblib.dump(fitted_pipeline, tmp_path / "model.pkl")
+
+    report = update_model(
+        tmp_path / "batch.arrow",
+        model_path=tmp_path / "model.pkl",
+        artifact_path=tmp_path / "artifact",
+        n_estimators=10,
+        eval_path=tmp_path / "test.arrow",
+        history_path=tmp_path / "train.arrow",
+        params_path=None,
+    )
+
+    assert set(report) == {"incremental", "full_retrain"}
+    assert all(0.5 < r["auc"] <= 1 and r["seconds"] > 0 for r in report.values())
+    assert joblib.load(tmp_path / "model.pkl")[-1].booster_.num_trees() > (
+        fitted_pipeline[-1].booster_.num_trees()
+    )
+
+
+def test_fit_in_chunks_matches_in_memory_fit(tmp_path):
+    df = make_transactions(3000, seed=5)
+    df.to_csv(tmp_path / "train.csv", index=False)
+    params = {"category_grouper__min_threshold": 45}
+
+    expected = get_pipeline(onehot_output="dense")[:-1].set_params(**params)
+    expected.fit(df.drop(columns=["fraude"]), df["fraude"])
+    chunked = get_pipeline(onehot_output="dense")[:-1].set_params(**params)
+    fit_in_chunks(chunked, tmp_path / "train.csv", chunksize=700)
+
+    kfold = chunked.named_steps["kfold_encoder"]
+    assert kfold.encoding_maps_ == expected.named_steps["kfold_encoder"].encoding_maps_
+    X = pd.read_csv(tmp_path / "train.csv").drop(columns=["fraude"])
+    np.testing.assert_array_equal(chunked.transform(X), expected.transform(X))
+
+
+def test_out_of_core_training_caches_binned_dataset(fitted_pipeline, tmp_path):
+    feather.write_feather(make_transactions(2000), tmp_path / "train.arrow")
+    kwargs = {
+        "cache_dir": tmp_path / "cache",
+        "chunksize": 300,
+        "pipeline_params": {"category_grouper__min_threshold": 45},
+    }
+    pipeline = train_model_out_of_core(
+        tmp_path / "train.arrow",
+        tmp_path / "model.pkl",
+        tmp_path / "artifact",
+        params_path=None,
+        **kwargs,
+    )
+    params = get_pipeline()[-1].get_params()
+    _, _, cached = build_dataset(tmp_path / "train.arrow", params, **kwargs)
+    assert cached
+    _, _, cached = build_dataset(
+        tmp_path / "train.arrow", {**params, "class_weight": None}, **kwargs
+    )
+    assert not cached
+
+    # Mesmo modelo do pipeline em memória, a menos dos bins em float32
+    data = make_transactions(500, seed=3, with_target=False)
+    assert pipeline[-1].booster_.num_trees() == MODEL_PARAMS["n_estimators"]
+    np.testing.assert_allclose(
+        pipeline.predict_proba(data), fitted_pipeline.predict_proba(data), atol=0.05
+    )
+
+    # O pipeline salvo continua o boosting como um treinado em memória
+    saved = joblib.load(tmp_path / "model.pkl")
+    assert (saved.predict(data) == (saved.predict_proba(data)[:, 1] > 0.5)).all()
+    batch = make_transactions(1000, seed=7)
+    update_pipeline(saved, batch.drop(columns=["fraude"]), batch["fraude"], 5)
+    assert saved[-1].booster_.num_trees() == MODEL_PARAMS["n_estimators"] + 5
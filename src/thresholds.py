@@ -0,0 +1,141 @@
+import argparse
+import numpy as np
+import pandas as pd
+from artifact import write_threshold
+from config import ARTIFACT_PATH, PREDICTIONS_PATH, PROCESSED_DIR
+
+# Receita de uma transação legítima aprovada, como fração do valor da compra;
+# uma fraude aprovada custa o valor inteiro
+REVENUE_RATE = 0.10
+
+PROFIT_CURVE_PATH = PROCESSED_DIR / "profit_curve.csv"
+
+
+def profit_from_prediction(y_true, y_pred, amount, revenue_rate=REVENUE_RATE):
+    """
+    Perdas com fraudes, receitas e lucro das transações aprovadas (y_pred == 0).
+    """
+    approved = np.asarray(y_pred) == 0
+    is_fraud = np.asarray(y_true) == 1
+    amount = np.asarray(amount, dtype=np.float64)
+    fraud_losses = amount[approved & is_fraud].sum()
+    revenues = amount[approved & ~is_fraud].sum() * revenue_rate
+    return fraud_losses, revenues, revenues - fraud_losses
+
+
+def profit_curve(
+    y_true,
+    y_proba,
+    amount,
+    thresholds=None,
+    revenue_rate=REVENUE_RATE,
+    weights=None,
+):
+    """
+    Métricas de negócio e de classificação em todos os thresholds de uma vez.
+
+    Uma transação é bloqueada quando o score passa do threshold, como na API.
+    Os scores são ordenados uma única vez e os totais aprovados em cada
+    threshold saem de somas acumuladas, em O(n log n) no total. Sem
+    `thresholds`, avalia cada score distinto, mais o 0 (aprovar só score 0).
+
+    Com `weights`, cada linha representa várias transações (um bin de
+    histograma, por exemplo) e `amount` é o valor total delas.
+    """
+    y_proba = np.asarray(y_proba, dtype=np.float64)
+    order = np.argsort(y_proba, kind="stable")
+    scores = y_proba[order]
+    is_fraud = np.asarray(y_true)[order] == 1
+    amount = np.asarray(amount, dtype=np.float64)[order]
+    weights = (
+        np.ones(len(scores), dtype=np.int64)
+        if weights is None
+        else np.asarray(weights)[order]
+    )
+
+    # Totais acumulados dos k menores scores, com o zero na frente para k = 0
+    def cumulative(values):
+        return np.concatenate([[0], np.cumsum(values)])
+
+    cum_count = cumulative(weights)
+    cum_fraud = cumulative(np.where(is_fraud, weights, 0))
+    cum_fraud_amount = cumulative(np.where(is_fraud, amount, 0.0))
+    cum_legit_amount = cumulative(np.where(is_fraud, 0.0, amount))
+
+    if thresholds is None:
+        thresholds = np.unique(np.concatenate([[0.0], scores]))
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    k = np.searchsorted(scores, thresholds, side="right")
+
+    n_rows = cum_count[-1]
+    n_fraud = cum_fraud[-1]
+    approved = cum_count[k]
+    fn = cum_fraud[k]  # Fraudes aprovadas
+    tn = approved - fn
+    tp = n_fraud - fn
+    blocked = n_rows - approved
+    revenues = cum_legit_amount[k] * revenue_rate
+    fraud_losses = cum_fraud_amount[k]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.DataFrame(
+            {
+                "threshold": thresholds,
+                "approved": approved,
+                "approval_rate": approved / n_rows if n_rows else np.nan,
+                "fraud_rate": np.where(approved > 0, fn / approved, 0.0),
+                "precision": np.where(blocked > 0, tp / blocked, 0.0),
+                "recall": tp / n_fraud if n_fraud else np.zeros(len(thresholds)),
+                "accuracy": (tp + tn) / n_rows if n_rows else np.nan,
+                "revenues": revenues,
+                "fraud_losses": fraud_losses,
+                "profit": revenues - fraud_losses,
+            }
+        )
+
+
+def best_threshold(curve):
+    """
+    Linha da curva com o maior lucro; no empate, a que aprova mais transações.
+    """
+    profit = curve["profit"].to_numpy()
+    candidates = np.flatnonzero(profit == profit.max())
+    return curve.iloc[candidates[-1]]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Escolhe o threshold de maior lucro e o grava no artefato."
+    )
+    parser.add_argument(
+        "--predictions",
+        default=str(PREDICTIONS_PATH),
+        help="CSV do make_predictions, com predicted_proba, true_fraude e valor_compra",
+    )
+    parser.add_argument("--artifact", default=str(ARTIFACT_PATH))
+    parser.add_argument("--curve", default=str(PROFIT_CURVE_PATH))
+    parser.add_argument("--revenue-rate", type=float, default=REVENUE_RATE)
+    args = parser.parse_args()
+
+    df = pd.read_csv(
+        args.predictions, usecols=["predicted_proba", "true_fraude", "valor_compra"]
+    )
+    curve = profit_curve(
+        df["true_fraude"],
+        df["predicted_proba"],
+        df["valor_compra"],
+        revenue_rate=args.revenue_rate,
+    )
+    curve.to_csv(args.curve, index=False)
+    best = best_threshold(curve)
+
+    write_threshold(args.artifact, float(best["threshold"]), best.to_dict())
+    print(
+        f"Threshold {best['threshold']:.4f}: lucro R$ {best['profit']:,.2f}, "
+        f"aprovação {best['approval_rate']:.2%}, fraude aprovada {best['fraud_rate']:.2%}"
+    )
+    print(f"Curva salva em {args.curve}; threshold gravado em {args.artifact}")
+
+
+if __name__ == "__main__":
+    main()
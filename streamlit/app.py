@@ -1,18 +1,61 @@
+import sys
+from pathlib import Path
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-import matplotlib.pyplot as plt
-import missingno as msno
-import nannyml as nml
-from nannyml import MissingValuesCalculator, UnseenValuesCalculator, AlertCountRanker
 from datetime import timedelta
-from sklearn.metrics import confusion_matrix, classification_report
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+from aggregates import ScoringSummary, aggregates_path  # noqa: E402
+from config import MONITORING_DIR, PREDICTIONS_PATH, PREDICTIONS_PATH_TRAIN  # noqa: E402
+from dataset import file_fingerprint  # noqa: E402
+from monitoring import RESULTS_FILE  # noqa: E402
+from thresholds import best_threshold  # noqa: E402
 
 st.set_page_config(page_title="Dashboard de Fraudes", layout="wide")
 st.title("🔎 Dashboard de Fraudes")
 
+
+# ==========================================================================
+# 💾 CACHE
+# ==========================================================================
+# O Streamlit reexecuta o script a cada clique; os arquivos só são relidos
+# quando o fingerprint (tamanho, mtime e hash) muda
+def fingerprint(path):
+    previous = st.session_state.get(("fingerprint", str(path)))
+    current = file_fingerprint(path, previous)
+    st.session_state[("fingerprint", str(path))] = current
+    return current["sha256"]
+
+
+# O hash entra na chave do cache só para invalidá-lo quando o arquivo muda
+@st.cache_data(max_entries=4)
+def _load_summary(path, content_hash):
+    return ScoringSummary.load(path)
+
+
+@st.cache_data(max_entries=4)
+def _load_parquet(path, content_hash):
+    return pd.read_parquet(path)
+
+
+def load_summary(predictions_path):
+    """
+    Agregados gravados pelo make_predictions ao pontuar `predictions_path`.
+    """
+    path = aggregates_path(predictions_path)
+    if not Path(path).exists():
+        st.error(f"Agregados não encontrados em {path}. Rode `python -m models.predict` em src/.")
+        st.stop()
+    return _load_summary(path, fingerprint(path))
+
+
+def load_parquet(path):
+    return _load_parquet(str(path), fingerprint(path))
+
+
 # Seletor lateral
 aba = st.sidebar.radio("📁 Selecione uma seção:", ["📊 Gráficos", "📡 Monitoramento"])
 
@@ -22,28 +65,26 @@ aba = st.sidebar.radio("📁 Selecione uma seção:", ["📊 Gráficos", "📡 M
 if aba == "📊 Gráficos":
     st.header("📊 Análise de Detecção de Fraudes")
 
-    df = pd.read_csv("../data/processed/result_with_predictions.csv")
-
-    threshold = 61
-    df["predicted_proba"] = pd.to_numeric(df["predicted_proba"], errors="coerce")
-    df["true_fraude"] = pd.to_numeric(df["true_fraude"], errors="coerce")
-    df["valor_compra"] = pd.to_numeric(df["valor_compra"], errors="coerce")
-
-    df["blocked"] = df["predicted_proba"] * 100 < threshold
-    df["predicted_fraude_threshold"] = (df["predicted_proba"] * 100 >= threshold).astype(int)
+    # Agregados do job de scoring, no threshold usado por ele
+    summary = load_summary(PREDICTIONS_PATH)
+    threshold = summary.threshold * 100
 
     st.subheader("📈 Histograma dos Scores de Fraude")
-    fig = px.histogram(df, x="predicted_proba", nbins=30)
+    fig = px.bar(summary.score_histogram(), x="score", y="count")
+    fig.update_traces(width=0.01)
     fig.add_vline(x=threshold / 100, line_dash="dash", line_color="red", annotation_text=f"Threshold = {threshold/100:.2f}")
     st.plotly_chart(fig, use_container_width=True)
 
     st.subheader("📊 Métricas de Classificação")
-    report = classification_report(df["true_fraude"], df["predicted_fraude_threshold"], output_dict=True)
+    cm = summary.confusion
+    TN, FP, FN, TP = cm.ravel()
+    precision = TP / (TP + FP) if TP + FP else 0.0
+    recall = TP / (TP + FN) if TP + FN else 0.0
     metricas = {
-        "Accuracy": report["accuracy"],
-        "Precision (fraude)": report["1"]["precision"],
-        "Recall (fraude)": report["1"]["recall"],
-        "F1-Score (fraude)": report["1"]["f1-score"],
+        "Accuracy": (TP + TN) / cm.sum() if cm.sum() else 0.0,
+        "Precision (fraude)": precision,
+        "Recall (fraude)": recall,
+        "F1-Score (fraude)": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
     }
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Accuracy", f"{metricas['Accuracy']:.2%}")
@@ -52,8 +93,7 @@ if aba == "📊 Gráficos":
     col4.metric("F1-Score", f"{metricas['F1-Score (fraude)']:.2%}")
 
     st.subheader("🧮 Matrizes de Confusão")
-    cm = confusion_matrix(df["true_fraude"], df["predicted_fraude_threshold"])
-    cm_prop = cm / cm.sum(axis=1, keepdims=True)
+    cm_prop = cm / np.maximum(cm.sum(axis=1, keepdims=True), 1)
 
     col1, col2 = st.columns(2)
     with col1:
@@ -73,7 +113,6 @@ if aba == "📊 Gráficos":
         st.plotly_chart(fig_cm_prop, use_container_width=True)
 
     st.subheader("📉 Taxas Operacionais")
-    TN, FP, FN, TP = cm.ravel()
     approval_rate = round((FN + TN) / (TN + FP + FN + TP), 2)
     fraud_rate = round(FN / (FN + TN), 2) if (FN + TN) > 0 else 0
 
@@ -82,14 +121,8 @@ if aba == "📊 Gráficos":
     col2.metric("Taxa de Fraude Aprovada", f"{fraud_rate:.2%}")
 
     st.subheader("💰 Análise Financeira")
-
-    def profit_from_prediction(df, predicted_col, target_col, amount_col):
-        fraud_losses = df[(df[predicted_col] == 0) & (df[target_col] == 1)][amount_col].sum()
-        revenues = df[(df[predicted_col] == 0) & (df[target_col] == 0)][amount_col].sum() * 0.1
-        profit = revenues - fraud_losses
-        return fraud_losses, revenues, profit
-
-    fraud_losses, revenues, profit = profit_from_prediction(df, "predicted_fraude_threshold", "true_fraude", "valor_compra")
+    fraud_losses, revenues = summary.fraud_losses, summary.revenues
+    profit = revenues - fraud_losses
     total = fraud_losses + revenues
     profit_ratio = profit / total if total > 0 else 0
 
@@ -99,112 +132,81 @@ if aba == "📊 Gráficos":
     col3.metric("Lucro Líquido", f"R$ {profit:,.2f}")
     col4.metric("Razão de Lucro", f"{profit_ratio:.2%}")
 
+    st.subheader("📐 Lucro por Threshold")
+    curve = summary.profit_curve()
+    best = best_threshold(curve)
+    fig_curve = px.line(curve, x="threshold", y="profit", hover_data=["approval_rate", "fraud_rate", "precision", "recall"])
+    fig_curve.add_vline(x=threshold / 100, line_dash="dash", line_color="red", annotation_text="Threshold atual")
+    fig_curve.add_vline(x=best["threshold"], line_dash="dot", line_color="green", annotation_text="Lucro máximo")
+    st.plotly_chart(fig_curve, use_container_width=True)
+    st.caption(f"Lucro máximo de R$ {best['profit']:,.2f} com threshold {best['threshold']:.3f} (aprovação de {best['approval_rate']:.2%}).")
+
 # ==========================================================================
 # 📡 MONITORAMENTO
 # ==========================================================================
 elif aba == "📡 Monitoramento":
     st.header("📡 Monitoramento: Comparação entre Treino e Inferência")
 
-    df_train = pd.read_csv("../data/processed/train.csv")
-    df_test = pd.read_csv("../data/processed/test.csv")
-
-    # Limpeza
-    colunas_para_remover = ["fraude", "score_fraude_modelo", "produto", "categoria_produto", "data_compra"]
-    df_train = df_train.drop(columns=[col for col in colunas_para_remover if col in df_train.columns])
-    df_test = df_test.drop(columns=[col for col in colunas_para_remover if col in df_test.columns])
+    # Perfil das colunas de entrada, dos agregados de cada conjunto pontuado
+    summary_train = load_summary(PREDICTIONS_PATH_TRAIN)
+    summary_test = load_summary(PREDICTIONS_PATH)
 
     st.subheader("❓ Quantidade de Nulos")
     col1, col2 = st.columns(2)
-    with col1:
-        st.write("**Base de Treino**")
-        fig1 = plt.figure(figsize=(6, 3))
-        msno.bar(df_train)
-        st.pyplot(fig1)
-
-    with col2:
-        st.write("**Base de Teste**")
-        fig2 = plt.figure(figsize=(6, 3))
-        msno.bar(df_test)
-        st.pyplot(fig2)
+    for col, nome, summary in [(col1, "Treino", summary_train), (col2, "Teste", summary_test)]:
+        with col:
+            st.write(f"**Base de {nome}**")
+            non_null = summary.n_rows - pd.Series(summary.nulls, dtype=np.int64)
+            st.bar_chart(non_null)
 
     st.subheader("📈 Média de Variáveis Contínuas")
-    numeric_cols = df_train.select_dtypes(include=[np.number]).columns.tolist()
-    mean_train = df_train[numeric_cols].mean()
-    mean_test = df_test[numeric_cols].mean()
-    means_df = pd.DataFrame({'Treino': mean_train, 'Teste': mean_test})
+    means_df = pd.DataFrame({'Treino': summary_train.means(), 'Teste': summary_test.means()})
     st.line_chart(means_df)
 
     st.subheader("📊 Proporção de Variáveis Categóricas")
-    categorical_cols = df_train.select_dtypes(include=["object", "category"]).columns.tolist()
-    for col in categorical_cols:
+    for col in summary_train.categories:
         st.write(f"**{col}**")
-        p1 = df_train[col].value_counts(normalize=True)
-        p2 = df_test[col].value_counts(normalize=True)
+        p1 = summary_train.proportions(col)
+        p2 = summary_test.proportions(col)
         prop_df = pd.DataFrame({"Treino": p1, "Teste": p2}).fillna(0)
         st.bar_chart(prop_df)
 
     # ========================
-    # NANNYML - CBPE + Qualidade
+    # DRIFT - desempenho estimado e qualidade por dia
     # ========================
-    st.subheader("📡 Estimativa de Métricas com NannyML")
-
-    df_train = pd.read_csv("../data/processed/result_with_predictions_train.csv")
-    df_inference = pd.read_csv("../data/processed/result_with_predictions.csv")
-    
-    colunas_para_remover = ["fraude", "score_fraude_modelo", "produto", "categoria_produto", "data_compra"]
-    df_train = df_train.drop(columns=[col for col in colunas_para_remover if col in df_train.columns])
-    df_inference = df_inference.drop(columns=[col for col in colunas_para_remover if col in df_inference.columns])
-
-    def simular_datas_repetidas(df, start_date="2024-01-01", n_dias=30):
-        total = len(df)
-        datas = pd.date_range(start=start_date, periods=n_dias, freq="D")
-        datas_repetidas = np.resize(datas, total)
-        df["prediction_date"] = np.sort(datas_repetidas)
-        return df
-
-    df_train = simular_datas_repetidas(df_train, "2023-12-01", 31)
-    df_inference = simular_datas_repetidas(df_inference, "2024-01-01", 30)
-
-    estimator = nml.CBPE(
-        y_pred='predicted_fraude',
-        y_pred_proba='predicted_proba',
-        y_true='true_fraude',
-        timestamp_column_name='prediction_date',
-        problem_type='classification_binary',
-        chunk_period='D',
-        metrics=['roc_auc', 'f1', 'precision', 'recall', 'accuracy']
-    )
-
-    estimator.fit(df_train)
-    estimated_performance = estimator.estimate(df_inference)
-
-    fig_cbpe = estimated_performance.plot()
-    st.plotly_chart(fig_cbpe, use_container_width=True)
-
-    st.subheader("🔍 Qualidade de Dados com NannyML")
-
-    exclude_cols = ['true_fraude', 'predicted_proba', 'predicted_fraude', 'valor_compra', 'prediction_date']
-    features = [col for col in df_train.columns if col not in exclude_cols]
-
-    # Valores Nulos
-    missing_calc = MissingValuesCalculator(column_names=features, timestamp_column_name='prediction_date', chunk_period='D')
-    missing_calc.fit(df_train)
-    missing_results = missing_calc.calculate(df_inference)
-    missing_ranking = AlertCountRanker().rank(missing_results)
-
-    st.subheader("❓ Valores Nulos")
-    st.dataframe(missing_ranking.head(10))
-    fig_missing = missing_results.filter(column_names=missing_ranking['column_name'].head(3).tolist()).plot()
-    st.plotly_chart(fig_missing, use_container_width=True)
-
-    # Valores Não Observados
-    st.subheader("🌐 Valores Não Observados")
-    categorical_features = [col for col in features if df_train[col].dtype == 'object']
-    unseen_calc = UnseenValuesCalculator(column_names=categorical_features, timestamp_column_name='prediction_date', chunk_period='D')
-    unseen_calc.fit(df_train)
-    unseen_results = unseen_calc.calculate(df_inference)
-    unseen_ranking = AlertCountRanker().rank(unseen_results)
-
-    st.dataframe(unseen_ranking.head(10))
-    fig_unseen = unseen_results.filter(column_names=unseen_ranking['column_name'].head(3).tolist()).plot()
-    st.plotly_chart(fig_unseen, use_container_width=True)
+    # Resultados gravados pelo job src/monitoring.py; aqui só são lidos
+    results_path = MONITORING_DIR / RESULTS_FILE
+    if not results_path.exists():
+        st.info("Sem resultados de monitoramento. Rode `python monitoring.py` em src/.")
+        st.stop()
+    results = load_parquet(results_path)
+
+    def plot_results(kind, columns, title):
+        data = results[(results["kind"] == kind) & results["column"].isin(columns)]
+        fig = px.line(data, x="date", y="value", color="period", facet_row="column", category_orders={"column": columns}, markers=True, title=title)
+        fig.update_yaxes(matches=None)
+        for i, column in enumerate(reversed(columns), start=1):
+            bounds = data[data["column"] == column].iloc[0]
+            for bound in ["lower", "upper"]:
+                if pd.notna(bounds[bound]):
+                    fig.add_hline(y=bounds[bound], line_dash="dot", line_color="red", row=i, col=1)
+        fig.update_layout(height=250 * len(columns))
+        st.plotly_chart(fig, use_container_width=True)
+
+    def alert_ranking(kind):
+        data = results[(results["kind"] == kind) & (results["period"] == "analysis")]
+        return (
+            data.groupby("column")["alert"].sum().astype(int)
+            .sort_values(ascending=False).rename("alertas").reset_index()
+        )
+
+    st.subheader("📡 Desempenho Estimado (CBPE)")
+    plot_results("estimated_performance", ["roc_auc", "f1", "precision", "recall", "accuracy"], "Métricas estimadas por dia")
+
+    st.subheader("🔍 Qualidade de Dados")
+    for kind, title in [("missing_rate", "❓ Valores Nulos"), ("unseen_values", "🌐 Valores Não Observados"), ("mean", "📈 Médias")]:
+        st.subheader(title)
+        ranking = alert_ranking(kind)
+        st.dataframe(ranking.head(10))
+        if not ranking.empty:
+            plot_results(kind, ranking["column"].head(3).tolist(), title)